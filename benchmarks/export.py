@@ -0,0 +1,120 @@
+"""分组导出基准：流式导出（NDJSON / CSV）vs 先拿到整份 JSON 再在脚本里逐组统计
+
+先用离线分析（不下载图片）生成一个分析目录，再比较：
+  - 聚合：向量化的 write_group_aggregates vs 逐组 Python 统计
+  - 导出：/api/csv/analyses/<id>/export 各格式的吞吐和 Python 内存峰值（tracemalloc），
+    对照组把所有分组和聚合拼成一个 JSON 响应体
+
+用法: python benchmarks/export.py [--rows 200000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tempfile
+import tracemalloc
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.out_of_core import write_csv
+
+
+def measure(func):
+    """运行两次：第一次计时，第二次用 tracemalloc 记录 Python 内存峰值（tracemalloc 会明显拖慢运行）"""
+    start = time.perf_counter()
+    result = func()
+    entry = {'seconds': time.perf_counter() - start}
+    tracemalloc.start()
+    func()
+    entry['python_peak_mb'] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return entry, result
+
+
+def python_aggregates(analysis):
+    """对照组：下游脚本拿到分组后逐组统计"""
+    aggregates = []
+    with open(analysis.file('groups.ndjson'), encoding='utf-8') as f:
+        for line in f:
+            products = json.loads(line)['products']
+            prices = [product['price_numeric'] for product in products]
+            aggregates.append({
+                'total_sales': sum(product['total_sales'] for product in products),
+                'volume': sum(product['volume_numeric'] for product in products),
+                'price_min': min(prices),
+                'price_median': statistics.median(prices),
+                'price_max': max(prices)
+            })
+    return aggregates
+
+
+def run(rows=200000):
+    from src.main import create_app
+    from src.routes import csv_analyzer_simple
+    from src.utils.analysis_store import AnalysisStore
+    from src.utils.out_of_core import OutOfCoreAnalyzer
+    from src.utils.group_export import write_group_aggregates
+
+    with tempfile.TemporaryDirectory(prefix='ebay-export-') as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'bench.csv')
+        write_csv(csv_path, rows)
+        store = AnalysisStore(os.path.join(tmp_dir, 'analyses'))
+        analysis = store.create()
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            OutOfCoreAnalyzer(analysis, csv_analyzer_simple.parse_product_row, csv_analyzer_simple.fingerprint_for_url,
+                              csv_analyzer_simple.is_similar_pair, use_images=False).run([(csv_path, 'bench.csv')])
+        meta = analysis.read_meta()
+        report = {
+            'rows': rows,
+            'groups': meta['groups'],
+            'products_in_groups': meta['products_in_groups'],
+            'analysis_seconds': time.perf_counter() - start,
+            'aggregates': {},
+            'export': {}
+        }
+
+        report['aggregates']['vectorized'], _ = measure(
+            lambda: write_group_aggregates(analysis, meta['rows'], meta['groups']))
+        report['aggregates']['python_per_group'], _ = measure(lambda: python_aggregates(analysis))
+        report['aggregates']['speedup'] = (report['aggregates']['python_per_group']['seconds']
+                                           / report['aggregates']['vectorized']['seconds'])
+
+        csv_analyzer_simple.analysis_store = store
+        client = create_app().test_client()
+
+        def export(query):
+            response = client.get(f"/api/csv/analyses/{analysis.analysis_id}/export?{query}")
+            size = sum(len(chunk) for chunk in response.response)
+            response.close()
+            return size
+
+        for label, query in (('ndjson', 'format=ndjson'), ('ndjson_aggregates', 'format=ndjson&products=0'),
+                             ('csv', 'format=csv'), ('csv_aggregates', 'format=csv&products=0')):
+            entry, size = measure(lambda: export(query))
+            entry['bytes'] = size
+            entry['mb_per_second'] = entry['bytes'] / 1024 / 1024 / entry['seconds']
+            report['export'][label] = entry
+
+        # 对照组：一个 JSON 响应体包含全部分组（与 /upload 返回整份结果相同的方式）
+        def single_json_body():
+            with open(analysis.file('groups.ndjson'), encoding='utf-8') as f:
+                groups = [json.loads(line) for line in f]
+            body = json.dumps({'similar_groups': groups, 'aggregates': python_aggregates(analysis)}, ensure_ascii=False)
+            return len(body.encode('utf-8'))
+
+        entry, size = measure(single_json_body)
+        entry['bytes'] = size
+        report['export']['single_json_body'] = entry
+        return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows), indent=2))
@@ -0,0 +1,142 @@
+"""合成测试数据：Terapeak 风格的 CSV 导出、商品缩略图和 eBay 搜索结果页"""
+import io
+import csv
+import random
+import hashlib
+from html import escape
+from PIL import Image, ImageDraw
+
+BRANDS = ['Bosch', 'Makita', 'Einhell', 'DeWalt', 'Metabo', 'Milwaukee', 'Ryobi', 'Festool', 'Hitachi', 'Black+Decker']
+PRODUCTS = ['Akku Bohrschrauber', 'Schlagbohrmaschine', 'Winkelschleifer', 'Stichsäge', 'Kreissäge', 'Bohrhammer',
+            'Exzenterschleifer', 'Multitool', 'Handkreissäge', 'Schlagschrauber', 'Oberfräse', 'Heißluftgebläse']
+ATTRIBUTES = ['18V', '12V', '230V', 'Brushless', 'mit Koffer', 'Solo', 'inkl. Akku', 'Profi', 'Set', 'kabellos',
+              '2x 4,0 Ah', 'L-Boxx', 'Schnellladegerät', 'Zubehör', 'Gürtelclip', 'LED']
+NOISE = ['NEU', 'OVP', 'Top', 'Angebot', 'Blitzversand', 'Rechnung', 'Garantie', 'Restposten']
+
+CSV_HEADER = [
+    'small src',
+    'research-table-row__link-row-anchor href',
+    'research-table-row__link-row-anchor',
+    'research-table-row__item-with-subtitle',
+    'research-table-row__inner-item',
+    'research-table-row__inner-item (4)'
+]
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def _family_title(rng):
+    attributes = rng.sample(ATTRIBUTES, rng.randint(2, 4))
+    return f"{rng.choice(BRANDS)} {rng.choice(PRODUCTS)} {rng.randint(10, 999)}{rng.choice('ABCDEFXZ')} " + ' '.join(attributes)
+
+
+def _variant_title(rng, title):
+    """生成近似重复标题：随机加词、删词或交换相邻词"""
+    words = title.split()
+    action = rng.random()
+    if action < 0.4:
+        words.insert(rng.randint(0, len(words)), rng.choice(NOISE))
+    elif action < 0.7 and len(words) > 4:
+        del words[rng.randint(3, len(words) - 1)]
+    else:
+        i = rng.randint(2, len(words) - 2)
+        words[i], words[i + 1] = words[i + 1], words[i]
+    return ' '.join(words)
+
+
+def generate_products(count, duplicate_rate=0.3, price_spread=0.1, seed=42):
+    """生成商品列表：duplicate_rate 比例的商品是同一商品族的变体，
+
+    同族商品共用缩略图，价格在族基准价上下 price_spread 范围内浮动。
+    """
+    rng = random.Random(seed)
+    families = []
+    products = []
+    for i in range(count):
+        if families and rng.random() < duplicate_rate:
+            family_id = rng.randrange(len(families))
+            base_title, base_price = families[family_id]
+            title = _variant_title(rng, base_title)
+            price = base_price * (1 + rng.uniform(-price_spread, price_spread))
+        else:
+            family_id = len(families)
+            title = _family_title(rng)
+            price = round(rng.lognormvariate(4, 0.8), 2)
+            families.append((title, price))
+        products.append({
+            'family_id': family_id,
+            'title': title,
+            'price': round(price, 2),
+            'volume': max(1, int(rng.expovariate(0.3))),
+            'sold_date': f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {rng.choice([2024, 2025])}",
+            'item_id': 100000000000 + i
+        })
+    return products
+
+
+def generate_terapeak_csv(count, image_base_url, duplicate_rate=0.3, price_spread=0.1, seed=42):
+    """生成 Terapeak 风格的 CSV 文本"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_HEADER)
+    for product in generate_products(count, duplicate_rate, price_spread, seed):
+        writer.writerow([
+            f"{image_base_url}/img/{product['family_id']}.jpg",
+            f"https://www.ebay.de/itm/{product['item_id']}",
+            product['title'],
+            f"€ {product['price']:.2f}".replace('.', ','),
+            str(product['volume']),
+            product['sold_date']
+        ])
+    return buf.getvalue()
+
+
+def generate_thumbnail(key, size=96):
+    """根据 key 生成确定性的 JPEG 缩略图（同一 key 总是生成同一张图）"""
+    rng = random.Random(int(hashlib.md5(str(key).encode('utf-8')).hexdigest()[:8], 16))
+    image = Image.new('RGB', (size, size), tuple(rng.randint(180, 255) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.randint(3, 7)):
+        x0, y0 = rng.randint(0, size - 20), rng.randint(0, size - 20)
+        box = (x0, y0, x0 + rng.randint(10, size // 2), y0 + rng.randint(10, size // 2))
+        color = tuple(rng.randint(0, 200) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle(box, fill=color)
+        else:
+            draw.ellipse(box, fill=color)
+    buf = io.BytesIO()
+    image.save(buf, 'JPEG', quality=80)
+    return buf.getvalue()
+
+
+def generate_result_titles(count, near_duplicate_rate=0.3, seed=42):
+    """生成搜索结果标题，返回 (标题列表, 实际注入的近似重复数)"""
+    rng = random.Random(seed)
+    titles = []
+    seen = set()
+    near_duplicates = 0
+    while len(titles) < count:
+        if titles and rng.random() < near_duplicate_rate:
+            title = _variant_title(rng, rng.choice(titles))
+            is_duplicate = True
+        else:
+            title = _family_title(rng)
+            is_duplicate = False
+        # 抓取器会去掉完全相同的标题，这里也保持唯一
+        if title in seen:
+            continue
+        seen.add(title)
+        titles.append(title)
+        near_duplicates += is_duplicate
+    return titles, near_duplicates
+
+
+def generate_result_page(titles, next_url=None):
+    """生成 eBay 搜索结果页 HTML"""
+    items = '\n'.join(
+        f'<li class="s-item"><div class="s-item__info"><a href="https://www.ebay.de/itm/{i}">'
+        f'<h3 class="s-item__title">{escape(title)}</h3></a></div></li>'
+        for i, title in enumerate(titles)
+    )
+    pagination = f'<a rel="next" class="pagination__next" href="{escape(next_url)}">Weiter</a>' if next_url else ''
+    return f'<!DOCTYPE html><html><body><ul class="srp-results">\n{items}\n</ul>{pagination}</body></html>'
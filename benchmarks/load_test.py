@@ -0,0 +1,126 @@
+"""并发上传压测：开发服务器（单进程）vs 预 fork 生产服务器（src/server.py）
+
+每个请求上传一份不同的 CSV，但所有 CSV 引用同一批缩略图（来自本地测试服务器），
+因此生产模式下一个工作进程算出的图片指纹可以被其他工作进程直接复用。
+
+用法: python benchmarks/load_test.py --requests 40 --concurrency 8 --workers 4 --rows 200 --latency 0.02
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+
+from benchmarks.generators import generate_terapeak_csv
+from benchmarks.server import BenchServer
+
+DEV_SERVER_CODE = """
+import sys
+from src.main import app
+app.run(host='127.0.0.1', port=int(sys.argv[1]), threaded=True, debug=False, use_reloader=False)
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, workers, max_connections, store_dir):
+    env = dict(
+        os.environ,
+        FINGERPRINT_STORE_PATH=os.path.join(store_dir, 'fingerprints.bin'),
+        RESULT_STORE_DIR=os.path.join(store_dir, 'results'),
+        SIMILARITY_INDEX_DIR=os.path.join(store_dir, 'similarity_index'),
+        PROFILE_SAMPLE_RATE='0'
+    )
+    if mode == 'dev':
+        command = [sys.executable, '-c', DEV_SERVER_CODE, str(port)]
+    else:
+        command = [sys.executable, os.path.join('src', 'server.py'), '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', str(workers), '--max-connections', str(max_connections)]
+    proc = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/csv/test", timeout=1).ok:
+                return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{mode} 服务器启动超时")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else None
+
+
+def run_load(mode, csv_bodies, args):
+    port = free_port()
+    with tempfile.TemporaryDirectory(prefix=f'ebay-load-{mode}-') as store_dir:
+        proc = start_server(mode, port, args.workers, args.max_connections, store_dir)
+        url = f"http://127.0.0.1:{port}/api/csv/upload"
+
+        def upload(body):
+            start = time.perf_counter()
+            response = requests.post(url, files={'files': ('load.csv', body, 'text/csv')}, timeout=600)
+            return time.perf_counter() - start, response.status_code
+
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                results = list(pool.map(upload, csv_bodies))
+            elapsed = time.perf_counter() - start
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    latencies = [latency for latency, _ in results]
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, status in results if status != 200),
+        'seconds': elapsed,
+        'requests_per_second': len(results) / elapsed,
+        'p50_seconds': percentile(latencies, 0.5),
+        'p95_seconds': percentile(latencies, 0.95)
+    }
+
+
+def run(requests_count=40, concurrency=8, workers=4, max_connections=64, rows=200, latency=0.02, modes=('dev', 'prefork')):
+    args = argparse.Namespace(concurrency=concurrency, workers=workers, max_connections=max_connections)
+    report = {}
+    with BenchServer(latency=latency) as server:
+        # 每个请求的 CSV 内容不同（不同随机种子），但商品族编号重叠，缩略图 URL 相同
+        csv_bodies = [generate_terapeak_csv(rows, server.base_url, seed=i).encode('utf-8') for i in range(requests_count)]
+        for mode in modes:
+            requests_before = server.requests
+            report[mode] = run_load(mode, csv_bodies, args)
+            report[mode]['image_requests'] = server.requests - requests_before
+    if 'dev' in report and 'prefork' in report:
+        report['speedup'] = report['prefork']['requests_per_second'] / report['dev']['requests_per_second']
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-connections', type=int, default=64)
+    parser.add_argument('--rows', type=int, default=200, help='每个 CSV 的商品数')
+    parser.add_argument('--latency', type=float, default=0.02, help='本地图片服务器每个请求的延迟（秒）')
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests, args.concurrency, args.workers, args.max_connections, args.rows, args.latency),
+                     indent=2))
@@ -0,0 +1,113 @@
+"""离线（out-of-core）分析基准：不同输入规模下的峰值 RSS 和耗时，验证内存只与块大小有关
+
+每个规模在单独的子进程中运行（峰值 RSS 取 /proc/self/status 的 VmHWM），不下载图片（use_images=False）。
+对照组是现有的整表解析（parse_csv_data），超过 --compare-max 的规模不运行对照组。
+
+用法: python benchmarks/out_of_core.py [--sizes 10000,100000,1000000] [--chunk-rows 50000] [--memory-cap-mb 512]
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generators import CSV_HEADER, generate_products
+
+
+def write_csv(path, count, seed=42):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for product in generate_products(count, seed=seed):
+            writer.writerow([
+                f"http://bench.local/img/{product['family_id']}.jpg",
+                f"https://www.ebay.de/itm/{product['item_id']}",
+                product['title'],
+                f"€ {product['price']:.2f}".replace('.', ','),
+                str(product['volume']),
+                product['sold_date']
+            ])
+
+
+def vm_hwm_mb():
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith('VmHWM:')) / 1024
+
+
+def child(mode, csv_path, chunk_rows, memory_cap_mb):
+    """子进程：导入完成后记录基线，再运行一次分析，输出 JSON"""
+    from src.routes import csv_analyzer_simple
+    from src.utils.analysis_store import AnalysisStore
+    from src.utils.out_of_core import OutOfCoreAnalyzer
+    import numpy  # noqa: F401  基线包含 numpy
+    baseline = vm_hwm_mb()
+
+    start = time.perf_counter()
+    if mode == 'out_of_core':
+        with tempfile.TemporaryDirectory(prefix='ebay-analysis-') as root:
+            analysis = AnalysisStore(root).create()
+            OutOfCoreAnalyzer(
+                analysis, csv_analyzer_simple.parse_product_row, csv_analyzer_simple.fingerprint_for_url,
+                csv_analyzer_simple.is_similar_pair, chunk_rows=chunk_rows, memory_cap_mb=memory_cap_mb, use_images=False
+            ).run([(csv_path, 'bench.csv')])
+            meta = analysis.read_meta()
+            disk_mb = sum(os.path.getsize(os.path.join(analysis.path, name)) for name in os.listdir(analysis.path)) / 1024 / 1024
+        result = {key: meta.get(key) for key in ('rows', 'groups', 'products_in_groups', 'candidate_pairs',
+                                                 'coarse_passed', 'verified_edges', 'settings')}
+        result['disk_mb'] = disk_mb
+    else:
+        with open(csv_path, encoding='utf-8') as f:
+            products = csv_analyzer_simple.parse_csv_data(f.read(), 'bench.csv')
+        result = {'rows': len(products)}
+    result.update(seconds=time.perf_counter() - start, baseline_rss_mb=baseline, peak_rss_mb=vm_hwm_mb())
+    result['peak_rss_growth_mb'] = result['peak_rss_mb'] - baseline
+    print(json.dumps(result))
+
+
+def run_child(mode, csv_path, chunk_rows, memory_cap_mb):
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, csv_path,
+         '--chunk-rows', str(chunk_rows), '--memory-cap-mb', str(memory_cap_mb)],
+        check=True, capture_output=True, text=True, cwd=ROOT
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(sizes=(10000, 100000, 1000000), chunk_rows=50000, memory_cap_mb=512, compare_max=100000):
+    report = {'chunk_rows': chunk_rows, 'memory_cap_mb': memory_cap_mb, 'sizes': {}}
+    with tempfile.TemporaryDirectory(prefix='ebay-ooc-bench-') as tmp_dir:
+        for size in sizes:
+            csv_path = os.path.join(tmp_dir, f"{size}.csv")
+            write_csv(csv_path, size)
+            entry = {'csv_mb': os.path.getsize(csv_path) / 1024 / 1024,
+                     'out_of_core': run_child('out_of_core', csv_path, chunk_rows, memory_cap_mb)}
+            if size <= compare_max:
+                entry['in_memory_parse'] = run_child('in_memory', csv_path, chunk_rows, memory_cap_mb)
+            os.remove(csv_path)
+            report['sizes'][size] = entry
+            print(f"size={size} {json.dumps(entry, ensure_ascii=False)}", file=sys.stderr)
+
+    growth = [entry['out_of_core']['peak_rss_growth_mb'] for entry in report['sizes'].values()]
+    report['out_of_core_peak_rss_growth_range_mb'] = [min(growth), max(growth)]
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--chunk-rows', type=int, default=50000)
+    parser.add_argument('--memory-cap-mb', type=int, default=512)
+    parser.add_argument('--compare-max', type=int, default=100000, help='对照组（整表解析）的最大规模')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'CSV'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child[0], args.child[1], args.chunk_rows, args.memory_cap_mb)
+    else:
+        sizes = [int(size) for size in args.sizes.split(',') if size]
+        print(json.dumps(run(sizes, args.chunk_rows, args.memory_cap_mb, args.compare_max), indent=2))
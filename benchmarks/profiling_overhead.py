@@ -0,0 +1,76 @@
+"""测量请求分析钩子关闭时的额外开销
+
+用法: python benchmarks/profiling_overhead.py [--requests 20000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+from src.utils.profiling import profiled
+
+
+def build_app():
+    app = Flask(__name__)
+
+    @app.route('/plain')
+    def plain():
+        return jsonify({'ok': True})
+
+    @app.route('/hooked')
+    @profiled('hooked')
+    def hooked():
+        return jsonify({'ok': True})
+
+    return app
+
+
+def time_requests(client, path, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get(path)
+    return (time.perf_counter() - start) / count
+
+
+def time_wrapper_calls(app, count):
+    """只测量装饰器本身（不含 WSGI 往返）的开销"""
+    plain = app.view_functions['plain']
+    hooked = app.view_functions['hooked']
+    results = {}
+    with app.test_request_context('/hooked'):
+        for name, view in (('plain', plain), ('hooked', hooked)):
+            start = time.perf_counter()
+            for _ in range(count):
+                view()
+            results[name] = (time.perf_counter() - start) / count
+    return results
+
+
+def run(requests_count=20000):
+    app = build_app()
+    client = app.test_client()
+    # 预热
+    time_requests(client, '/plain', 200)
+    time_requests(client, '/hooked', 200)
+
+    plain_request = time_requests(client, '/plain', requests_count)
+    hooked_request = time_requests(client, '/hooked', requests_count)
+    calls = time_wrapper_calls(app, requests_count)
+    return {
+        'requests': requests_count,
+        'request_us': {'plain': plain_request * 1e6, 'hooked': hooked_request * 1e6},
+        'request_overhead_us': (hooked_request - plain_request) * 1e6,
+        'view_call_us': {name: seconds * 1e6 for name, seconds in calls.items()},
+        'wrapper_overhead_us': (calls['hooked'] - calls['plain']) * 1e6
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests), indent=2))
@@ -0,0 +1,259 @@
+"""可复现的性能基准：合成数据 + 本地图片/结果页服务器，结果写入 JSON 便于回归对比
+
+用法:
+    python benchmarks/run.py                                  # 默认场景和规模
+    python benchmarks/run.py --sizes 100,1000,10000,100000 --scenarios parse,keywords
+    python benchmarks/run.py --latency 0.02 --error-rate 0.01 --output results.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 基准测试不需要模拟真人访问间隔，也不应读写正式缓存目录
+BENCH_DIR = tempfile.mkdtemp(prefix='ebay-bench-')
+os.environ.setdefault('SCRAPER_HOST_RATE', '1000')
+os.environ.setdefault('SCRAPER_HOST_BURST', '100')
+os.environ.setdefault('SCRAPER_HOST_JITTER', '0')
+os.environ.setdefault('SCRAPER_CACHE_DIR', os.path.join(BENCH_DIR, 'page_cache'))
+os.environ.setdefault('PROFILE_DIR', os.path.join(BENCH_DIR, 'profiles'))
+os.environ.setdefault('FINGERPRINT_STORE_PATH', os.path.join(BENCH_DIR, 'fingerprints.bin'))
+os.environ.setdefault('RESULT_STORE_DIR', os.path.join(BENCH_DIR, 'results'))
+os.environ.setdefault('SIMILARITY_INDEX_DIR', os.path.join(BENCH_DIR, 'similarity_index'))
+os.environ.setdefault('ANALYSIS_DIR', os.path.join(BENCH_DIR, 'analyses'))
+
+from benchmarks.generators import generate_terapeak_csv, generate_result_titles
+from benchmarks.server import BenchServer
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+SCENARIOS = {}
+
+
+def scenario(name):
+    """注册基准场景：函数签名为 (size, context) -> dict"""
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@scenario('parse')
+def bench_parse(size, ctx):
+    from src.routes.csv_analyzer_simple import parse_csv_data
+    content = ctx.csv(size)
+    start = time.perf_counter()
+    products = parse_csv_data(content, 'bench.csv')
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'rows': len(products), 'rows_per_second': len(products) / elapsed}
+
+
+@scenario('keywords')
+def bench_keywords(size, ctx):
+    from src.routes.csv_analyzer_simple import parse_csv_data
+    from src.utils.keyword_engine import KeywordCounter
+    titles = [product['title'] for product in parse_csv_data(ctx.csv(size), 'bench.csv')]
+    start = time.perf_counter()
+    counter = KeywordCounter().add_titles(titles)
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'titles_per_second': len(titles) / elapsed,
+        'exact': all(counter.is_exact(n) for n in counter.ngram_sizes),
+        'top_bigram': counter.most_common(1, 2)
+    }
+
+
+@scenario('analyze')
+def bench_analyze(size, ctx):
+    from src.routes import csv_analyzer_simple
+    if size > ctx.args.max_analyze:
+        return {'skipped': f'size > --max-analyze ({ctx.args.max_analyze})，两两比较耗时过长'}
+    products = csv_analyzer_simple.parse_csv_data(ctx.csv(size), 'bench.csv')
+    csv_analyzer_simple.image_hash_cache.clear()
+    requests_before = ctx.server.requests
+    start = time.perf_counter()
+    groups, _, _ = csv_analyzer_simple.find_similar_products_simple(products)
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'products_per_second': size / elapsed,
+        'groups': len(groups),
+        'products_in_groups': sum(len(group) for group in groups.values()),
+        'image_requests': ctx.server.requests - requests_before
+    }
+
+
+@scenario('scrape')
+def bench_scrape(size, ctx):
+    from src.routes.title_scraper import scrape_ebay_titles
+    # size 表示抓取的搜索 URL 数量（最多 20 个，每个最多 4 页）
+    urls = [ctx.server.search_url(f"bench query {i}") for i in range(min(size, 20))]
+    start = time.perf_counter()
+    titles = 0
+    for url in urls:
+        titles += len(scrape_ebay_titles(url, max_pages=4, use_cache=False))
+    elapsed = time.perf_counter() - start
+    return {'seconds': elapsed, 'urls': len(urls), 'titles': titles, 'pages_per_second': len(urls) * 4 / elapsed}
+
+
+@scenario('dedup')
+def bench_dedup(size, ctx):
+    from src.utils.simhash import dedup_titles
+    titles, injected = generate_result_titles(size, ctx.args.duplicate_rate, seed=size)
+    start = time.perf_counter()
+    _, _, stats = dedup_titles(titles)
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'titles_per_second': size / elapsed,
+        'injected_near_duplicates': injected,
+        'detected_near_duplicates': stats['near_duplicates'],
+        'dedup_rate': stats['dedup_rate'],
+        'recall_estimate': round(stats['near_duplicates'] / injected, 3) if injected else None
+    }
+
+
+@scenario('profiling_overhead')
+def bench_profiling_overhead(size, ctx):
+    from benchmarks.profiling_overhead import run
+    return run(min(size, 20000))
+
+
+@scenario('startup')
+def bench_startup(size, ctx):
+    from benchmarks.startup import run
+    return run()
+
+
+@scenario('static')
+def bench_static(size, ctx):
+    from benchmarks.static_assets import run
+    return run(min(size, 5000))
+
+
+@scenario('users')
+def bench_users(size, ctx):
+    from benchmarks.users import run
+    return run(users=size, single=min(size, 2000))
+
+
+@scenario('similar')
+def bench_similar(size, ctx):
+    from benchmarks.similar import run
+    return run(products_count=size)
+
+
+@scenario('out_of_core')
+def bench_out_of_core(size, ctx):
+    from benchmarks.out_of_core import run
+    return run(sizes=[size])
+
+
+@scenario('export')
+def bench_export(size, ctx):
+    from benchmarks.export import run
+    return run(rows=size)
+
+
+@scenario('trends')
+def bench_trends(size, ctx):
+    from benchmarks.trends import run
+    return run(rows=size)
+
+
+@scenario('load')
+def bench_load(size, ctx):
+    from benchmarks.load_test import run
+    # size 表示每个上传 CSV 的商品数
+    return run(rows=min(size, ctx.args.max_analyze), latency=ctx.args.latency)
+
+
+class BenchContext:
+    """场景共享的上下文：命令行参数、本地服务器和按规模缓存的 CSV"""
+
+    def __init__(self, args, server):
+        self.args = args
+        self.server = server
+        self._csv_cache = {}
+
+    def csv(self, size):
+        if size not in self._csv_cache:
+            self._csv_cache[size] = generate_terapeak_csv(
+                size, self.server.base_url, self.args.duplicate_rate, self.args.price_spread, self.args.seed
+            )
+        return self._csv_cache[size]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='商品数量，逗号分隔')
+    parser.add_argument('--scenarios', default='parse,keywords,analyze,scrape,dedup', help=f"可选: {','.join(SCENARIOS)}")
+    parser.add_argument('--duplicate-rate', type=float, default=0.3)
+    parser.add_argument('--price-spread', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.0, help='本地服务器每个请求的延迟（秒）')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--max-analyze', type=int, default=2000, help='相似度分析场景的最大规模')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='结果 JSON 路径（默认 benchmarks/results/<时间>.json）')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    names = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+
+    results = []
+    with BenchServer(latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate) as server:
+        ctx = BenchContext(args, server)
+        for name in names:
+            for size in sizes:
+                print(f"[{name}] size={size} ...", file=sys.stderr)
+                rss_before = peak_rss_mb()
+                try:
+                    metrics = SCENARIOS[name](size, ctx)
+                except Exception as e:
+                    metrics = {'error': f"{type(e).__name__}: {e}"}
+                metrics['peak_rss_mb'] = peak_rss_mb()
+                metrics['peak_rss_growth_mb'] = metrics['peak_rss_mb'] - rss_before
+                results.append({'scenario': name, 'size': size, **metrics})
+                print(f"[{name}] size={size} {json.dumps(metrics, ensure_ascii=False, default=str)}", file=sys.stderr)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': vars(args),
+        'results': results
+    }
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    print(f"结果已写入 {output}", file=sys.stderr)
+    return report
+
+
+if __name__ == '__main__':
+    main()
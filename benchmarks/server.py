@@ -0,0 +1,140 @@
+"""本地测试服务器：提供合成缩略图和 eBay 搜索结果页，可配置延迟和错误率
+
+用法: python benchmarks/server.py --port 8765 --latency 0.05 --error-rate 0.01
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generators import generate_thumbnail, generate_result_titles, generate_result_page
+
+TITLES_PER_PAGE = 60
+
+
+@lru_cache(maxsize=4096)
+def _thumbnail(key):
+    return generate_thumbnail(key)
+
+
+@lru_cache(maxsize=256)
+def _result_page(query, page, pages, near_duplicate_rate, base_url):
+    titles, _ = generate_result_titles(TITLES_PER_PAGE, near_duplicate_rate, seed=f"{query}-{page}")
+    next_url = None
+    if page < pages:
+        next_url = f"{base_url}/ebay/sch?{urlencode({'_nkw': query, '_pgn': page + 1})}"
+    return generate_result_page(titles, next_url).encode('utf-8')
+
+
+class BenchServer:
+    """在后台线程中运行的本地 HTTP 服务器"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, latency_jitter=0.0, error_rate=0.0,
+                 pages=4, near_duplicate_rate=0.3, pages_dir=None, seed=0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.pages = pages
+        self.near_duplicate_rate = near_duplicate_rate
+        self.pages_dir = pages_dir  # 保存的真实结果页目录（<查询词>_<页码>.html），存在时优先使用
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def search_url(self, query):
+        return f"{self.base_url}/ebay/sch?{urlencode({'_nkw': query, '_pgn': 1})}"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                    delay = server.latency + server.rng.uniform(0, server.latency_jitter)
+                    fail = server.rng.random() < server.error_rate
+                    if fail:
+                        server.errors += 1
+                if delay:
+                    time.sleep(delay)
+                if fail:
+                    return self._send(503, b'Service Unavailable', 'text/plain')
+
+                parts = urlsplit(self.path)
+                if parts.path.startswith('/img/'):
+                    key = os.path.splitext(os.path.basename(parts.path))[0]
+                    return self._send(200, _thumbnail(key), 'image/jpeg')
+                if parts.path == '/ebay/sch':
+                    query = parse_qs(parts.query)
+                    term = query.get('_nkw', [''])[0]
+                    page = int(query.get('_pgn', ['1'])[0])
+                    return self._send(200, server.result_page(term, page), 'text/html; charset=utf-8')
+                return self._send(404, b'Not Found', 'text/plain')
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def result_page(self, query, page):
+        if self.pages_dir:
+            path = os.path.join(self.pages_dir, f"{query}_{page}.html")
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    return f.read()
+        return _result_page(query, page, self.pages, self.near_duplicate_rate, self.base_url)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='bench-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--pages-dir')
+    args = parser.parse_args()
+
+    server = BenchServer(port=args.port, latency=args.latency, latency_jitter=args.latency_jitter,
+                         error_rate=args.error_rate, pages_dir=args.pages_dir)
+    print(f"测试服务器已启动: {server.base_url}  示例: {server.search_url('akku bohrschrauber')}")
+    server.httpd.serve_forever()
@@ -0,0 +1,126 @@
+"""相似商品索引基准：构建耗时、磁盘大小、mmap 加载耗时和 /api/csv/similar 查询延迟
+
+再上传一小批商品，测量并入现有索引（不重新解析已有商品）的耗时。
+
+用法: python benchmarks/similar.py [--products 1000000] [--queries 200] [--add-batch 1000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generators import generate_products
+
+
+def synthetic_phash(family_id, rng, flips=4):
+    """同族商品共用图片：族指纹上随机翻转几位模拟缩略图压缩差异"""
+    value = int.from_bytes(hashlib.blake2b(str(family_id).encode(), digest_size=8).digest(), 'little')
+    for _ in range(rng.randint(0, flips)):
+        value ^= 1 << rng.randrange(64)
+    return value
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': latencies[len(latencies) // 2],
+        'p95_ms': latencies[int(len(latencies) * 0.95)],
+        'max_ms': latencies[-1]
+    }
+
+
+def index_product(product):
+    return {
+        'title': product['title'],
+        'price_numeric': product['price'],
+        'volume_numeric': product['volume'],
+        'total_sales': product['price'] * product['volume'],
+        'image_url': f"http://bench.local/img/{product['family_id']}.jpg",
+        'product_url': f"https://www.ebay.de/itm/{product['item_id']}",
+        'last_sold_time': product['sold_date'],
+        'source_file': 'bench.csv'
+    }
+
+
+def run(products_count=1000000, queries=200, k=10, add_batch=1000):
+    from src.main import create_app
+    from src.routes import csv_analyzer_simple
+    from src.utils.similarity_index import SimilarityIndexStore
+
+    rng = random.Random(0)
+    products, phashes = [], []
+    for product in generate_products(products_count, seed=1):
+        products.append(index_product(product))
+        phashes.append(synthetic_phash(product['family_id'], rng))
+
+    with tempfile.TemporaryDirectory(prefix='ebay-similar-') as index_dir:
+        store = SimilarityIndexStore(index_dir)
+        start = time.perf_counter()
+        store.add_products(products, phashes)
+        build_seconds = time.perf_counter() - start
+        del products, phashes
+
+        # 新的 store 模拟进程重启：只映射磁盘上的索引，不重建
+        store = SimilarityIndexStore(index_dir)
+        start = time.perf_counter()
+        index = store.current()
+        load_ms = (time.perf_counter() - start) * 1000
+        disk_mb = sum(os.path.getsize(os.path.join(index.path, name)) for name in os.listdir(index.path)) / 1024 / 1024
+
+        csv_analyzer_simple.similarity_index = store
+        client = create_app().test_client()
+        report = {
+            'products': len(index),
+            'build_seconds': build_seconds,
+            'disk_mb': disk_mb,
+            'mmap_load_ms': load_ms
+        }
+        for label, make_body in (
+            ('by_id', lambda i: {'id': index.product_id(i), 'k': k}),
+            ('by_title_price', lambda i: {'title': index.record(i)['title'], 'price': index.record(i)['price_numeric'], 'k': k}),
+            ('by_id_no_price_window', lambda i: {'id': index.product_id(i), 'k': k, 'max_price_diff': 1})
+        ):
+            latencies = []
+            for _ in range(queries):
+                body = make_body(rng.randrange(len(index)))
+                start = time.perf_counter()
+                response = client.post('/api/csv/similar', json=body)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.get_json()
+            report[label] = percentiles(latencies)
+
+        # 再上传一批商品：一半替换已有商品（同一链接），一半是新商品；查询用的编号不应改变
+        batch, batch_phashes = [], []
+        for i, product in enumerate(generate_products(add_batch, seed=2)):
+            if i % 2:
+                product['item_id'] += products_count
+            batch.append(index_product(product))
+            batch_phashes.append(synthetic_phash(product['family_id'], rng))
+        probe = rng.randrange(len(index))
+        probe_id, probe_record = index.product_id(probe), index.record(probe)
+        start = time.perf_counter()
+        store.add_products(batch, batch_phashes)
+        report['incremental_add'] = {'products': add_batch, 'seconds': time.perf_counter() - start}
+        updated = store.current()
+        position = updated.find(int(probe_id, 16))
+        assert len(updated) == len(index) + add_batch // 2
+        assert position is not None and (updated.record(position) == probe_record
+                                         or probe_record['product_url'] in {product['product_url'] for product in batch})
+        return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--add-batch', type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.products, args.queries, args.k, args.add_batch), indent=2))
@@ -0,0 +1,72 @@
+"""用 python -X importtime 测量应用冷启动时间和单进程内存（延迟导入 vs 启动时预热）
+
+用法: python benchmarks/startup.py [--repeat 5]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD_CODE = """
+import sys, json, resource, time
+start = time.perf_counter()
+import src.main
+elapsed = time.perf_counter() - start
+# Linux 上 ru_maxrss 会跨 exec 继承父进程的峰值，优先读取本进程的 VmHWM
+try:
+    with open('/proc/self/status') as f:
+        rss_mb = next(int(line.split()[1]) for line in f if line.startswith('VmHWM:')) / 1024
+except (OSError, StopIteration):
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({
+    'import_seconds': elapsed,
+    'rss_mb': rss_mb,
+    'modules_loaded': len(sys.modules)
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 {模块名: 累计微秒}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line.split(':', 1)[1].split('|')]
+        modules[name] = int(cumulative_us)
+    return modules
+
+
+def measure(warm_up_mode):
+    env = dict(os.environ, APP_WARM_UP=warm_up_mode)
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_CODE],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(proc.stderr)
+    result['importtime_src_main_ms'] = modules.get('src.main', 0) / 1000
+    # 自身耗时最多的模块
+    result['slowest_modules'] = sorted(modules, key=modules.get, reverse=True)[1:11]
+    return result
+
+
+def run(repeat=5):
+    report = {}
+    for label, mode in (('lazy', '0'), ('eager_warm_up', '1')):
+        runs = [measure(mode) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run['import_seconds'])
+        report[label] = best
+    report['startup_saving_ms'] = (report['eager_warm_up']['import_seconds'] - report['lazy']['import_seconds']) * 1000
+    report['rss_saving_mb'] = report['eager_warm_up']['rss_mb'] - report['lazy']['rss_mb']
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.repeat), indent=2))
@@ -0,0 +1,81 @@
+"""静态资源基准：旧的 send_from_directory 路由 vs 内存预压缩资源层，比较传输字节数和请求延迟
+
+首次访问携带 Accept-Encoding，再次访问携带上次响应的 ETag（条件请求）。
+
+用法: python benchmarks/static_assets.py [--requests 2000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask, send_from_directory
+
+STATIC_DIR = os.path.join(ROOT, 'src', 'static')
+ACCEPT_ENCODING = 'gzip, deflate, br'
+
+
+def legacy_app():
+    """改造前的静态文件路由"""
+    app = Flask(__name__, static_folder=STATIC_DIR)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
+            return send_from_directory(app.static_folder, path)
+        return send_from_directory(app.static_folder, 'index.html')
+
+    return app
+
+
+def current_app():
+    from src.main import create_app
+    return create_app()
+
+
+def measure(client, path, requests_count, headers):
+    sizes = []
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        response = client.get(path, headers=headers)
+        sizes.append(len(response.get_data()))
+        response.close()
+    elapsed = time.perf_counter() - start
+    return {
+        'status': response.status_code,
+        'bytes_per_request': sum(sizes) / len(sizes),
+        'mean_latency_us': elapsed / requests_count * 1e6
+    }
+
+
+def run(requests_count=2000):
+    report = {}
+    for label, app in (('legacy', legacy_app()), ('precompressed', current_app())):
+        client = app.test_client()
+        first = client.get('/', headers={'Accept-Encoding': ACCEPT_ENCODING})
+        revisit_headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if first.headers.get('ETag'):
+            revisit_headers['If-None-Match'] = first.headers['ETag']
+        report[label] = {
+            'content_encoding': first.headers.get('Content-Encoding'),
+            'cache_control': first.headers.get('Cache-Control'),
+            'first_visit': measure(client, '/', requests_count, {'Accept-Encoding': ACCEPT_ENCODING}),
+            'revisit': measure(client, '/', requests_count, revisit_headers),
+            'spa_route': measure(client, '/some/client/route', requests_count, {'Accept-Encoding': ACCEPT_ENCODING})
+        }
+    report['first_visit_bytes_saving'] = 1 - (
+        report['precompressed']['first_visit']['bytes_per_request'] / report['legacy']['first_visit']['bytes_per_request']
+    )
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.requests), indent=2))
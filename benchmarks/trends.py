@@ -0,0 +1,114 @@
+"""销售趋势基准：/api/csv/analyses/<id>/trends 的查询延迟 vs 每次查询重新扫描商品
+
+先用离线分析（不下载图片）生成一个分析目录，再比较：
+  - 预计算：分析完成时生成按天/按周序列的耗时和磁盘大小
+  - 查询：各类时间窗口查询经过 HTTP 路由（test_client）的延迟分位数
+  - 对照组：每次查询对行级 memmap 列（售出日期、分组、销售额）做向量化扫描再取前 k 个，
+    与直接调用 SalesSeries.top（不经过路由）比较
+
+用法: python benchmarks/trends.py [--rows 1000000] [--queries 200]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.out_of_core import write_csv
+from benchmarks.similar import percentiles
+
+QUERIES = {
+    'top_groups_30d': 'by=group&days=30',
+    'top_groups_365d': 'by=group&days=365&series=0',
+    'top_groups_weekly_90d': 'by=group&granularity=week&days=90&metric=volume',
+    'files_daily_30d': 'by=file&days=30'
+}
+
+
+def rescan_top_groups(analysis, rows, start_day, end_day, limit=10):
+    """对照组：不使用预计算序列，扫描全部行"""
+    import numpy as np
+    days = np.asarray(analysis.column('sold_date', rows=rows)).astype(np.int64)
+    group_ids = np.asarray(analysis.column('group_id', rows=rows))
+    selected = (days >= start_day) & (days <= end_day) & (group_ids >= 0)
+    totals = np.bincount(group_ids[selected], weights=analysis.column('total_sales', rows=rows)[selected])
+    limit = min(limit, len(totals))
+    top = np.argpartition(-totals, limit - 1)[:limit]
+    return top[np.argsort(-totals[top])]
+
+
+def run(rows=1000000, queries=200):
+    from src.main import create_app
+    from src.routes import csv_analyzer_simple
+    from src.utils.analysis_store import AnalysisStore
+    from src.utils.out_of_core import OutOfCoreAnalyzer
+    from src.utils.sales_series import SalesSeries, write_sales_series, to_day
+
+    with tempfile.TemporaryDirectory(prefix='ebay-trends-') as tmp_dir:
+        csv_path = os.path.join(tmp_dir, 'bench.csv')
+        write_csv(csv_path, rows)
+        store = AnalysisStore(os.path.join(tmp_dir, 'analyses'))
+        analysis = store.create()
+        start = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            OutOfCoreAnalyzer(analysis, csv_analyzer_simple.parse_product_row, csv_analyzer_simple.fingerprint_for_url,
+                              csv_analyzer_simple.is_similar_pair, use_images=False).run([(csv_path, 'bench.csv')])
+        meta = analysis.read_meta()
+
+        start_series = time.perf_counter()
+        write_sales_series(analysis, meta['rows'], meta['settings']['chunk_rows'])
+        series_seconds = time.perf_counter() - start_series
+        series_dir = analysis.file('series')
+        series_mb = sum(os.path.getsize(os.path.join(root, name))
+                        for root, _, names in os.walk(series_dir) for name in names) / 1024 / 1024
+        report = {
+            'rows': meta['rows'],
+            'groups': meta['groups'],
+            'rows_with_sold_date': meta['rows_with_sold_date'],
+            'sold_date_range': [meta['sold_date_min'], meta['sold_date_max']],
+            'analysis_seconds': time.perf_counter() - start,
+            'series_build_seconds': series_seconds,
+            'series_disk_mb': series_mb,
+            'queries': {}
+        }
+
+        csv_analyzer_simple.analysis_store = store
+        client = create_app().test_client()
+        for label, query in QUERIES.items():
+            latencies = []
+            for _ in range(queries):
+                query_start = time.perf_counter()
+                response = client.get(f"/api/csv/analyses/{analysis.analysis_id}/trends?{query}")
+                assert response.status_code == 200, response.get_data(as_text=True)
+                latencies.append((time.perf_counter() - query_start) * 1000)
+            report['queries'][label] = {'query': query, **percentiles(latencies),
+                                        'results': len(response.get_json()['results'])}
+
+        # 不经过 HTTP 路由，和对照组比较同样的计算
+        end_day = to_day(meta['sold_date_max'])
+        for label, query_func in (
+            ('precomputed_top_groups_30d',
+             lambda: SalesSeries(analysis).top('group', 'day', end_day - 29, end_day, with_series=False)),
+            ('rescan_top_groups_30d', lambda: rescan_top_groups(analysis, meta['rows'], end_day - 29, end_day))
+        ):
+            latencies = []
+            for _ in range(max(queries // 10, 5)):
+                query_start = time.perf_counter()
+                query_func()
+                latencies.append((time.perf_counter() - query_start) * 1000)
+            report[label] = percentiles(latencies)
+        report['speedup_p50'] = report['rescan_top_groups_30d']['p50_ms'] / report['precomputed_top_groups_30d']['p50_ms']
+        return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.queries), indent=2))
@@ -0,0 +1,91 @@
+"""用户接口基准：逐条 POST vs 批量导入的写入速度，游标分页与 OFFSET 分页、全量流式列表的延迟
+
+用法: python benchmarks/users.py [--users 1000000] [--single 2000]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BULK_REQUEST_ROWS = 100000  # 每个批量导入请求的用户数
+
+
+def ndjson_users(start, count):
+    return '\n'.join(
+        json.dumps({'username': f"user{i}", 'email': f"user{i}@example.com"}) for i in range(start, start + count)
+    )
+
+
+def timed_get(client, url, repeat=20):
+    """返回多次请求的中位数延迟（毫秒）和响应体大小"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        body = response.get_data()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {'median_ms': latencies[len(latencies) // 2], 'bytes': len(body)}
+
+
+def run(users=1000000, single=2000):
+    from src.main import create_app
+    from src.models.user import db
+
+    with tempfile.TemporaryDirectory(prefix='ebay-users-') as db_dir:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(db_dir, 'users.db')}"})
+        client = app.test_client()
+        report = {'users': users}
+
+        # 改造前的方式：每个用户一个请求、一次提交
+        start = time.perf_counter()
+        for i in range(single):
+            client.post('/api/users', json={'username': f"single{i}", 'email': f"single{i}@example.com"})
+        elapsed = time.perf_counter() - start
+        report['single_post'] = {'users': single, 'seconds': elapsed, 'inserts_per_second': single / elapsed}
+
+        start = time.perf_counter()
+        for offset in range(0, users, BULK_REQUEST_ROWS):
+            response = client.post('/api/users/bulk', data=ndjson_users(offset, min(BULK_REQUEST_ROWS, users - offset)),
+                                   content_type='application/x-ndjson')
+            assert response.status_code == 200, response.get_json()
+        elapsed = time.perf_counter() - start
+        report['bulk'] = {'users': users, 'seconds': elapsed, 'inserts_per_second': users / elapsed}
+
+        # 重复导入同一批用户：全部走 ON CONFLICT DO UPDATE
+        sample = min(users, BULK_REQUEST_ROWS)
+        start = time.perf_counter()
+        client.post('/api/users/bulk', data=ndjson_users(0, sample), content_type='application/x-ndjson')
+        elapsed = time.perf_counter() - start
+        report['bulk_upsert_existing'] = {'users': sample, 'seconds': elapsed, 'upserts_per_second': sample / elapsed}
+
+        total = users + single
+        report['list'] = {
+            'keyset_first_page': timed_get(client, '/api/users?limit=100'),
+            'keyset_last_page': timed_get(client, f"/api/users?limit=100&after_id={total - 100}"),
+        }
+        # 对比：OFFSET 分页在深页需要扫描并丢弃前面所有行
+        with app.app_context():
+            start = time.perf_counter()
+            db.session.execute(db.text('SELECT id, username, email FROM user ORDER BY id LIMIT 100 OFFSET :offset'),
+                               {'offset': total - 100}).all()
+            report['list']['offset_last_page_ms'] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        response = client.get('/api/users')
+        size = sum(len(chunk) for chunk in response.response)
+        report['list']['stream_all'] = {'seconds': time.perf_counter() - start, 'bytes': size}
+        return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--single', type=int, default=2000, help='逐条 POST 的用户数（用于对比）')
+    args = parser.parse_args()
+    print(json.dumps(run(args.users, args.single), indent=2))
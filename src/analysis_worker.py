@@ -0,0 +1,33 @@
+"""离线（out-of-core）分析子进程：每次分析在单独的进程中运行
+
+用法: python src/analysis_worker.py <分析目录>
+
+参数（settings）和上传文件列表（inputs）从分析目录的 meta.json 读取，进度和结果也写回 meta.json。
+单独的进程让 memory_cap_mb 只统计这一次分析的内存：同一工作进程中的其他请求和其他分析不会
+让它超限，它占用的内存也在进程退出后全部归还操作系统。
+"""
+import os
+import sys
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.routes.csv_analyzer_simple import parse_product_row, fingerprint_for_url, is_similar_pair
+from src.utils.analysis_store import Analysis
+from src.utils.out_of_core import OutOfCoreAnalyzer
+
+
+def main(path):
+    analysis = Analysis(path)
+    meta = analysis.read_meta()
+    analyzer = OutOfCoreAnalyzer(analysis, parse_product_row, fingerprint_for_url, is_similar_pair, **meta['settings'])
+    analyzer.run([tuple(item) for item in meta['inputs']])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit(__doc__)
+    try:
+        main(sys.argv[1])
+    except Exception:
+        # 错误已写入 meta.json
+        sys.exit(1)
@@ -1,47 +1,117 @@
 import os
 import sys
+import sqlite3
+import threading
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask
 from flask_cors import CORS
+from sqlalchemy import event
 from src.models.user import db
 from src.routes.user import user_bp
 from src.routes.csv_analyzer_simple import csv_analyzer_bp
 from src.routes.title_scraper import title_scraper_bp
+from src.routes.metrics import metrics_bp
+from src.routes.profiles import profiles_bp
+from src.utils.lazy_import import warm_up
+from src.utils.static_assets import StaticAssets, send_asset
 
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# 启用CORS
-CORS(app)
-
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(csv_analyzer_bp, url_prefix='/api/csv')
-app.register_blueprint(title_scraper_bp, url_prefix='/api/scraper')
-
-# uncomment if you need to use database
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-with app.app_context():
-    db.create_all()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+# SQLite 连接参数：WAL 允许读写并发，NORMAL 同步级别在 WAL 下仍然保证崩溃一致性
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 30000)),
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 65536)),
+    'temp_store': 'MEMORY',
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_BYTES', 256 * 1024 * 1024)),
+    'foreign_keys': 'ON'
+}
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """每个新建的 SQLite 连接都设置一遍 PRAGMA（除 journal_mode 外都是连接级别的）"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def create_app(config=None):
+    """创建Flask应用：注册蓝图，重量级依赖（图片处理、HTML解析、翻译）延迟到第一次使用时导入
+
+    APP_WARM_UP 环境变量（或 config['WARM_UP']）控制预热：
+    '0' 不预热（默认），'1' 启动时同步导入，'background' 启动后在后台线程导入。
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+
+    # uncomment if you need to use database
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['WARM_UP'] = os.environ.get('APP_WARM_UP', '0')
+    # 开发模式（debug 或 STATIC_WATCH=1）下静态文件修改后自动重新加载
+    app.config['STATIC_WATCH'] = os.environ.get('STATIC_WATCH', '0') == '1'
+    if config:
+        app.config.update(config)
+    if ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI']:
+        # 每个工作进程一个连接池，SQLite 写操作串行，连接数不必太多
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 8)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 8)),
+            'pool_timeout': 30,
+            'pool_recycle': 3600,
+            'connect_args': {'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000, 'check_same_thread': False}
+        })
+
+    # 启用CORS
+    CORS(app)
+
+    app.register_blueprint(user_bp, url_prefix='/api')
+    app.register_blueprint(csv_analyzer_bp, url_prefix='/api/csv')
+    app.register_blueprint(title_scraper_bp, url_prefix='/api/scraper')
+    app.register_blueprint(metrics_bp, url_prefix='/api')
+    app.register_blueprint(profiles_bp, url_prefix='/api')
+
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', set_sqlite_pragmas)
+            # 数据库文件不在版本库中，新检出的代码可能还没有所在目录
+            db_path = db.engine.url.database
+            if db_path and db_path != ':memory:' and not db_path.startswith('file:'):
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        db.create_all()
+
+    # 静态文件启动时读入内存并预压缩（gzip，安装了 brotli 时还有 br）
+    static_assets = StaticAssets(app.static_folder)
+    app.extensions['static_assets'] = static_assets
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if app.static_folder is None:
+                return "Static folder not configured", 404
+
+        watch = app.debug or app.config['STATIC_WATCH']
+        asset = static_assets.get(path, watch) if path != "" else None
+        if asset is None:
+            asset = static_assets.get('index.html', watch)
+            if asset is None:
+                return "index.html not found", 404
+        return send_asset(asset)
+
+    warm_up_mode = str(app.config['WARM_UP'])
+    if warm_up_mode == 'background':
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+    elif warm_up_mode not in ('', '0'):
+        warm_up()
+
+    return app
+
+app = create_app()
 
 
 if __name__ == '__main__':
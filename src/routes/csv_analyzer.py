@@ -1,16 +1,19 @@
 import os
 import csv
 import io
-import requests
-import cv2
-import numpy as np
-from PIL import Image
 from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
-from skimage.metrics import structural_similarity as ssim
-from sklearn.cluster import DBSCAN
 import tempfile
 import hashlib
+from src.utils.lazy_import import lazy_module
+
+# 重量级依赖延迟到第一次使用时再导入
+requests = lazy_module('requests')
+cv2 = lazy_module('cv2')
+np = lazy_module('numpy')
+Image = lazy_module('PIL.Image')
+skimage_metrics = lazy_module('skimage.metrics')
+sklearn_cluster = lazy_module('sklearn.cluster')
 
 csv_analyzer_bp = Blueprint('csv_analyzer', __name__)
 
@@ -49,7 +52,7 @@ def calculate_image_similarity(img1, img2):
         gray2 = cv2.cvtColor(img2_array, cv2.COLOR_RGB2GRAY)
         
         # 计算结构相似性
-        similarity, _ = ssim(gray1, gray2, full=True)
+        similarity, _ = skimage_metrics.structural_similarity(gray1, gray2, full=True)
         return similarity
     except Exception as e:
         print(f"计算相似度失败: {str(e)}")
@@ -140,7 +143,7 @@ def find_similar_products(products, similarity_threshold=0.8):
         distance_matrix.append(distance_row)
     
     # 使用DBSCAN聚类
-    clustering = DBSCAN(eps=1-similarity_threshold, min_samples=2, metric='precomputed')
+    clustering = sklearn_cluster.DBSCAN(eps=1-similarity_threshold, min_samples=2, metric='precomputed')
     cluster_labels = clustering.fit_predict(distance_matrix)
     
     # 组织结果
@@ -1,22 +1,112 @@
 import os
+import sys
 import csv
 import io
-import requests
-from PIL import Image
-from flask import Blueprint, request, jsonify
+import json
+import shutil
+import subprocess
+from flask import Blueprint, request, jsonify, Response, url_for
 from flask_cors import cross_origin
 import tempfile
 import hashlib
 from concurrent.futures import ThreadPoolExecutor
 import concurrent.futures
+import re
 import time
+import logging
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+from src.utils.keyword_engine import KeywordCounter
+from src.utils.metrics import REGISTRY
+from src.utils.profiling import profiled
+from src.utils.lazy_import import lazy_module
+from src.utils.shared_store import SharedFingerprintStore, ResultStore
+from src.utils.similarity_index import SimilarityIndexStore, key_hash, parse_product_id
+from src.utils.simhash import simhash
+from src.utils.analysis_store import AnalysisStore, ColumnWriter, FINISHED_STATUSES
+from src.utils.out_of_core import product_columns
+from src.utils.group_export import EXPORT_FORMATS, buffered, iter_groups_csv, iter_groups_ndjson, write_group_aggregates
+from src.utils.sales_series import SERIES_DIMENSIONS, SERIES_GRANULARITIES, SERIES_METRICS, SalesSeries, from_day, to_day, write_sales_series
+from werkzeug.utils import secure_filename
+
+# 重量级依赖延迟到第一次使用时再导入
+requests = lazy_module('requests')
+Image = lazy_module('PIL.Image')
+imagehash = lazy_module('imagehash')
+np = lazy_module('numpy')
 
 csv_analyzer_bp = Blueprint('csv_analyzer', __name__)
+# 分析进度只输出调试日志，运行状态看 /api/metrics 中的 analyzer_* 指标
+logger = logging.getLogger(__name__)
 
 # 全局缓存
 image_hash_cache = {}
 similarity_cache = {}
 
+# 跨进程共享的指纹和结果存储（多进程部署时所有工作进程共用）
+DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database')
+FINGERPRINT_STORE_PATH = os.environ.get('FINGERPRINT_STORE_PATH', os.path.join(DATABASE_DIR, 'fingerprints.bin'))
+RESULT_STORE_DIR = os.environ.get('RESULT_STORE_DIR', os.path.join(DATABASE_DIR, 'results'))
+RESULT_STORE_TTL = int(os.environ.get('RESULT_STORE_TTL', 3600))
+RESULT_STORE_MAX_MB = int(os.environ.get('RESULT_STORE_MAX_MB', 256))
+
+_shared_stores = {}
+_shared_stores_lock = threading.Lock()
+
+def get_fingerprint_store():
+    """获取当前进程的共享指纹存储（每个进程单独打开文件，flock 才能在进程间互斥）"""
+    pid = os.getpid()
+    if _shared_stores.get('pid') != pid:
+        # 多个下载线程可能同时第一次调用
+        with _shared_stores_lock:
+            if _shared_stores.get('pid') != pid:
+                try:
+                    store = SharedFingerprintStore(FINGERPRINT_STORE_PATH)
+                except (OSError, ValueError) as e:
+                    print(f"打开共享指纹存储失败: {str(e)}")
+                    store = None
+                _shared_stores.clear()
+                _shared_stores['fingerprints'] = store
+                _shared_stores['pid'] = pid
+    return _shared_stores['fingerprints']
+
+result_store = ResultStore(RESULT_STORE_DIR, ttl=RESULT_STORE_TTL, max_bytes=RESULT_STORE_MAX_MB * 1024 * 1024)
+
+# 相似商品索引：每次上传分析后在后台并入新商品，查询时以 mmap 方式加载
+SIMILARITY_INDEX_DIR = os.environ.get('SIMILARITY_INDEX_DIR', os.path.join(DATABASE_DIR, 'similarity_index'))
+SIMILAR_MAX_K = 100
+SIMILAR_CANDIDATES_PER_RESULT = 10  # 每个返回结果对应的粗排候选数
+similarity_index = SimilarityIndexStore(SIMILARITY_INDEX_DIR)
+
+# 离线（out-of-core）分析：列数据和分组写入磁盘，内存只与块大小有关
+ANALYSIS_DIR = os.environ.get('ANALYSIS_DIR', os.path.join(DATABASE_DIR, 'analyses'))
+# 内存上限（分析子进程开始运行后的内存增量）和块大小同时是默认值和上限，请求只能调小
+ANALYSIS_MEMORY_CAP_MB = int(os.environ.get('ANALYSIS_MEMORY_CAP_MB', 512))
+ANALYSIS_CHUNK_ROWS = int(os.environ.get('ANALYSIS_CHUNK_ROWS', 50000))
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 1))  # 每个工作进程同时运行的分析子进程数，其余排队
+ANALYSIS_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'analysis_worker.py')
+ANALYSIS_TTL_HOURS = float(os.environ.get('ANALYSIS_TTL_HOURS', 168))  # 超过该时长没有更新的分析在创建新分析时删除
+analysis_store = AnalysisStore(ANALYSIS_DIR, ttl=ANALYSIS_TTL_HOURS * 3600)
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='out-of-core')
+TRENDS_DEFAULT_DAYS = 30
+TRENDS_MAX_DAYS = 3660
+TRENDS_MAX_LIMIT = 100
+
+# 性能指标
+ANALYZER_STAGE_SECONDS = REGISTRY.histogram(
+    'analyzer_stage_seconds',
+    'Analyzer stage latency: download/decode/hash per image, candidate_generation/score/group per run, serialize per response',
+    ['stage']
+)
+ANALYZER_RUNS = REGISTRY.counter('analyzer_runs_total', 'Similarity analysis runs')
+ANALYZER_PRODUCTS = REGISTRY.counter('analyzer_products_total', 'Products analyzed')
+ANALYZER_IMAGES = REGISTRY.counter('analyzer_images_total', 'Product images by result (cached fingerprint, downloaded, failed)', ['result'])
+ANALYZER_COMPARISONS = REGISTRY.counter('analyzer_comparisons_total', 'Product pair comparisons by result', ['result'])
+ANALYZER_GROUPS = REGISTRY.counter('analyzer_groups_total', 'Similar groups found')
+ANALYZER_PROGRESS = REGISTRY.gauge('analyzer_progress_ratio', 'Progress of the latest analysis by phase', ['phase'])
+ANALYZER_SKIP_RATIO = REGISTRY.gauge('analyzer_last_skip_ratio', 'Share of comparisons skipped by the quick filter in the latest analysis')
+
 def get_cache_key(url1, url2):
     """生成缓存键"""
     return f"{min(url1, url2)}_{max(url1, url2)}"
@@ -26,32 +116,53 @@ def download_image(url, timeout=10):
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=timeout)
-        response.raise_for_status()
-        
-        # 创建PIL Image对象
-        image = Image.open(io.BytesIO(response.content))
-        # 转换为RGB模式（如果是RGBA或其他模式）
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        with ANALYZER_STAGE_SECONDS.time(stage='download'):
+            response = requests.get(url, headers=headers, timeout=timeout)
+            response.raise_for_status()
+        
+        with ANALYZER_STAGE_SECONDS.time(stage='decode'):
+            # 创建PIL Image对象
+            image = Image.open(io.BytesIO(response.content))
+            # 转换为RGB模式（如果是RGBA或其他模式）
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            else:
+                image.load()
         return image
     except Exception as e:
         print(f"下载图片失败 {url}: {str(e)}")
         return None
-import imagehash
+
+def lookup_image_hash(url):
+    """从进程内缓存或跨进程共享存储中查找图片哈希，未找到返回 None"""
+    if url in image_hash_cache:
+        return image_hash_cache[url]
+    store = get_fingerprint_store()
+    value = store.get(url) if store else None
+    if value is None:
+        return None
+    hash_value = int_to_hash(value)
+    image_hash_cache[url] = hash_value
+    return hash_value
 
 def calculate_image_hash(image, url=None):
     """计算图片的感知哈希值（带缓存）"""
     try:
         # 如果有URL且已缓存，直接返回
-        if url and url in image_hash_cache:
-            return image_hash_cache[url]
+        if url:
+            cached = lookup_image_hash(url)
+            if cached is not None:
+                return cached
         
-        hash_value = imagehash.phash(image)
+        with ANALYZER_STAGE_SECONDS.time(stage='hash'):
+            hash_value = imagehash.phash(image)
         
-        # 缓存结果
+        # 缓存结果（同时写入共享存储，其他工作进程可以直接使用）
         if url:
             image_hash_cache[url] = hash_value
+            store = get_fingerprint_store()
+            if store:
+                store.set(url, hash_to_int(hash_value))
             
         return hash_value
     except Exception as e:
@@ -78,6 +189,62 @@ def parse_price(price_str):
     except:
         return 0.0
 
+# 最后售出时间的常见格式：Terapeak 英文界面（Jun 15, 2025）、ISO、德文界面（15.06.2025 / 15. Juni 2025）、美式斜杠
+SOLD_DATE_FORMATS = ('%b %d, %Y', '%B %d, %Y', '%Y-%m-%d', '%d.%m.%Y', '%m/%d/%Y', '%d %b %Y', '%d %B %Y')
+SOLD_DATE_MONTHS = {
+    'jan': 1, 'feb': 2, 'mär': 3, 'mar': 3, 'apr': 4, 'mai': 5, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'okt': 10, 'oct': 10, 'nov': 11, 'dez': 12, 'dec': 12
+}
+SOLD_DATE_TEXT_RE = re.compile(r'^(\d{1,2})\.?\s+([A-Za-zÄäÖöÜü]+)\.?\s+(\d{4})$')
+
+@lru_cache(maxsize=4096)
+def parse_sold_date(value):
+    """解析最后售出时间，返回 datetime.date，无法识别时返回 None（同一文件中的日期重复很多，结果缓存）"""
+    value = ' '.join(value.split())
+    if not value:
+        return None
+    for date_format in SOLD_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    # strptime 的月份名只认当前 locale（英文），德文月份名单独处理
+    match = SOLD_DATE_TEXT_RE.match(value)
+    if match:
+        month = SOLD_DATE_MONTHS.get(match.group(2)[:3].lower())
+        if month:
+            try:
+                return date(int(match.group(3)), month, int(match.group(1)))
+            except ValueError:
+                return None
+    return None
+
+def parse_product_row(row, filename):
+    """把一行 CSV 解析为商品字典"""
+    product = {
+        'image_url': row.get('small src', '').strip(),
+        'product_url': row.get('research-table-row__link-row-anchor href', '').strip(),
+        'title': row.get('research-table-row__link-row-anchor', '').strip(),
+        'price_without_tax': row.get('research-table-row__item-with-subtitle', '').strip(),
+        'sales_volume': row.get('research-table-row__inner-item', '1').strip(),
+        'last_sold_time': row.get('research-table-row__inner-item (4)', '').strip(),
+        'source_file': filename
+    }
+    
+    # 处理缺失数据
+    if not product['sales_volume'] or product['sales_volume'] == '':
+        product['sales_volume'] = '1'
+    
+    # 计算总销售额
+    price = parse_price(product['price_without_tax'])
+    volume = int(product['sales_volume']) if product['sales_volume'].isdigit() else 1
+    product['total_sales'] = price * volume
+    product['price_numeric'] = price
+    product['volume_numeric'] = volume
+    sold_date = parse_sold_date(product['last_sold_time'])
+    product['sold_date'] = sold_date.isoformat() if sold_date else None
+    return product
+
 def parse_csv_data(csv_content, filename):
     """解析CSV数据"""
     try:
@@ -87,29 +254,7 @@ def parse_csv_data(csv_content, filename):
         
         for i, row in enumerate(csv_reader):
             try:
-                # 解析数据
-                product = {
-                    'image_url': row.get('small src', '').strip(),
-                    'product_url': row.get('research-table-row__link-row-anchor href', '').strip(),
-                    'title': row.get('research-table-row__link-row-anchor', '').strip(),
-                    'price_without_tax': row.get('research-table-row__item-with-subtitle', '').strip(),
-                    'sales_volume': row.get('research-table-row__inner-item', '1').strip(),
-                    'last_sold_time': row.get('research-table-row__inner-item (4)', '').strip(),
-                    'source_file': filename
-                }
-                
-                # 处理缺失数据
-                if not product['sales_volume'] or product['sales_volume'] == '':
-                    product['sales_volume'] = '1'
-                
-                # 计算总销售额
-                price = parse_price(product['price_without_tax'])
-                volume = int(product['sales_volume']) if product['sales_volume'].isdigit() else 1
-                product['total_sales'] = price * volume
-                product['price_numeric'] = price
-                product['volume_numeric'] = volume
-                
-                products.append(product)
+                products.append(parse_product_row(row, filename))
             except Exception as e:
                 print(f"解析CSV文件 {filename} 的第 {i+2} 行失败: {str(e)}") # +2 for header and 0-indexed loop
         
@@ -176,8 +321,8 @@ def quick_filter_by_title_and_price(product1, product2, min_title_similarity=0.3
         print(f"快速过滤失败: {str(e)}")
         return True  # 出错时保守处理，不过滤
 
-def calculate_comprehensive_similarity(product1, product2, img1=None, img2=None):
-    """计算综合相似度"""
+def calculate_comprehensive_similarity(product1, product2, img1=None, img2=None, hash1=None, hash2=None):
+    """计算综合相似度（可直接传入已计算的图片哈希）"""
     try:
         # 图片相似度（权重40%）
         image_similarity = 0.0
@@ -187,6 +332,7 @@ def calculate_comprehensive_similarity(product1, product2, img1=None, img2=None)
             url2 = product2.get('image_url', '')
             hash1 = calculate_image_hash(img1, url1)
             hash2 = calculate_image_hash(img2, url2)
+        if hash1 is not None and hash2 is not None:
             image_similarity = image_hash_similarity(hash1, hash2)
         # 标题相似度（权重40%）
         title_similarity = calculate_title_similarity(product1['title'], product2['title'])
@@ -216,53 +362,122 @@ def calculate_comprehensive_similarity(product1, product2, img1=None, img2=None)
             'price_similarity': 0.0
         }
 
+def passes_similarity_threshold(similarity_result, similarity_threshold=0.5):
+    """是否判定为相似商品"""
+    # 特殊规则：如果标题相似度很高（>0.8）且价格相似度也高（>0.8），降低阈值
+    if (similarity_result['title_similarity'] > 0.8 and 
+        similarity_result['price_similarity'] > 0.8):
+        adjusted_threshold = 0.4
+    else:
+        adjusted_threshold = similarity_threshold
+    return similarity_result['comprehensive_score'] >= adjusted_threshold
+
+def is_similar_pair(product1, product2, phash1=None, phash2=None, similarity_threshold=0.5):
+    """离线分析用：与 find_similar_products_simple 相同的早期过滤和判定规则，图片指纹以整数传入"""
+    if not quick_filter_by_title_and_price(product1, product2):
+        return False
+    similarity_result = calculate_comprehensive_similarity(
+        product1, product2,
+        hash1=int_to_hash(phash1) if phash1 is not None else None,
+        hash2=int_to_hash(phash2) if phash2 is not None else None
+    )
+    return passes_similarity_threshold(similarity_result, similarity_threshold)
+
+def hash_to_int(hash_value):
+    """ImageHash 转为 64 位整数（用于共享存储和相似度索引）"""
+    return int(str(hash_value), 16)
+
+def int_to_hash(value):
+    """64 位整数转为 ImageHash（与 imagehash.hex_to_hash 结果相同，但快一个数量级）"""
+    bits = np.unpackbits(np.frombuffer(value.to_bytes(8, 'big'), dtype=np.uint8)).astype(bool)
+    return imagehash.ImageHash(bits.reshape(8, 8))
+
+def download_and_hash(url):
+    """获取图片感知哈希：已有指纹时跳过下载，否则在工作线程中下载并计算（结果写入缓存）
+
+    返回 (哈希值, 来源)，来源为 cached / downloaded / failed。
+    """
+    hash_value = lookup_image_hash(url)
+    if hash_value is not None:
+        return hash_value, 'cached'
+    image = download_image(url)
+    hash_value = calculate_image_hash(image, url) if image else None
+    return hash_value, 'downloaded' if hash_value is not None else 'failed'
+
+def fingerprint_for_url(url):
+    """离线分析用：只读写跨进程共享存储，不写入进程内缓存（百万级图片时该字典会无限增长）"""
+    store = get_fingerprint_store()
+    value = store.get(url) if store else None
+    if value is not None:
+        ANALYZER_IMAGES.inc(result='cached')
+        return value
+    image = download_image(url)
+    if image is None:
+        ANALYZER_IMAGES.inc(result='failed')
+        return None
+    try:
+        with ANALYZER_STAGE_SECONDS.time(stage='hash'):
+            value = hash_to_int(imagehash.phash(image))
+    except Exception as e:
+        print(f"计算图片哈希失败: {str(e)}")
+        ANALYZER_IMAGES.inc(result='failed')
+        return None
+    if store:
+        store.set(url, value)
+    ANALYZER_IMAGES.inc(result='downloaded')
+    return value
+
 def find_similar_products_simple(products, similarity_threshold=0.5):
-    """找到相似的商品（优化版：缓存+早期过滤+进度显示）"""
+    """找到相似的商品（优化版：缓存+早期过滤+进度指标）"""
     start_time = time.time()
-    print(f"开始分析 {len(products)} 个产品...")
+    logger.debug("开始分析 %d 个产品", len(products))
+    ANALYZER_RUNS.inc()
+    ANALYZER_PRODUCTS.inc(len(products))
+    ANALYZER_PROGRESS.set(0, phase='download')
+    ANALYZER_PROGRESS.set(0, phase='compare')
     
-    # 下载所有图片（增加并发数）
-    images = {}
+    # 下载所有图片（增加并发数），只保留感知哈希，不在内存中保存图片
+    image_hashes = {}
     valid_products = []
     
-    print("正在下载图片...")
     with ThreadPoolExecutor(max_workers=20) as executor:  # 增加并发数
-        future_to_product = {executor.submit(download_image, product["image_url"]): (i, product) for i, product in enumerate(products) if product["image_url"]}
+        future_to_product = {executor.submit(download_and_hash, product["image_url"]): (i, product) for i, product in enumerate(products) if product["image_url"]}
         completed = 0
         total = len(future_to_product)
         
         for future in concurrent.futures.as_completed(future_to_product):
             idx, product = future_to_product[future]
             completed += 1
-            if completed % 10 == 0 or completed == total:
-                print(f"图片下载进度: {completed}/{total}")
+            ANALYZER_PROGRESS.set(completed / total, phase='download')
                 
             try:
-                image = future.result()
-                if image:
-                    images[idx] = image
+                image_hash, source = future.result()
+                ANALYZER_IMAGES.inc(result=source)
+                if image_hash is not None:
+                    image_hashes[idx] = image_hash
                     valid_products.append((idx, product))
                 else:
                     # 即使图片下载失败，也保留产品用于标题和价格比较
                     valid_products.append((idx, product))
             except Exception as exc:
                 print(f"图片下载生成异常: {exc}")
+                ANALYZER_IMAGES.inc(result='failed')
                 # 即使图片下载失败，也保留产品用于标题和价格比较
                 valid_products.append((idx, product))
 
     download_time = time.time() - start_time
-    print(f"图片下载完成，耗时: {download_time:.2f}秒")
+    logger.debug("图片下载完成，耗时: %.2f秒", download_time)
 
     # 综合相似度比较（带早期过滤）
-    print("开始相似度分析...")
+    group_start = time.perf_counter()
+    candidate_seconds = 0.0
+    score_seconds = 0.0
     similar_groups = {}
     group_id = 0
     processed = set()
     comparisons_made = 0
     comparisons_skipped = 0
     
-    total_comparisons = len(valid_products) * (len(valid_products) - 1) // 2
-    
     for i, (idx1, product1) in enumerate(valid_products):
         if idx1 in processed:
             continue
@@ -275,54 +490,137 @@ def find_similar_products_simple(products, similarity_threshold=0.5):
                 continue
             
             # 早期过滤：快速检查标题和价格
-            if not quick_filter_by_title_and_price(product1, product2):
+            stage_start = time.perf_counter()
+            is_candidate = quick_filter_by_title_and_price(product1, product2)
+            candidate_seconds += time.perf_counter() - stage_start
+            if not is_candidate:
                 comparisons_skipped += 1
                 continue
             
             comparisons_made += 1
             
             # 计算综合相似度
-            img1 = images.get(idx1)
-            img2 = images.get(idx2)
+            hash1 = image_hashes.get(idx1)
+            hash2 = image_hashes.get(idx2)
             
-            similarity_result = calculate_comprehensive_similarity(product1, product2, img1, img2)
-            comprehensive_score = similarity_result['comprehensive_score']
-            
-            # 特殊规则：如果标题相似度很高（>0.8）且价格相似度也高（>0.8），降低阈值
-            if (similarity_result['title_similarity'] > 0.8 and 
-                similarity_result['price_similarity'] > 0.8):
-                adjusted_threshold = 0.4
-            else:
-                adjusted_threshold = similarity_threshold
+            stage_start = time.perf_counter()
+            similarity_result = calculate_comprehensive_similarity(product1, product2, hash1=hash1, hash2=hash2)
+            score_seconds += time.perf_counter() - stage_start
             
-            if comprehensive_score >= adjusted_threshold:
+            if passes_similarity_threshold(similarity_result, similarity_threshold):
                 current_group.append({
                     "product": product2, 
                     "index": idx2,
                     "similarity_details": similarity_result
                 })
                 processed.add(idx2)
-                print(f"找到相似产品: {product1['title'][:50]}... <-> {product2['title'][:50]}...")
-                print(f"综合相似度: {comprehensive_score:.3f}, 图片: {similarity_result['image_similarity']:.3f}, 标题: {similarity_result['title_similarity']:.3f}, 价格: {similarity_result['price_similarity']:.3f}")
         
         if len(current_group) > 1:
             similar_groups[group_id] = current_group
             group_id += 1
         
-        # 进度显示
-        if (i + 1) % 10 == 0:
-            progress = (i + 1) / len(valid_products) * 100
-            print(f"分析进度: {progress:.1f}% ({i + 1}/{len(valid_products)})")
+        # 进度指标
+        ANALYZER_PROGRESS.set((i + 1) / len(valid_products), phase='compare')
+    
+    ANALYZER_STAGE_SECONDS.observe(candidate_seconds, stage='candidate_generation')
+    ANALYZER_STAGE_SECONDS.observe(score_seconds, stage='score')
+    ANALYZER_STAGE_SECONDS.observe(time.perf_counter() - group_start, stage='group')
+    ANALYZER_COMPARISONS.inc(comparisons_made, result='scored')
+    ANALYZER_COMPARISONS.inc(comparisons_skipped, result='skipped')
+    ANALYZER_GROUPS.inc(len(similar_groups))
+    total_comparisons = comparisons_made + comparisons_skipped
+    ANALYZER_SKIP_RATIO.set(comparisons_skipped / total_comparisons if total_comparisons else 0.0)
     
     total_time = time.time() - start_time
-    print(f"分析完成！总耗时: {total_time:.2f}秒")
-    print(f"比较统计: 执行了 {comparisons_made} 次详细比较，跳过了 {comparisons_skipped} 次")
-    print(f"效率提升: {comparisons_skipped / (comparisons_made + comparisons_skipped) * 100:.1f}% 的比较被跳过")
+    logger.debug("分析完成，总耗时: %.2f秒", total_time)
     
     return similar_groups, [], []
 
+def save_upload_analysis(products, phashes, similar_groups):
+    """把 /upload 的结果写成与离线分析相同结构的分析目录，导出和销售趋势接口按 analysis_id 读取
+
+    分组就是响应中的 similar_groups（逐个商品贪心归组，grouping='greedy'），
+    与离线分析的分块 + 并查集分组（grouping='union_find'）不同，同一文件两者的分组数可能不一样。
+    """
+    source_files = list(dict.fromkeys(product['source_file'] for product in products))
+    analysis = analysis_store.create(files=source_files, source_files=source_files, mode='upload', grouping='greedy')
+    shutil.rmtree(analysis.file('inputs'), ignore_errors=True)
+    phash = np.array([value or 0 for value in phashes], dtype=np.uint64)
+    has_phash = np.array([value is not None for value in phashes], dtype=bool)
+    columns, records = product_columns(products, phash, has_phash, {name: i for i, name in enumerate(source_files)})
+    writer = ColumnWriter(analysis)
+    try:
+        writer.append(columns, records)
+    finally:
+        writer.close()
+    
+    group_ids = analysis.column('group_id', mode='w+', rows=len(products))
+    group_ids[:] = -1
+    with open(analysis.file('groups.ndjson'), 'w', encoding='utf-8') as f:
+        for group_id, group in similar_groups.items():
+            rows = [member['index'] for member in group]
+            group_ids[rows] = group_id
+            f.write(json.dumps({'group_id': group_id, 'size': len(rows),
+                                'products': [{'row': row, **records[row]} for row in rows]}, ensure_ascii=False) + '\n')
+    if len(products):
+        group_ids.flush()
+    del group_ids
+    write_group_aggregates(analysis, len(products), len(similar_groups))
+    sold_dates = write_sales_series(analysis, len(products), max(len(products), 1))
+    analysis.update_meta(status='done', rows=len(products), groups=len(similar_groups),
+                         products_in_groups=sum(len(group) for group in similar_groups.values()), **sold_dates)
+    return analysis
+
+def run_analysis_process(analysis):
+    """在子进程中运行一次离线分析（src/analysis_worker.py）并等待结束
+
+    子进程被杀死（例如超出系统内存）时来不及写入状态，由这里标记为 failed。
+    """
+    returncode = subprocess.run([sys.executable, ANALYSIS_WORKER_SCRIPT, analysis.path]).returncode
+    if returncode != 0 and analysis.read_meta().get('status') not in FINISHED_STATUSES:
+        analysis.update_meta(status='failed', error=f'分析进程异常退出（退出码 {returncode}）')
+
+def start_out_of_core_analysis(files):
+    """把上传文件逐块写入分析目录（不读入内存），提交后台任务，返回 202 和 analysis_id
+
+    chunk_rows 和 memory_cap_mb 超过服务端配置时按配置值截断。
+    """
+    try:
+        settings = {
+            'chunk_rows': int(request.values.get('chunk_rows', ANALYSIS_CHUNK_ROWS)),
+            'memory_cap_mb': int(request.values.get('memory_cap_mb', ANALYSIS_MEMORY_CAP_MB)),
+            'use_images': request.values.get('use_images', 'true').lower() not in ('0', 'false', 'no')
+        }
+    except ValueError:
+        return jsonify({'error': 'chunk_rows 和 memory_cap_mb 必须是整数'}), 400
+    if settings['chunk_rows'] <= 0 or settings['memory_cap_mb'] <= 0:
+        return jsonify({'error': 'chunk_rows 和 memory_cap_mb 必须为正数'}), 400
+    settings['chunk_rows'] = min(settings['chunk_rows'], ANALYSIS_CHUNK_ROWS)
+    settings['memory_cap_mb'] = min(settings['memory_cap_mb'], ANALYSIS_MEMORY_CAP_MB)
+    
+    files = [file for file in files if file and file.filename.endswith('.csv')]
+    if not files:
+        return jsonify({'error': '没有有效的CSV文件'}), 400
+    
+    analysis = analysis_store.create(files=[file.filename for file in files], settings=settings)
+    inputs = []
+    for i, file in enumerate(files):
+        path = analysis.file(os.path.join('inputs', f"{i}-{secure_filename(file.filename) or 'upload.csv'}"))
+        file.save(path)
+        inputs.append((path, file.filename))
+    analysis.update_meta(inputs=inputs)
+    # 排队后在单独的子进程中运行，状态和错误写入 meta.json
+    analysis_executor.submit(run_analysis_process, analysis)
+    
+    return jsonify({
+        'analysis_id': analysis.analysis_id,
+        'status': 'queued',
+        'status_url': url_for('csv_analyzer.get_analysis', analysis_id=analysis.analysis_id)
+    }), 202
+
 @csv_analyzer_bp.route("/upload", methods=["POST"])
 @cross_origin()
+@profiled('upload_csv')
 def upload_csv():
     """处理CSV文件上传"""
     try:
@@ -333,17 +631,26 @@ def upload_csv():
         if not files or all(file.filename == '' for file in files):
             return jsonify({'error': '没有选择文件'}), 400
         
+        # 大文件：后台离线分析，立即返回 analysis_id
+        if request.values.get('mode') == 'out_of_core':
+            return start_out_of_core_analysis(files)
+        
         all_products = []
         
+        # 读取文件内容
+        contents = [(file.filename, file.read()) for file in files if file and file.filename.endswith('.csv')]
+        
+        # 相同文件已被任一工作进程分析过时直接返回缓存结果
+        result_key = ResultStore.make_key('upload_csv', *[part for name, data in contents for part in (name, data)])
+        cached_body = result_store.get(result_key)
+        if cached_body is not None:
+            return Response(cached_body, mimetype='application/json')
+        
         # 处理每个CSV文件
-        for file in files:
-            if file and file.filename.endswith('.csv'):
-                # 读取文件内容
-                content = file.read().decode('utf-8')
-                
-                # 解析CSV数据
-                products = parse_csv_data(content, file.filename)
-                all_products.extend(products)
+        for filename, data in contents:
+            # 解析CSV数据
+            products = parse_csv_data(data.decode('utf-8'), filename)
+            all_products.extend(products)
         
         if not all_products:
             return jsonify({'error': '没有有效的产品数据'}), 400
@@ -351,11 +658,33 @@ def upload_csv():
         # 进行相似度分析
         similar_groups, _, _ = find_similar_products_simple(all_products)
         
+        # 并入相似商品索引（图片指纹已在分析时缓存）
+        phashes = []
+        for product in all_products:
+            hash_value = lookup_image_hash(product['image_url']) if product['image_url'] else None
+            phashes.append(hash_to_int(hash_value) if hash_value is not None else None)
+        similarity_index.add_products_async(all_products, phashes)
+        
+        # 分组和销售序列写入分析目录，可按 analysis_id 导出和查询趋势（分组与本响应的 similar_groups 相同）
+        try:
+            analysis = save_upload_analysis(all_products, phashes, similar_groups)
+        except Exception as e:
+            print(f"保存分析结果失败: {str(e)}")
+            analysis = None
+        
+        # 标题关键词统计
+        keyword_counter = KeywordCounter().add_titles(product['title'] for product in all_products)
+        
         # 准备返回数据
         result = {
             'total_products': len(all_products),
             'products': all_products,
             'similar_groups': similar_groups,
+            'keyword_analysis': {
+                'top_words': keyword_counter.summary(50, 1),
+                'top_bigrams': keyword_counter.summary(30, 2),
+                'top_trigrams': keyword_counter.summary(20, 3)
+            },
             'similarity_analysis': {
                 'threshold': 0.5,
                 'algorithm': 'comprehensive_scoring',
@@ -369,12 +698,268 @@ def upload_csv():
                 'products_in_groups': sum(len(group) for group in similar_groups.values())
             }
         }
+        if analysis is not None:
+            result['analysis_id'] = analysis.analysis_id
+            result['export_url'] = url_for('csv_analyzer.export_analysis_groups', analysis_id=analysis.analysis_id)
+            result['trends_url'] = url_for('csv_analyzer.analysis_trends', analysis_id=analysis.analysis_id)
+        
+        with ANALYZER_STAGE_SECONDS.time(stage='serialize'):
+            response = jsonify(result)
+        result_store.set(result_key, response.get_data())
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': f'处理文件时出错: {str(e)}'}), 500
+
+@csv_analyzer_bp.route("/keywords", methods=["POST"])
+@cross_origin()
+@profiled('mine_keywords')
+def mine_keywords():
+    """从CSV文件中流式挖掘标题高频词和短语（不做相似度分析，适合大文件）"""
+    try:
+        if 'files' not in request.files:
+            return jsonify({'error': '没有文件上传'}), 400
+        
+        files = [file for file in request.files.getlist('files') if file and file.filename.endswith('.csv')]
+        if not files:
+            return jsonify({'error': '没有选择文件'}), 400
         
-        return jsonify(result)
+        top_n = request.form.get('top_n', 50, type=int)
+        keyword_counter = KeywordCounter()
+        
+        for file in files:
+            # 逐行读取，不把整个文件载入内存
+            csv_reader = csv.DictReader(io.TextIOWrapper(file.stream, encoding='utf-8'))
+            keyword_counter.add_titles(row.get('research-table-row__link-row-anchor', '').strip() for row in csv_reader)
+        
+        return jsonify({
+            'total_titles': keyword_counter.titles,
+            'total_words': keyword_counter.total(1),
+            'unique_words': keyword_counter.unique_count(1),
+            'exact': all(keyword_counter.is_exact(n) for n in keyword_counter.ngram_sizes),
+            'top_words': keyword_counter.summary(top_n, 1),
+            'top_bigrams': keyword_counter.summary(top_n, 2),
+            'top_trigrams': keyword_counter.summary(top_n, 3)
+        })
         
     except Exception as e:
         return jsonify({'error': f'处理文件时出错: {str(e)}'}), 500
 
+@csv_analyzer_bp.route("/similar", methods=["POST"])
+@cross_origin()
+@profiled('similar_products')
+def similar_products():
+    """从相似商品索引中查询最相似的 k 个商品
+
+    请求体：{"id": 结果中返回的商品编号}、{"key": 商品链接} 或 {"title": ..., "price": ..., "image_url": ...}，
+    可选 k（默认 10）和 max_price_diff（默认 0.5，只在价格差异不超过该比例的商品中查找）。
+    """
+    try:
+        start = time.perf_counter()
+        data = request.get_json(silent=True) or {}
+        index = similarity_index.current()
+        if index is None or len(index) == 0:
+            return jsonify({'error': '相似度索引尚未建立，请先上传CSV文件'}), 404
+        
+        k = min(max(int(data.get('k', 10)), 1), SIMILAR_MAX_K)
+        max_price_diff = float(data.get('max_price_diff', 0.5))
+        exclude = None
+        
+        if data.get('id') is not None or data.get('key'):
+            # 索引中已有的商品：编号在索引重建和并入新商品后保持不变，内部按位置读取
+            product_id = data['id'] if data.get('id') is not None else data['key']
+            position = index.find(parse_product_id(data['id']) if data.get('id') is not None else key_hash(data['key']))
+            if position is None:
+                return jsonify({'error': f'商品 {product_id} 不存在'}), 404
+            query = index.record(position)
+            phash = int(index.phash[position]) if index.has_phash[position] else None
+            title_hash = int(index.title_simhash[position])
+            exclude = position
+        else:
+            if not data.get('title') and not data.get('image_url'):
+                return jsonify({'error': '需要提供 id，或 title / price / image_url'}), 400
+            price = data.get('price', 0)
+            query = {
+                'title': data.get('title', ''),
+                'price_numeric': parse_price(price) if isinstance(price, str) else float(price or 0),
+                'image_url': data.get('image_url', '')
+            }
+            phash = None
+            if query['image_url']:
+                hash_value, _ = download_and_hash(query['image_url'])
+                phash = hash_to_int(hash_value) if hash_value is not None else None
+            title_hash = simhash(query['title']) if query['title'] else None
+        
+        # 向量化粗排取候选，再用与 /upload 相同的综合相似度精排
+        candidates = index.candidates(query['price_numeric'], phash, title_hash,
+                                      limit=k * SIMILAR_CANDIDATES_PER_RESULT, max_price_diff=max_price_diff, exclude=exclude)
+        query_hash = int_to_hash(phash) if phash is not None else None
+        results = []
+        for position, coarse_score in candidates:
+            record = index.record(position)
+            candidate_hash = int_to_hash(int(index.phash[position])) if index.has_phash[position] else None
+            similarity = calculate_comprehensive_similarity(query, record, hash1=query_hash, hash2=candidate_hash)
+            results.append({'id': index.product_id(position), 'product': record, 'coarse_score': coarse_score, **similarity})
+        results.sort(key=lambda result: result['comprehensive_score'], reverse=True)
+        
+        return jsonify({
+            'query': query,
+            'results': results[:k],
+            'candidates_scored': len(candidates),
+            'index': {'version': index.meta['version'], 'products': len(index)},
+            'took_ms': (time.perf_counter() - start) * 1000
+        })
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'参数错误: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'查询相似商品时出错: {str(e)}'}), 500
+
+@csv_analyzer_bp.route("/analyses/<analysis_id>", methods=["GET"])
+@cross_origin()
+def get_analysis(analysis_id):
+    """离线分析（或 /upload 保存的分析）的状态和统计（status: queued / parsing / blocking / grouping / done / failed）"""
+    analysis = analysis_store.get(analysis_id)
+    if analysis is None:
+        return jsonify({'error': f'分析 {analysis_id} 不存在'}), 404
+    return jsonify(analysis.read_meta())
+
+@csv_analyzer_bp.route("/analyses/<analysis_id>", methods=["DELETE"])
+@cross_origin()
+def delete_analysis(analysis_id):
+    """删除离线分析及其全部文件（运行中的分析不能删除）"""
+    analysis = analysis_store.get(analysis_id)
+    if analysis is None:
+        return jsonify({'error': f'分析 {analysis_id} 不存在'}), 404
+    status = analysis.read_meta().get('status')
+    if status not in FINISHED_STATUSES:
+        return jsonify({'error': f"分析仍在运行（当前状态: {status}），完成后才能删除", 'status': status}), 409
+    analysis_store.delete(analysis_id)
+    return jsonify({'analysis_id': analysis_id, 'deleted': True})
+
+def get_finished_analysis(analysis_id):
+    """返回 (analysis, None)；分析不存在或未完成时返回 (None, 错误响应)"""
+    analysis = analysis_store.get(analysis_id)
+    if analysis is None:
+        return None, (jsonify({'error': f'分析 {analysis_id} 不存在'}), 404)
+    status = analysis.read_meta().get('status')
+    if status != 'done':
+        return None, (jsonify({'error': f"分析尚未完成（当前状态: {status}）", 'status': status}), 409)
+    return analysis, None
+
+@csv_analyzer_bp.route("/analyses/<analysis_id>/groups", methods=["GET"])
+@cross_origin()
+def get_analysis_groups(analysis_id):
+    """以 NDJSON 流式返回离线分析的相似商品分组（每行一组）"""
+    analysis, error = get_finished_analysis(analysis_id)
+    if error:
+        return error
+    
+    def generate():
+        with open(analysis.file('groups.ndjson'), 'rb') as f:
+            while True:
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    break
+                yield chunk
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@csv_analyzer_bp.route("/analyses/<analysis_id>/export", methods=["GET"])
+@cross_origin()
+def export_analysis_groups(analysis_id):
+    """流式导出分组及其聚合（总销售额、总销量、最低/中位/最高价格），分块传输，不在内存中拼接整个响应
+
+    analysis_id 来自离线分析，或 /upload 响应中的 analysis_id。导出的分组与产生它的分析一致：
+    /upload 为响应中的 similar_groups（贪心分组），离线分析为并查集分组，算法不同，分组可能不一样；
+    分析的 meta（GET /analyses/<id>）中 grouping 字段为 greedy 或 union_find。
+    format=ndjson（默认，每行一组）或 csv（每行一个商品，带所在分组的聚合字段）；
+    products=0 时只导出分组聚合，每组一行。
+    """
+    analysis, error = get_finished_analysis(analysis_id)
+    if error:
+        return error
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format 必须是 {', '.join(EXPORT_FORMATS)} 之一"}), 400
+    include_products = request.args.get('products', '1').lower() not in ('0', 'false', 'no')
+    
+    if export_format == 'csv':
+        chunks, mimetype = iter_groups_csv(analysis, include_products), 'text/csv'
+    else:
+        chunks, mimetype = iter_groups_ndjson(analysis, include_products), 'application/x-ndjson'
+    filename = f"analysis-{analysis_id}-{'groups' if include_products else 'aggregates'}.{export_format}"
+    return Response(
+        buffered(chunks), mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@csv_analyzer_bp.route("/analyses/<analysis_id>/trends", methods=["GET"])
+@cross_origin()
+def analysis_trends(analysis_id):
+    """按时间窗口查询销售趋势（读取分析完成时生成的按天/按周序列，不重新扫描商品）
+
+    analysis_id 来自离线分析，或 /upload 响应中的 analysis_id；by=group 时的分组与导出接口相同
+    （/upload 为贪心分组，离线分析为并查集分组，见 export_analysis_groups）。
+
+    参数：by=group|file，granularity=day|week，metric=total_sales|volume|products，
+    days=窗口天数（默认 30）或 start=YYYY-MM-DD，end=YYYY-MM-DD（默认为数据中最后的售出日期），
+    limit=返回条数（默认 10），series=0 时不返回逐桶序列。
+    例：最近 30 天销售额最高的分组 /analyses/<id>/trends?by=group&days=30
+    """
+    try:
+        start = time.perf_counter()
+        analysis, error = get_finished_analysis(analysis_id)
+        if error:
+            return error
+        meta = analysis.read_meta()
+        if not meta.get('sold_date_max'):
+            return jsonify({'error': '该分析中没有可识别的售出日期'}), 404
+        
+        dimension = request.args.get('by', 'group')
+        granularity = request.args.get('granularity', 'day')
+        metric = request.args.get('metric', 'total_sales')
+        for name, value, choices in (('by', dimension, SERIES_DIMENSIONS), ('granularity', granularity, SERIES_GRANULARITIES),
+                                     ('metric', metric, SERIES_METRICS)):
+            if value not in choices:
+                return jsonify({'error': f"{name} 必须是 {', '.join(choices)} 之一"}), 400
+        
+        end_day = to_day(request.args.get('end', meta['sold_date_max']))
+        if request.args.get('start'):
+            start_day = to_day(request.args['start'])
+        else:
+            start_day = end_day - min(max(request.args.get('days', TRENDS_DEFAULT_DAYS, type=int), 1), TRENDS_MAX_DAYS) + 1
+        if start_day > end_day:
+            return jsonify({'error': 'start 不能晚于 end'}), 400
+        start_day, end_day = SalesSeries.align(granularity, start_day, end_day)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), TRENDS_MAX_LIMIT)
+        with_series = request.args.get('series', '1').lower() not in ('0', 'false', 'no')
+        
+        results = SalesSeries(analysis).top(dimension, granularity, start_day, end_day, metric, limit, with_series)
+        if dimension == 'group':
+            sizes, median_prices = analysis.group_column('size'), analysis.group_column('price_median')
+            for result in results:
+                group_id = result.pop('key')
+                result.update(group_id=group_id, size=int(sizes[group_id]), price_median=float(median_prices[group_id]))
+        else:
+            for result in results:
+                result['source_file'] = meta['source_files'][result.pop('key')]
+        
+        length = end_day - start_day + 1
+        return jsonify({
+            'by': dimension,
+            'granularity': granularity,
+            'metric': metric,
+            'window': {'start': from_day(start_day), 'end': from_day(end_day)},
+            'previous_window': {'start': from_day(start_day - length), 'end': from_day(start_day - 1)},
+            'results': results,
+            'took_ms': (time.perf_counter() - start) * 1000
+        })
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'参数错误: {str(e)}'}), 400
+
 @csv_analyzer_bp.route('/test', methods=['GET'])
 @cross_origin()
 def test_endpoint():
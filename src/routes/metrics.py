@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from src.utils.metrics import REGISTRY
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 格式的性能指标"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
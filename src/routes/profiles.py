@@ -0,0 +1,17 @@
+from flask import Blueprint, jsonify, send_from_directory, abort
+from werkzeug.utils import secure_filename
+from src.utils.profiling import PROFILE_DIR, list_profiles
+
+profiles_bp = Blueprint('profiles', __name__)
+
+@profiles_bp.route('/profiles', methods=['GET'])
+def get_profiles():
+    """列出最近的请求分析文件"""
+    return jsonify(list_profiles())
+
+@profiles_bp.route('/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """下载分析文件（.pstats 可用 snakeviz 查看，.collapsed 可用 flamegraph.pl / speedscope 生成火焰图）"""
+    if secure_filename(name) != name or name not in {profile['name'] for profile in list_profiles()}:
+        abort(404)
+    return send_from_directory(PROFILE_DIR, name, as_attachment=True)
@@ -1,25 +1,85 @@
-import requests
-from bs4 import BeautifulSoup
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from flask_cors import cross_origin
-from deep_translator import GoogleTranslator
-import re
+import json
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import concurrent.futures
+import os
 import time
 import random
+import logging
+import threading
+from collections import OrderedDict
+from src.utils.page_cache import PageCache
+from src.utils.rate_limit import HostRateLimiter
+from src.utils.keyword_engine import KeywordCounter
+from src.utils.simhash import DEFAULT_MAX_DISTANCE, dedup_titles
+from src.utils.metrics import REGISTRY
+from src.utils.profiling import profiled
+from src.utils.lazy_import import lazy_module
+
+# 重量级依赖延迟到第一次使用时再导入
+requests = lazy_module('requests')
+bs4 = lazy_module('bs4')
+deep_translator = lazy_module('deep_translator')
 
 title_scraper_bp = Blueprint('title_scraper', __name__)
+# 抓取进度只输出调试日志，运行状态看 /api/metrics 中的 scraper_* 指标
+logger = logging.getLogger(__name__)
+
+# 页面缓存配置
+PAGE_CACHE_DIR = os.environ.get('SCRAPER_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'page_cache'))
+PAGE_CACHE_TTL = int(os.environ.get('SCRAPER_CACHE_TTL', 3600))  # 缓存有效期（秒）
+PAGE_CACHE_STALE_TTL = int(os.environ.get('SCRAPER_CACHE_STALE_TTL', 86400))  # 过期后仍可返回旧内容的时长（秒）
+PAGE_CACHE_MAX_MB = int(os.environ.get('SCRAPER_CACHE_MAX_MB', 512))  # 页面缓存目录的大小上限
+
+page_cache = PageCache(PAGE_CACHE_DIR, ttl=PAGE_CACHE_TTL, stale_ttl=PAGE_CACHE_STALE_TTL,
+                       max_bytes=PAGE_CACHE_MAX_MB * 1024 * 1024)
+
+# 按域名限速配置（所有抓取线程共享）
+HOST_RATE = float(os.environ.get('SCRAPER_HOST_RATE', 0.5))  # 每个域名每秒请求数
+HOST_BURST = int(os.environ.get('SCRAPER_HOST_BURST', 1))
+HOST_JITTER = float(os.environ.get('SCRAPER_HOST_JITTER', 1.0))  # 随机抖动上限（秒）
+
+host_rate_limiter = HostRateLimiter(rate=HOST_RATE, burst=HOST_BURST, jitter=HOST_JITTER)
+
+# 抓取参数限制
+SCRAPE_MAX_PAGES = 4
+BATCH_MAX_URLS = 100
+BATCH_MAX_WORKERS = 16
+BATCH_MAX_TOP_N = 500
+# 近似去重的最大距离：索引的探测半径为距离的 1/4，每段探测的键数随半径组合增长（16 时约 2.5k，63 时约 65k）
+DEDUP_MAX_DISTANCE = 16
+
+# 性能指标
+SCRAPER_STAGE_SECONDS = REGISTRY.histogram(
+    'scraper_stage_seconds',
+    'Scraper stage latency: fetch/parse per page, translate per word',
+    ['stage']
+)
+SCRAPER_PAGES = REGISTRY.counter('scraper_pages_total', 'Result pages processed by source', ['source'])
+SCRAPER_TITLES = REGISTRY.counter('scraper_titles_total', 'Titles extracted from result pages')
+TRANSLATOR_WORDS = REGISTRY.counter('translator_words_total', 'Words passed to the translator by result', ['result'])
+
+# 翻译结果缓存，键为 (词, 目标语言)；最近使用的在末尾，超过上限时删除最久未使用的
+TRANSLATION_CACHE_SIZE = int(os.environ.get('SCRAPER_TRANSLATION_CACHE_SIZE', 10000))
+translation_cache = OrderedDict()
+translation_cache_lock = threading.Lock()
 
-# German stop words
-GERMAN_STOP_WORDS = {
-    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einer", "eines", "einem", "einen",
-    "und", "oder", "aber", "doch", "sondern", "denn", "wenn", "als", "wie", "wo", "was", "wer",
-    "mit", "für", "von", "zu", "bei", "nach", "vor", "über", "unter", "durch", "gegen", "ohne",
-    "um", "an", "auf", "aus", "in", "ist", "sind", "war", "waren", "hat", "haben", "wird", "werden",
-    "ich", "du", "er", "sie", "es", "wir", "ihr", "sich", "mich", "dich", "uns", "euch", "ihm", "ihr",
-    "nicht", "nur", "auch", "noch", "schon", "mehr", "sehr", "so", "dann", "hier", "da", "dort",
-    "neu", "gebraucht", "original", "genuine", "brand", "marke", "set", "kit", "pack", "piece", "stück"
-}
+def get_cached_translation(word, target_lang):
+    """返回缓存的译文，没有时返回 None"""
+    with translation_cache_lock:
+        translated = translation_cache.get((word, target_lang))
+        if translated is not None:
+            translation_cache.move_to_end((word, target_lang))
+        return translated
+
+def cache_translation(word, target_lang, translated):
+    with translation_cache_lock:
+        translation_cache[(word, target_lang)] = translated
+        translation_cache.move_to_end((word, target_lang))
+        while len(translation_cache) > TRANSLATION_CACHE_SIZE:
+            translation_cache.popitem(last=False)
 
 def get_headers():
     """获取更完整的请求头，模拟真实浏览器"""
@@ -38,34 +98,76 @@ def get_headers():
         'Cache-Control': 'max-age=0'
     }
 
-def scrape_ebay_titles(url, max_pages=4):
-    """抓取eBay商品标题"""
+def fetch_page(session, url, headers, max_retries=3):
+    """抓取单个页面（带重试机制），返回页面内容"""
+    for attempt in range(max_retries):
+        try:
+            response = session.get(url, headers=headers, timeout=30, allow_redirects=True)
+            response.raise_for_status()
+            return response.content
+        except requests.exceptions.RequestException as e:
+            if attempt == max_retries - 1:
+                raise e
+            time.sleep(random.uniform(2, 5))  # 重试前等待
+
+def fetch_page_rate_limited(url, headers):
+    """后台刷新缓存用：与前台抓取共用按域名限速，返回 (页面内容, 实际抓取的URL)"""
+    host_rate_limiter.acquire(url)
+    with SCRAPER_STAGE_SECONDS.time(stage='fetch'):
+        content = fetch_page(requests.Session(), url, headers)
+    SCRAPER_PAGES.inc(source='refresh')
+    return content, url
+
+def int_param(data, name, default, minimum=1, maximum=None):
+    """读取请求体中的整数参数：不是整数或小于 minimum 时抛出 ValueError，超过 maximum 时截断"""
+    value = data.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{name} 必须是整数")
+    if value < minimum:
+        raise ValueError(f"{name} 不能小于 {minimum}")
+    return min(value, maximum) if maximum is not None else value
+
+def scrape_ebay_titles(url, max_pages=4, use_cache=True, stale_while_revalidate=True, cache_info=None):
+    """抓取eBay商品标题（带页面缓存）"""
     session = requests.Session()
     headers = get_headers()
     
     all_titles = []
     current_url = url
+    if cache_info is None:
+        cache_info = {}
+    cache_info.update({'pages_from_cache': 0, 'pages_fetched': 0, 'stale_pages': 0, 'max_age_seconds': None})
     
-    for page_num in range(min(max_pages, 4)):  # 最多4页
+    for page_num in range(min(max_pages, SCRAPE_MAX_PAGES)):
         try:
-            print(f"正在抓取第 {page_num + 1} 页: {current_url}")
-            
-            # 添加随机延迟，避免被识别为机器人
-            time.sleep(random.uniform(1, 3))
+            logger.debug("正在抓取第 %d 页: %s", page_num + 1, current_url)
             
-            # 重试机制
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    response = session.get(current_url, headers=headers, timeout=30, allow_redirects=True)
-                    response.raise_for_status()
-                    break
-                except requests.exceptions.RequestException as e:
-                    if attempt == max_retries - 1:
-                        raise e
-                    time.sleep(random.uniform(2, 5))  # 重试前等待
+            cached = page_cache.get(url, page_num) if use_cache else None
+            if cached and (page_cache.is_fresh(cached[1]) or stale_while_revalidate):
+                content, age, _ = cached
+                SCRAPER_PAGES.inc(source='cache')
+                cache_info['pages_from_cache'] += 1
+                cache_info['max_age_seconds'] = round(max(age, cache_info['max_age_seconds'] or 0), 1)
+                if not page_cache.is_fresh(age):
+                    # 先返回旧内容，后台刷新
+                    cache_info['stale_pages'] += 1
+                    page_cache.refresh_in_background(
+                        url, page_num,
+                        lambda fetch_url=current_url: fetch_page_rate_limited(fetch_url, headers)
+                    )
+            else:
+                # 按域名限速，避免被识别为机器人
+                host_rate_limiter.acquire(current_url)
+                
+                with SCRAPER_STAGE_SECONDS.time(stage='fetch'):
+                    content = fetch_page(session, current_url, headers)
+                SCRAPER_PAGES.inc(source='network')
+                cache_info['pages_fetched'] += 1
+                if use_cache:
+                    page_cache.set(url, page_num, content, current_url)
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            parse_start = time.perf_counter()
+            soup = bs4.BeautifulSoup(content, 'html.parser')
             
             # 策略1: 优先使用精确的eBay标题选择器
             ebay_title_selectors = [
@@ -122,10 +224,12 @@ def scrape_ebay_titles(url, max_pages=4):
                 if len(all_titles) >= 200:
                     break
             
-            print(f"第 {page_num + 1} 页提取到 {len(page_titles)} 个标题")
+            logger.debug("第 %d 页提取到 %d 个标题", page_num + 1, len(page_titles))
+            SCRAPER_TITLES.inc(len(page_titles))
             
             # 如果已经达到目标数量，停止抓取
             if len(all_titles) >= 200:
+                SCRAPER_STAGE_SECONDS.observe(time.perf_counter() - parse_start, stage='parse')
                 break
             
             # 查找下一页链接
@@ -149,6 +253,8 @@ def scrape_ebay_titles(url, max_pages=4):
                         next_page_link = urljoin(current_url, next_page_link)
                     break
             
+            SCRAPER_STAGE_SECONDS.observe(time.perf_counter() - parse_start, stage='parse')
+            
             if next_page_link and page_num < max_pages - 1:
                 current_url = next_page_link
             else:
@@ -156,42 +262,51 @@ def scrape_ebay_titles(url, max_pages=4):
                 
         except requests.exceptions.RequestException as e:
             print(f"抓取第 {page_num + 1} 页失败: {str(e)}")
+            SCRAPER_PAGES.inc(source='failed')
             continue  # 继续尝试下一页
     
-    print(f"总共抓取到 {len(all_titles)} 个标题")
+    logger.debug("总共抓取到 %d 个标题", len(all_titles))
     return all_titles
 
-def simple_tokenize_and_count(text):
-    """简单的德语文本分词和词频统计"""
-    # 转换为小写
-    text = text.lower()
-    
-    # 提取德语单词（包括德语特殊字符）
-    words = re.findall(r'\b[a-zA-ZäöüßÄÖÜ]+\b', text)
-    
-    # 过滤停用词和短词
-    filtered_words = [
-        word for word in words 
-        if word not in GERMAN_STOP_WORDS and len(word) > 2
-    ]
-    
-    # 统计词频
-    word_counts = Counter(filtered_words)
-    return word_counts
+def summarize_word_counts(word_counts, top_n=50):
+    """汇总词频统计结果"""
+    total_words = sum(word_counts.values())
+    return {
+        'total_words': total_words,
+        'unique_words': len(word_counts),
+        'top_words': [
+            {
+                'word': word,
+                'count': count,
+                'frequency': round(count / total_words * 100, 2)
+            }
+            for word, count in word_counts.most_common(top_n)
+        ]
+    }
 
 def translate_words_batch(words, target_lang='en'):
     """批量翻译词汇"""
     try:
-        translator = GoogleTranslator(source='auto', target=target_lang)
+        translator = deep_translator.GoogleTranslator(source='auto', target=target_lang)
         translations = {}
         
         for word, count in words:
+            cached = get_cached_translation(word, target_lang)
+            if cached is not None:
+                translations[word] = cached
+                TRANSLATOR_WORDS.inc(result='cached')
+                continue
             try:
-                translated = translator.translate(word)
+                with SCRAPER_STAGE_SECONDS.time(stage='translate'):
+                    translated = translator.translate(word)
+                TRANSLATOR_WORDS.inc(result='ok')
                 translations[word] = translated
+                if translated is not None:
+                    cache_translation(word, target_lang, translated)
                 time.sleep(0.1)  # 避免请求过快
             except Exception as e:
                 print(f"翻译 '{word}' 失败: {str(e)}")
+                TRANSLATOR_WORDS.inc(result='failed')
                 translations[word] = word  # 翻译失败时保持原词
         
         return translations
@@ -201,6 +316,7 @@ def translate_words_batch(words, target_lang='en'):
 
 @title_scraper_bp.route('/scrape', methods=['POST'])
 @cross_origin()
+@profiled('scrape_titles')
 def scrape_titles():
     """抓取商品标题的API端点"""
     try:
@@ -210,15 +326,27 @@ def scrape_titles():
         
         url = data['url']
         max_pages = data.get('max_pages', 4)
+        use_cache = data.get('use_cache', True)
+        stale_while_revalidate = data.get('stale_while_revalidate', True)
+        near_dedup = data.get('near_dedup', False)
+        dedup_mode = data.get('dedup_mode', 'drop')
+        try:
+            dedup_distance = int_param(data, 'dedup_distance', DEFAULT_MAX_DISTANCE, minimum=0, maximum=DEDUP_MAX_DISTANCE)
+        except ValueError as e:
+            return jsonify({'error': f'参数错误: {str(e)}'}), 400
+        
+        if dedup_mode not in ('drop', 'weight'):
+            return jsonify({'error': 'dedup_mode 只能是 drop 或 weight'}), 400
         
         # 验证URL
         if 'ebay' not in url.lower():
             return jsonify({'error': '请提供有效的eBay URL'}), 400
         
-        print(f"开始抓取URL: {url}")
+        logger.debug("开始抓取URL: %s", url)
         
         # 抓取标题
-        titles = scrape_ebay_titles(url, max_pages)
+        cache_info = {}
+        titles = scrape_ebay_titles(url, max_pages, use_cache, stale_while_revalidate, cache_info)
         
         if not titles:
             return jsonify({
@@ -231,22 +359,25 @@ def scrape_titles():
                 ]
             }), 400
         
-        print(f"总共抓取到 {len(titles)} 个标题")
-        
-        # 合并所有标题进行分词分析
-        combined_text = " ".join(titles)
-        word_counts = simple_tokenize_and_count(combined_text)
-        top_words = word_counts.most_common(50)
+        # 近似重复标题去重（同一卖家的微小变体会抬高词频）
+        if near_dedup:
+            analysis_titles, weights, dedup_info = dedup_titles(titles, dedup_distance, dedup_mode)
+            logger.debug("近似去重: %d 个近似重复标题 (%s%%)", dedup_info['near_duplicates'], dedup_info['dedup_rate'])
+        else:
+            analysis_titles, weights, dedup_info = titles, [1] * len(titles), None
         
-        print(f"分词完成，总词数: {sum(word_counts.values())}，高频词: {len(top_words)}")
+        # 逐条标题分词，统计单词和短语
+        keyword_counter = KeywordCounter()
+        for title, weight in zip(analysis_titles, weights):
+            keyword_counter.add_title(title, weight)
+        top_words = [(word, round(count, 2)) for word, count in keyword_counter.most_common(50)]
         
         # 翻译为英文和中文
-        print("开始翻译...")
         english_translations = translate_words_batch(top_words, 'en')
         chinese_translations = translate_words_batch(top_words, 'zh-CN')
         
         # 准备返回数据
-        total_words = sum(word_counts.values())
+        total_words = round(keyword_counter.total(), 2)
         result = {
             'success': True,
             'total_titles': len(titles),
@@ -254,7 +385,7 @@ def scrape_titles():
             'all_titles_count': len(titles),
             'word_analysis': {
                 'total_words': total_words,
-                'unique_words': len(word_counts),
+                'unique_words': keyword_counter.unique_count(),
                 'top_words': [
                     {
                         'word': word,
@@ -264,11 +395,22 @@ def scrape_titles():
                         'chinese': chinese_translations.get(word, word)
                     }
                     for word, count in top_words
-                ]
+                ],
+                'top_bigrams': keyword_counter.summary(30, 2),
+                'top_trigrams': keyword_counter.summary(20, 3),
+                'near_dedup': dedup_info
             },
             'scraping_info': {
                 'pages_scraped': max_pages,
-                'url': url
+                'url': url,
+                'cache': {
+                    'enabled': use_cache,
+                    'ttl_seconds': PAGE_CACHE_TTL,
+                    'pages_from_cache': cache_info['pages_from_cache'],
+                    'pages_fetched': cache_info['pages_fetched'],
+                    'stale_pages': cache_info['stale_pages'],
+                    'age_seconds': cache_info['max_age_seconds']
+                }
             }
         }
         
@@ -312,6 +454,122 @@ def scrape_titles():
             ]
         }), 500
 
+def scrape_and_count(url, max_pages=4, use_cache=True, top_n=50):
+    """抓取单个URL并统计词频，供批量抓取使用"""
+    start_time = time.time()
+    try:
+        cache_info = {}
+        titles = scrape_ebay_titles(url, max_pages, use_cache, True, cache_info)
+        word_counts = KeywordCounter(ngram_sizes=(1,)).add_titles(titles).counts()
+        result = {
+            'url': url,
+            'success': bool(titles),
+            'total_titles': len(titles),
+            'word_analysis': summarize_word_counts(word_counts, top_n),
+            'scraping_info': {
+                'pages_from_cache': cache_info['pages_from_cache'],
+                'pages_fetched': cache_info['pages_fetched'],
+                'cache_age_seconds': cache_info['max_age_seconds']
+            }
+        }
+        if not titles:
+            result['error'] = '未能抓取到任何商品标题'
+    except Exception as e:
+        print(f"批量抓取 {url} 失败: {str(e)}")
+        word_counts = Counter()
+        result = {'url': url, 'success': False, 'error': str(e)}
+
+    result['elapsed_seconds'] = round(time.time() - start_time, 3)
+    return result, word_counts
+
+def merge_word_counts(results_with_counts, top_n=50, translate=False):
+    """合并多个URL的词频统计，并记录每个词出现在多少个URL中"""
+    merged = Counter()
+    url_coverage = Counter()
+    for _, word_counts in results_with_counts:
+        merged.update(word_counts)
+        url_coverage.update(word_counts.keys())
+
+    summary = summarize_word_counts(merged, top_n)
+    for item in summary['top_words']:
+        item['url_count'] = url_coverage[item['word']]
+
+    if translate and summary['top_words']:
+        top_words = [(item['word'], item['count']) for item in summary['top_words']]
+        english_translations = translate_words_batch(top_words, 'en')
+        chinese_translations = translate_words_batch(top_words, 'zh-CN')
+        for item in summary['top_words']:
+            item['english'] = english_translations.get(item['word'], item['word'])
+            item['chinese'] = chinese_translations.get(item['word'], item['word'])
+
+    summary['urls_succeeded'] = sum(1 for result, _ in results_with_counts if result['success'])
+    summary['urls_total'] = len(results_with_counts)
+    return summary
+
+@title_scraper_bp.route('/batch', methods=['POST'])
+@cross_origin()
+def batch_scrape_titles():
+    """批量抓取多个URL的API端点，可按完成顺序流式返回（NDJSON）"""
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('urls'), list) or not data['urls']:
+        return jsonify({'error': '请提供有效的URL列表'}), 400
+
+    urls = list(dict.fromkeys(url.strip() for url in data['urls'] if isinstance(url, str) and url.strip()))
+    if not urls:
+        return jsonify({'error': 'URL列表中没有有效的URL字符串'}), 400
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({'error': f'一次最多抓取 {BATCH_MAX_URLS} 个URL'}), 400
+    invalid_urls = [url for url in urls if 'ebay' not in url.lower()]
+    if invalid_urls:
+        return jsonify({'error': '请提供有效的eBay URL', 'invalid_urls': invalid_urls}), 400
+
+    try:
+        max_pages = int_param(data, 'max_pages', SCRAPE_MAX_PAGES, maximum=SCRAPE_MAX_PAGES)
+        top_n = int_param(data, 'top_n', 50, maximum=BATCH_MAX_TOP_N)
+        workers = int_param(data, 'workers', 4, maximum=max(1, min(BATCH_MAX_WORKERS, len(urls))))
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {str(e)}'}), 400
+    use_cache = data.get('use_cache', True)
+    translate = data.get('translate', False)
+
+    logger.debug("开始批量抓取 %d 个URL，并发数: %d", len(urls), workers)
+
+    def run_batch():
+        """按完成顺序逐个产出 (结果, 词频)"""
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [executor.submit(scrape_and_count, url, max_pages, use_cache, top_n) for url in urls]
+            for future in concurrent.futures.as_completed(futures):
+                yield future.result()
+        finally:
+            # 客户端断开时取消尚未开始的任务
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    if data.get('stream', True):
+        def generate():
+            start_time = time.time()
+            completed = []
+            for result, word_counts in run_batch():
+                completed.append((result, word_counts))
+                yield json.dumps(dict(result, type='result'), ensure_ascii=False) + '\n'
+            merged = merge_word_counts(completed, top_n, translate)
+            merged['elapsed_seconds'] = round(time.time() - start_time, 3)
+            yield json.dumps({'type': 'summary', 'merged': merged}, ensure_ascii=False) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    start_time = time.time()
+    completed = list(run_batch())
+    order = {url: i for i, url in enumerate(urls)}
+    completed.sort(key=lambda item: order[item[0]['url']])
+    merged = merge_word_counts(completed, top_n, translate)
+    merged['elapsed_seconds'] = round(time.time() - start_time, 3)
+    return jsonify({
+        'success': merged['urls_succeeded'] > 0,
+        'results': [result for result, _ in completed],
+        'merged': merged
+    })
+
 @title_scraper_bp.route('/test', methods=['GET'])
 @cross_origin()
 def test_scraper():
@@ -1,12 +1,84 @@
-from flask import Blueprint, jsonify, request
+import io
+import os
+import json
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from src.models.user import User, db
 
 user_bp = Blueprint('user', __name__)
 
+USER_BULK_BATCH_SIZE = int(os.environ.get('USER_BULK_BATCH_SIZE', 5000))  # 每次 executemany 的行数
+USER_PAGE_DEFAULT_LIMIT = 100
+USER_PAGE_MAX_LIMIT = 1000
+USER_STREAM_CHUNK = 1000  # 流式返回全部用户时每次查询的行数
+BULK_CONFLICT_MODES = ('update', 'ignore', 'error')
+
+
+def fetch_user_page(after_id, limit):
+    """按主键做游标分页：WHERE id > after_id ORDER BY id LIMIT limit，不受偏移量大小影响"""
+    query = select(User.id, User.username, User.email).where(User.id > after_id).order_by(User.id).limit(limit)
+    return [dict(row) for row in db.session.execute(query).mappings()]
+
+
+def iter_users_json():
+    """逐批查询并输出 JSON 数组，内存占用与用户总数无关"""
+    yield '['
+    after_id = 0
+    first = True
+    while True:
+        users = fetch_user_page(after_id, USER_STREAM_CHUNK)
+        if not users:
+            break
+        chunk = json.dumps(users, ensure_ascii=False)[1:-1]
+        yield chunk if first else ',' + chunk
+        first = False
+        after_id = users[-1]['id']
+        if len(users) < USER_STREAM_CHUNK:
+            break
+    yield ']'
+
+
+def iter_bulk_rows():
+    """请求体可以是 JSON 数组、{"users": [...]} 或 NDJSON（每行一个用户，不需要整体读入内存）"""
+    if request.mimetype == 'application/x-ndjson':
+        # 请求流按行读取时每次只读很少的字节，包一层缓冲
+        for line in io.BufferedReader(request.stream, 1 << 16):
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+        return
+
+    data = request.get_json()
+    if isinstance(data, dict):
+        data = data.get('users')
+    if not isinstance(data, list):
+        raise ValueError('请求体必须是用户数组')
+    yield from data
+
+
+def upsert_batch(rows, mode):
+    """用同一条预编译的 INSERT 语句 executemany 写入一批用户，返回受影响的行数"""
+    statement = sqlite_insert(User.__table__)
+    if mode == 'update':
+        statement = statement.on_conflict_do_update(index_elements=['username'], set_={'email': statement.excluded.email})
+    elif mode == 'ignore':
+        statement = statement.on_conflict_do_nothing()
+    return db.session.execute(statement, rows).rowcount
+
+
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    """不带参数时流式返回全部用户；带 after_id / limit 时分页返回 {users, next_after_id}"""
+    if 'after_id' not in request.args and 'limit' not in request.args:
+        return Response(stream_with_context(iter_users_json()), mimetype='application/json')
+
+    after_id = request.args.get('after_id', 0, type=int)
+    limit = min(max(request.args.get('limit', USER_PAGE_DEFAULT_LIMIT, type=int), 1), USER_PAGE_MAX_LIMIT)
+    users = fetch_user_page(after_id, limit)
+    next_after_id = users[-1]['id'] if len(users) == limit else None
+    return jsonify({'users': users, 'next_after_id': next_after_id})
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -17,6 +89,41 @@ def create_user():
     db.session.commit()
     return jsonify(user.to_dict()), 201
 
+@user_bp.route('/users/bulk', methods=['POST'])
+def bulk_upsert_users():
+    """批量创建用户，整个请求在一个事务里分批插入
+
+    on_conflict 参数：update（默认，用户名已存在时更新邮箱）、ignore（跳过已存在的）、error（冲突时整体回滚）
+    """
+    mode = request.args.get('on_conflict', 'update')
+    if mode not in BULK_CONFLICT_MODES:
+        return jsonify({'error': f"on_conflict 必须是 {', '.join(BULK_CONFLICT_MODES)} 之一"}), 400
+
+    received = affected = batches = 0
+    batch = []
+    try:
+        for row in iter_bulk_rows():
+            if not isinstance(row, dict) or not row.get('username') or not row.get('email'):
+                raise ValueError(f"第 {received + 1} 个用户缺少 username 或 email")
+            batch.append({'username': str(row['username']), 'email': str(row['email'])})
+            received += 1
+            if len(batch) >= USER_BULK_BATCH_SIZE:
+                affected += upsert_batch(batch, mode)
+                batches += 1
+                batch = []
+        if batch:
+            affected += upsert_batch(batch, mode)
+            batches += 1
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except IntegrityError as e:
+        db.session.rollback()
+        return jsonify({'error': f'用户名或邮箱冲突: {str(e.orig)}'}), 409
+
+    return jsonify({'received': received, 'affected': affected, 'batches': batches, 'on_conflict': mode})
+
 @user_bp.route('/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     user = User.query.get_or_404(user_id)
@@ -0,0 +1,148 @@
+"""生产环境启动：预加载应用后 fork 多个工作进程共享同一个监听端口
+
+用法: python src/server.py --workers 4 --max-connections 64 --port 5000
+
+所有配置也可以通过环境变量设置：HOST、PORT、WORKERS、MAX_CONNECTIONS、BACKLOG。
+工作进程之间通过 mmap 文件共享图片指纹（FINGERPRINT_STORE_PATH），
+通过磁盘结果缓存共享分析结果（RESULT_STORE_DIR）。
+/api/metrics 由任意一个工作进程响应，输出的是所有工作进程的合计：各进程定期把指标快照写到
+METRICS_DIR（默认每次启动新建的临时目录），抓取时合并；gauge 带 pid 标签按进程分别输出。
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import shutil
+import argparse
+import tempfile
+import threading
+import socketserver
+# DON'T CHANGE THIS !!!
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.serving import BaseWSGIServer
+
+
+class BoundedWSGIServer(socketserver.ThreadingMixIn, BaseWSGIServer):
+    """每个连接一个线程，但同时处理的连接数不超过 max_connections（超出的在监听队列中等待）"""
+    multithread = True
+    daemon_threads = True
+
+    def __init__(self, *args, max_connections=64, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+def run_worker(app, sock, host, port, max_connections, metrics_dir):
+    """工作进程：在继承的监听套接字上处理请求"""
+    from src.models.user import db
+    from src.utils.metrics import REGISTRY
+    # fork 前父进程建立的数据库连接不能跨进程复用
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    snapshots = REGISTRY.enable_multiprocess(metrics_dir)
+    server = BoundedWSGIServer(host, port, app, fd=sock.fileno(), max_connections=max_connections)
+    try:
+        server.serve_forever()
+    finally:
+        snapshots.stop()
+
+
+def serve(app, host='0.0.0.0', port=5000, workers=4, max_connections=64, backlog=128):
+    """主进程：创建监听套接字，fork 工作进程并在其退出时重新拉起"""
+    sock = socket.create_server((host, port), backlog=backlog, reuse_port=False)
+    sock.set_inheritable(True)
+    print(f"生产模式启动: http://{host}:{port}  工作进程: {workers}  每进程最大连接数: {max_connections}")
+
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        # 上次启动留下的快照不计入本次的合计
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith('.json'):
+                os.remove(os.path.join(metrics_dir, name))
+    else:
+        metrics_dir = tempfile.mkdtemp(prefix='ebay-metrics-')
+
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app, sock, host, port, max_connections, metrics_dir)
+            finally:
+                os._exit(0)
+        children[pid] = time.time()
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if not stopping and started is not None:
+            print(f"工作进程 {pid} 退出（状态 {status}），重新启动")
+            # 避免启动即崩溃时疯狂重启
+            if time.time() - started < 1:
+                time.sleep(1)
+            spawn()
+    sock.close()
+    if not os.environ.get('METRICS_DIR'):
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WORKERS', os.cpu_count() or 2)))
+    parser.add_argument('--max-connections', type=int, default=int(os.environ.get('MAX_CONNECTIONS', 64)))
+    parser.add_argument('--backlog', type=int, default=int(os.environ.get('BACKLOG', 128)))
+    args = parser.parse_args(argv)
+
+    # 在 fork 之前预加载应用和重量级依赖，工作进程通过写时复制共享这部分内存
+    from src.main import app
+    from src.utils.lazy_import import warm_up
+    warm_up()
+    serve(app, args.host, args.port, args.workers, args.max_connections, args.backlog)
+
+
+if __name__ == '__main__':
+    main()
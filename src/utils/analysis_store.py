@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+from src.utils.lazy_import import lazy_module
+
+np = lazy_module('numpy')
+
+# 分析结果中按行存储的列及其类型
+COLUMN_DTYPES = {
+    'price': '<f8',
+    'volume': '<i8',
+    'total_sales': '<f8',
+    'phash': '<u8',
+    'has_phash': '|b1',
+    'title_simhash': '<u8',
+    'sold_date': '<M8[D]',  # 最后售出日期，无法解析时为 NaT
+    'source_file': '<i4',  # meta 中 source_files 的下标
+    'group_id': '<i4'
+}
+# 按分组存储的聚合列（第 i 个值对应 group_id 为 i 的分组）
+GROUP_COLUMN_DTYPES = {
+    'size': '<i4',
+    'total_sales': '<f8',
+    'volume': '<i8',
+    'price_min': '<f8',
+    'price_median': '<f8',
+    'price_max': '<f8'
+}
+
+
+class Analysis:
+    """一次分析的磁盘目录：meta.json、按列的原始二进制文件（np.memmap 读取）、records.ndjson 和 groups.ndjson"""
+
+    def __init__(self, path):
+        self.path = path
+        self.analysis_id = os.path.basename(path)
+        self._lock = threading.Lock()
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def read_meta(self):
+        with open(self.file('meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+
+    def update_meta(self, **fields):
+        """合并写入 meta.json（先写临时文件再替换，读取方不会看到写了一半的内容）"""
+        with self._lock:
+            try:
+                meta = self.read_meta()
+            except (OSError, ValueError):
+                meta = {'analysis_id': self.analysis_id}
+            meta.update(fields)
+            meta['updated_at'] = time.time()
+            tmp_path = self.file('meta.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(tmp_path, self.file('meta.json'))
+            return meta
+
+    def column_path(self, name):
+        return self.file(f"{name}.bin")
+
+    def column(self, name, mode='r', rows=None):
+        """以 memmap 方式打开一列；rows 省略时按 meta 中的总行数"""
+        rows = self.read_meta()['rows'] if rows is None else rows
+        dtype = np.dtype(COLUMN_DTYPES[name])
+        if rows == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.column_path(name), dtype=dtype, mode=mode, shape=(rows,))
+
+    def group_column_path(self, name):
+        return self.file(f"group_{name}.bin")
+
+    def group_column(self, name, mode='r', groups=None):
+        """以 memmap 方式打开一个分组聚合列；groups 省略时按 meta 中的分组数"""
+        groups = self.read_meta()['groups'] if groups is None else groups
+        dtype = np.dtype(GROUP_COLUMN_DTYPES[name])
+        if groups == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.group_column_path(name), dtype=dtype, mode=mode, shape=(groups,))
+
+    def records(self):
+        return RecordReader(self.file('records.ndjson'), self.column_offsets())
+
+    def column_offsets(self):
+        rows = self.read_meta()['rows']
+        return np.memmap(self.file('offsets.bin'), dtype='<u8', mode='r', shape=(rows + 1,))
+
+
+class ColumnWriter:
+    """分块追加写入各列和商品记录，内存中只保留当前块"""
+
+    def __init__(self, analysis):
+        self.analysis = analysis
+        self.rows = 0
+        self._position = 0
+        self._columns = {name: open(analysis.column_path(name), 'wb') for name in COLUMN_DTYPES if name != 'group_id'}
+        self._records = open(analysis.file('records.ndjson'), 'wb')
+        self._offsets = open(analysis.file('offsets.bin'), 'wb')
+        self._offsets.write(np.zeros(1, dtype='<u8').tobytes())
+
+    def append(self, columns, records):
+        """columns: {列名: 数组}，records: 与数组等长的商品字典列表"""
+        for name, handle in self._columns.items():
+            handle.write(np.ascontiguousarray(columns[name], dtype=COLUMN_DTYPES[name]).tobytes())
+        offsets = np.empty(len(records), dtype='<u8')
+        for i, record in enumerate(records):
+            line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+            self._records.write(line)
+            self._position += len(line)
+            offsets[i] = self._position
+        self._offsets.write(offsets.tobytes())
+        self.rows += len(records)
+
+    def close(self):
+        for handle in (*self._columns.values(), self._records, self._offsets):
+            handle.close()
+
+
+class RecordReader:
+    """按行号随机读取 records.ndjson 中的商品记录"""
+
+    def __init__(self, path, offsets):
+        self.offsets = offsets
+        self._file = open(path, 'rb')
+
+    def __getitem__(self, row):
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(os.pread(self._file.fileno(), end - start, start))
+
+    def close(self):
+        self._file.close()
+
+
+FINISHED_STATUSES = ('done', 'failed')
+
+
+class AnalysisStore:
+    """管理所有分析目录（按 analysis_id），多个工作进程共用同一个根目录
+
+    设置 ttl（秒）时，每次创建新分析前删除超过 ttl 没有更新的分析。
+    运行中的分析每处理一块都会更新 meta.json，超过 ttl 没有更新说明所在进程已经退出。
+    """
+
+    def __init__(self, root_dir, ttl=None):
+        self.root_dir = root_dir
+        self.ttl = ttl
+        os.makedirs(root_dir, exist_ok=True)
+
+    def create(self, **meta):
+        if self.ttl is not None:
+            self.prune()
+        analysis_id = uuid.uuid4().hex
+        path = os.path.join(self.root_dir, analysis_id)
+        os.makedirs(os.path.join(path, 'inputs'))
+        analysis = Analysis(path)
+        analysis.update_meta(created_at=time.time(), status='queued', rows=0, **meta)
+        return analysis
+
+    def get(self, analysis_id):
+        """按 ID 打开分析，不存在或 ID 非法时返回 None"""
+        if not analysis_id or not all(c in '0123456789abcdef' for c in analysis_id):
+            return None
+        path = os.path.join(self.root_dir, analysis_id)
+        if not os.path.isfile(os.path.join(path, 'meta.json')):
+            return None
+        return Analysis(path)
+
+    def delete(self, analysis_id):
+        """删除分析目录，返回是否存在"""
+        analysis = self.get(analysis_id)
+        if analysis is None:
+            return False
+        shutil.rmtree(analysis.path, ignore_errors=True)
+        return True
+
+    def prune(self):
+        """删除超过 ttl 没有更新的分析，返回删除的 analysis_id 列表"""
+        now = time.time()
+        removed = []
+        for analysis_id in os.listdir(self.root_dir):
+            analysis = self.get(analysis_id)
+            if analysis is None:
+                continue
+            try:
+                meta = analysis.read_meta()
+            except (OSError, ValueError):
+                continue  # 另一个进程正在删除
+            if now - meta.get('updated_at', meta.get('created_at', now)) > self.ttl and self.delete(analysis_id):
+                removed.append(analysis_id)
+        return removed
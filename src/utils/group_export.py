@@ -0,0 +1,128 @@
+import io
+import csv
+import json
+from src.utils.lazy_import import lazy_module
+from src.utils.analysis_store import GROUP_COLUMN_DTYPES
+from src.utils.similarity_index import RECORD_FIELDS
+
+np = lazy_module('numpy')
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+# 每次 yield 的字节数：太小时分块传输的开销占比高，太大时首字节延迟高
+EXPORT_BUFFER_BYTES = 1 << 16
+EXPORT_GROUP_BLOCK = 4096  # 每次从聚合列读取的分组数
+AGGREGATE_FIELDS = ('price_min', 'price_median', 'price_max', 'total_sales', 'volume')
+
+
+def write_group_aggregates(analysis, rows, groups):
+    """对所有组内商品做一次向量化计算，写出各分组的聚合列
+
+    只读取组内商品的行号、分组和价格（每个组内商品约 30 字节），与总行数无关。
+    """
+    columns = {name: analysis.group_column(name, mode='w+', groups=groups) for name in GROUP_COLUMN_DTYPES}
+    if groups == 0:
+        return
+
+    group_ids = analysis.column('group_id', rows=rows)
+    members = np.flatnonzero(np.asarray(group_ids) >= 0)
+    member_groups = np.asarray(group_ids[members], dtype=np.int64)
+
+    sizes = np.bincount(member_groups, minlength=groups)
+    columns['size'][:] = sizes
+    columns['total_sales'][:] = np.bincount(member_groups, weights=analysis.column('total_sales', rows=rows)[members],
+                                            minlength=groups)
+    # 销量是整数，bincount 的 weights 会转成 float64，用 add.at 保持精确
+    volume = np.zeros(groups, dtype=np.int64)
+    np.add.at(volume, member_groups, analysis.column('volume', rows=rows)[members])
+    columns['volume'][:] = volume
+
+    # 按 (分组, 价格) 排序后，每组的最小、中位、最大价格都在固定位置
+    prices = np.asarray(analysis.column('price', rows=rows)[members])
+    prices = prices[np.lexsort((prices, member_groups))]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    columns['price_min'][:] = prices[starts]
+    columns['price_max'][:] = prices[starts + sizes - 1]
+    columns['price_median'][:] = (prices[starts + (sizes - 1) // 2] + prices[starts + sizes // 2]) / 2
+
+    for column in columns.values():
+        column.flush()
+
+
+def load_group_aggregates(analysis):
+    """读取各分组的聚合列（memmap，不占用进程私有内存）"""
+    groups = analysis.read_meta()['groups']
+    return {name: analysis.group_column(name, groups=groups) for name in GROUP_COLUMN_DTYPES}
+
+
+def iter_group_summaries(aggregates, block=EXPORT_GROUP_BLOCK):
+    """按 group_id 顺序输出每个分组的聚合字段；每次把一段 memmap 转成列表（逐个下标读取 memmap 很慢）"""
+    fields = ('size', *AGGREGATE_FIELDS)
+    groups = len(aggregates['size'])
+    for start in range(0, groups, block):
+        end = min(start + block, groups)
+        values = [np.asarray(aggregates[name][start:end]).tolist() for name in fields]
+        for group_id, row in enumerate(zip(*values), start):
+            yield {'group_id': group_id, **dict(zip(fields, row))}
+
+
+def buffered(chunks, size=EXPORT_BUFFER_BYTES):
+    """把许多小片段合并成约 size 字节的块再输出"""
+    buffer, buffered_bytes = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_bytes += len(chunk)
+        if buffered_bytes >= size:
+            yield ''.join(buffer)
+            buffer, buffered_bytes = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_group_lines(analysis):
+    """逐行读取 groups.ndjson（第 i 行是 group_id 为 i 的分组）"""
+    with open(analysis.file('groups.ndjson'), encoding='utf-8') as f:
+        yield from f
+
+
+def iter_groups_ndjson(analysis, include_products=True):
+    """每行一个分组：聚合字段，include_products 时再加上组内商品"""
+    summaries = iter_group_summaries(load_group_aggregates(analysis))
+    if not include_products:
+        for summary in summaries:
+            yield json.dumps(summary, ensure_ascii=False) + '\n'
+        return
+
+    for summary, line in zip(summaries, iter_group_lines(analysis)):
+        # groups.ndjson 的每行以 {"group_id": .., "size": .., "products": [ 开头，
+        # 直接把聚合字段拼在商品列表前面，不解析和重新序列化商品
+        yield json.dumps(summary, ensure_ascii=False)[:-1] + ', ' + line[line.index('"products": '):]
+
+
+def iter_groups_csv(analysis, include_products=True):
+    """CSV：include_products 时每行一个商品并带上所在分组的聚合字段，否则每行一个分组"""
+    summaries = iter_group_summaries(load_group_aggregates(analysis))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    group_fields = ['group_id', 'group_size', *[f'group_{name}' for name in AGGREGATE_FIELDS]]
+    if not include_products:
+        writer.writerow(group_fields)
+        yield flush()
+        for summary in summaries:
+            writer.writerow(summary.values())
+            yield flush()
+        return
+
+    writer.writerow([*group_fields, 'row', *RECORD_FIELDS])
+    yield flush()
+    for summary, line in zip(summaries, iter_group_lines(analysis)):
+        group = list(summary.values())
+        writer.writerows([*group, product['row'], *[product.get(field) for field in RECORD_FIELDS]]
+                         for product in json.loads(line)['products'])
+        yield flush()
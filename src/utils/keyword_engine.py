@@ -0,0 +1,194 @@
+import re
+import heapq
+from array import array
+from collections import Counter
+
+# 德语单词（包括德语特殊字符），预编译以便逐条标题复用
+TOKEN_RE = re.compile(r'\b[a-zA-ZäöüßÄÖÜ]+\b')
+
+# German stop words
+GERMAN_STOP_WORDS = {
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einer", "eines", "einem", "einen",
+    "und", "oder", "aber", "doch", "sondern", "denn", "wenn", "als", "wie", "wo", "was", "wer",
+    "mit", "für", "von", "zu", "bei", "nach", "vor", "über", "unter", "durch", "gegen", "ohne",
+    "um", "an", "auf", "aus", "in", "ist", "sind", "war", "waren", "hat", "haben", "wird", "werden",
+    "ich", "du", "er", "sie", "es", "wir", "ihr", "sich", "mich", "dich", "uns", "euch", "ihm", "ihr",
+    "nicht", "nur", "auch", "noch", "schon", "mehr", "sehr", "so", "dann", "hier", "da", "dort",
+    "neu", "gebraucht", "original", "genuine", "brand", "marke", "set", "kit", "pack", "piece", "stück"
+}
+
+
+def tokenize(title, stop_words=GERMAN_STOP_WORDS, min_length=3):
+    """对单条标题分词，停用词和短词用 None 占位（短语不跨越被过滤的词）"""
+    return [
+        word if word not in stop_words and len(word) >= min_length else None
+        for word in TOKEN_RE.findall(title.lower())
+    ]
+
+
+def iter_ngrams(tokens, n):
+    """从分词结果生成 n-gram 短语，跳过包含被过滤词的窗口"""
+    if n == 1:
+        for token in tokens:
+            if token is not None:
+                yield token
+        return
+    for i in range(len(tokens) - n + 1):
+        window = tokens[i:i + n]
+        if None not in window:
+            yield ' '.join(window)
+
+
+class CountMinSketch:
+    """Count-Min Sketch：固定内存的近似计数（只会高估，不会低估）"""
+
+    def __init__(self, width=1 << 16, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('d', bytes(8 * width)) for _ in range(depth)]
+
+    def _indexes(self, item):
+        # 双重哈希生成 depth 个下标
+        h1 = hash(item)
+        h2 = hash((item, 'cms')) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, item, weight=1):
+        """增加计数并返回新的估计值"""
+        estimate = None
+        for row, index in zip(self.rows, self._indexes(item)):
+            row[index] += weight
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        return estimate
+
+    def estimate(self, item):
+        """返回计数估计值"""
+        return min(row[index] for row, index in zip(self.rows, self._indexes(item)))
+
+
+class HeavyHitters:
+    """Count-Min Sketch + 最小堆，只保留估计频次最高的 capacity 个短语"""
+
+    def __init__(self, capacity=1000, width=1 << 16, depth=4):
+        self.capacity = capacity
+        self.sketch = CountMinSketch(width, depth)
+        self.top = {}
+        self._heap = []
+
+    def _push(self, item, estimate):
+        self.top[item] = estimate
+        heapq.heappush(self._heap, (estimate, item))
+        # 堆中累积的过期条目过多时重建
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, key) for key, count in self.top.items()]
+            heapq.heapify(self._heap)
+
+    def _min_entry(self):
+        # 丢弃过期条目（计数已被更新或已被淘汰）
+        while self._heap and self.top.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0]
+
+    def add(self, item, weight=1):
+        estimate = self.sketch.add(item, weight)
+        if item in self.top or len(self.top) < self.capacity:
+            self._push(item, estimate)
+        elif estimate > self._min_entry()[0]:
+            _, evicted = heapq.heappop(self._heap)
+            del self.top[evicted]
+            self._push(item, estimate)
+
+    def most_common(self, n):
+        return heapq.nlargest(n, self.top.items(), key=lambda entry: entry[1])
+
+
+class KeywordCounter:
+    """流式关键词统计：逐条标题分词，统计单词和 n-gram 短语
+
+    小数据量时使用精确计数（Counter），某一阶 n-gram 的不同短语数超过
+    exact_limit 后自动切换为 Count-Min Sketch + 最小堆，内存占用固定。
+    """
+
+    def __init__(self, stop_words=GERMAN_STOP_WORDS, ngram_sizes=(1, 2, 3), exact_limit=100000,
+                 capacity=1000, width=1 << 16, depth=4):
+        self.stop_words = stop_words
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.exact_limit = exact_limit
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.titles = 0
+        self._exact = {n: Counter() for n in self.ngram_sizes}
+        self._approx = {}
+        self._totals = {n: 0 for n in self.ngram_sizes}
+
+    def add_title(self, title, weight=1):
+        """统计一条标题"""
+        if not title:
+            return
+        self.titles += 1
+        tokens = tokenize(title, self.stop_words)
+        for n in self.ngram_sizes:
+            phrases = list(iter_ngrams(tokens, n))
+            if not phrases:
+                continue
+            self._totals[n] += weight * len(phrases)
+            if n in self._approx:
+                heavy_hitters = self._approx[n]
+                for phrase in phrases:
+                    heavy_hitters.add(phrase, weight)
+                continue
+
+            counter = self._exact[n]
+            for phrase in phrases:
+                counter[phrase] += weight
+            if len(counter) > self.exact_limit:
+                self._switch_to_sketch(n)
+
+    def add_titles(self, titles, weight=1):
+        """逐条统计标题（可以是生成器，不需要一次性载入内存）"""
+        for title in titles:
+            self.add_title(title, weight)
+        return self
+
+    def _switch_to_sketch(self, n):
+        heavy_hitters = HeavyHitters(self.capacity, self.width, self.depth)
+        for phrase, count in self._exact[n].items():
+            heavy_hitters.add(phrase, count)
+        self._approx[n] = heavy_hitters
+        self._exact[n] = None
+
+    def is_exact(self, n=1):
+        """该阶 n-gram 的计数是否为精确值"""
+        return n not in self._approx
+
+    def counts(self, n=1):
+        """返回精确计数的 Counter（近似模式下返回 None）"""
+        return self._exact[n] if self.is_exact(n) else None
+
+    def total(self, n=1):
+        """该阶 n-gram 的总出现次数（精确值）"""
+        return self._totals[n]
+
+    def unique_count(self, n=1):
+        """不同短语数量（近似模式下无法精确得到，返回 None）"""
+        return len(self._exact[n]) if self.is_exact(n) else None
+
+    def most_common(self, top_n=50, n=1):
+        """返回频次最高的短语列表 [(短语, 次数), ...]"""
+        if self.is_exact(n):
+            return self._exact[n].most_common(top_n)
+        return [(phrase, round(count)) for phrase, count in self._approx[n].most_common(top_n)]
+
+    def summary(self, top_n=50, n=1):
+        """汇总某一阶 n-gram 的统计结果"""
+        total = self.total(n)
+        return [
+            {
+                'phrase': phrase,
+                'count': count,
+                'frequency': round(count / total * 100, 2) if total else 0.0
+            }
+            for phrase, count in self.most_common(top_n, n)
+        ]
@@ -0,0 +1,47 @@
+import importlib
+import threading
+
+# 已登记的重量级依赖（供预热使用）
+_registered = []
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """模块代理：第一次访问属性时才真正导入模块，减少冷启动时间和每个进程的内存占用"""
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            with _lock:
+                module = self.__dict__['_module']
+                if module is None:
+                    module = importlib.import_module(self.__dict__['_name'])
+                    self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_module(name):
+    """返回延迟导入的模块代理"""
+    module = LazyModule(name)
+    _registered.append(module)
+    return module
+
+
+def warm_up():
+    """导入所有已登记的延迟模块（进程启动后或 fork 之前调用，避免首个请求变慢）"""
+    names = []
+    for module in list(_registered):
+        module._load()
+        names.append(module.__dict__['_name'])
+    return names
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    metric_type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def _merge(self, key, value):
+        """合并另一个进程快照中的值"""
+        self._values[key] = self._values.get(key, 0) + value
+
+    def _export(self, value):
+        return value
+
+    def snapshot(self):
+        """可 JSON 序列化的当前状态"""
+        with self._lock:
+            values = [[[str(label) for label in key], self._export(value)] for key, value in self._values.items()]
+        return {'type': self.metric_type, 'documentation': self.documentation,
+                'labelnames': list(self.labelnames), 'values': values}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """可任意设置的当前值"""
+    metric_type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """延迟分布直方图（累计分桶、总和、次数）"""
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _merge(self, key, value):
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0] = [a + b for a, b in zip(state[0], value[0])]
+        state[1] += value[1]
+        state[2] += value[2]
+
+    def _export(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def snapshot(self):
+        return dict(super().snapshot(), buckets=list(self.buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """计时上下文管理器"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+METRIC_TYPES = {cls.metric_type: cls for cls in (Counter, Gauge, Histogram)}
+
+
+def merge_snapshots(snapshots):
+    """合并多个进程的快照 [(pid, 快照)]：计数器和直方图按标签求和，gauge 加上 pid 标签分别输出"""
+    merged = {}
+    for pid, metrics in snapshots:
+        for name, entry in metrics.items():
+            cls = METRIC_TYPES[entry['type']]
+            per_process = cls is Gauge
+            metric = merged.get(name)
+            if metric is None:
+                labelnames = entry['labelnames'] + (['pid'] if per_process else [])
+                kwargs = {'buckets': entry['buckets']} if cls is Histogram else {}
+                metric = merged[name] = cls(name, entry['documentation'], labelnames, **kwargs)
+            for key, value in entry['values']:
+                metric._merge(tuple(key) + ((str(pid),) if per_process else ()), value)
+    return [merged[name] for name in sorted(merged)]
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ProcessSnapshots:
+    """多进程部署时跨进程汇总指标
+
+    每个工作进程每隔 interval 秒把自己的快照写到 directory/<pid>.json（退出时再写一次），
+    抓取时合并本进程的实时状态和其他进程最近的快照，所以无论请求落到哪个工作进程，
+    看到的都是全部进程的合计（其他进程的数据最多落后 interval 秒）。
+    已退出进程的计数器和直方图继续计入合计，保证重启工作进程后计数器不会变小；它们的 gauge 不再输出。
+    """
+
+    def __init__(self, registry, directory, interval=5.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.pid = os.getpid()
+        os.makedirs(directory, exist_ok=True)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        path = os.path.join(self.directory, f"{self.pid}.json")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.registry.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入指标快照失败: {str(e)}")
+
+    def stop(self):
+        self._stop.set()
+        self.write()
+
+    def collect(self):
+        snapshots = [(self.pid, self.registry.snapshot())]
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name == f"{self.pid}.json":
+                continue
+            pid = int(name[:-len('.json')])
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    metrics = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(pid):
+                metrics = {metric_name: entry for metric_name, entry in metrics.items() if entry['type'] != 'gauge'}
+            snapshots.append((pid, metrics))
+        return snapshots
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._process_snapshots = None
+
+    def _get_or_create(self, cls, name, documentation, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def enable_multiprocess(self, directory, interval=5.0):
+        """预 fork 的工作进程中调用：之后 render 输出所有工作进程的合计（见 ProcessSnapshots）"""
+        self._process_snapshots = ProcessSnapshots(self, directory, interval)
+        return self._process_snapshots
+
+    def render(self):
+        """按 Prometheus 文本格式输出所有指标"""
+        if self._process_snapshots is not None:
+            metrics = merge_snapshots(self._process_snapshots.collect())
+        else:
+            with self._lock:
+                metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
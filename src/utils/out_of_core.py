@@ -0,0 +1,427 @@
+import os
+import io
+import csv
+import json
+import math
+import time
+import shutil
+import resource
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.lazy_import import lazy_module
+from src.utils.analysis_store import ColumnWriter
+from src.utils.group_export import write_group_aggregates
+from src.utils.sales_series import write_sales_series
+from src.utils.similarity_index import RECORD_FIELDS, COARSE_WEIGHTS, TITLE_HAMMING_SCALE
+from src.utils.simhash import simhash_many
+
+np = lazy_module('numpy')
+
+# 解析一块商品和在一个分区内生成候选对时每行的峰值内存估算，用于由内存上限推出块大小
+BYTES_PER_ROW_ESTIMATE = 4096
+MIN_CHUNK_ROWS = 1000
+# 分块键：标题 SimHash 和图片 pHash 各切成 4 段 16 位，任意一段相同的商品进入同一块
+BAND_BITS = 16
+TITLE_BANDS = 4
+PHASH_BANDS = 4
+# 同一块内按价格排序后，每个商品只和后面这么多个价格相近的商品比较
+BLOCK_NEIGHBORS = 16
+# 粗排分数低于该值的候选对不做精确比较（不相关商品的粗排分数约为 0.35）
+COARSE_MIN_SCORE = 0.45
+
+
+def current_rss_mb():
+    """当前进程的匿名常驻内存（MB）；不含 memmap 映射的文件页，这部分内核可以随时回收"""
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('RssAnon:')) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MemoryLimitExceeded(Exception):
+    """块大小已降到最小，内存仍超过上限"""
+
+
+def effective_chunk_rows(chunk_rows, memory_cap_mb):
+    """块大小同时受配置和内存上限约束"""
+    return max(MIN_CHUNK_ROWS, min(chunk_rows, memory_cap_mb * 1024 * 1024 // BYTES_PER_ROW_ESTIMATE))
+
+
+def product_columns(products, phash, has_phash, file_index):
+    """一块商品对应的各列（ColumnWriter.append 的参数），离线分析和 /upload 的结果共用"""
+    return {
+        'price': [product['price_numeric'] for product in products],
+        'volume': [product['volume_numeric'] for product in products],
+        'total_sales': [product['total_sales'] for product in products],
+        'phash': phash,
+        'has_phash': has_phash,
+        'title_simhash': simhash_many([product['title'] for product in products]),
+        'sold_date': [product.get('sold_date') for product in products],
+        'source_file': [file_index.get(product['source_file'], -1) for product in products]
+    }, [{field: product.get(field) for field in RECORD_FIELDS} for product in products]
+
+
+class UnionFind:
+    """向量化并查集：父节点数组放在 memmap 文件里，每次合并一批边"""
+
+    def __init__(self, path, rows, chunk_rows):
+        self.labels = np.memmap(path, dtype='<i4', mode='w+', shape=(rows,))
+        for start in range(0, rows, chunk_rows):
+            end = min(start + chunk_rows, rows)
+            self.labels[start:end] = np.arange(start, end, dtype=np.int32)
+
+    def find(self, rows):
+        roots = self.labels[rows]
+        while True:
+            parents = self.labels[roots]
+            if np.array_equal(parents, roots):
+                break
+            roots = parents
+        # 路径压缩
+        self.labels[rows] = roots
+        return roots
+
+    def union(self, a, b):
+        """合并每一对 (a[i], b[i])；每轮把较大的根挂到较小的根上，直到所有边两端同根"""
+        while len(a):
+            root_a, root_b = self.find(a), self.find(b)
+            differ = root_a != root_b
+            if not differ.any():
+                return
+            a, b, root_a, root_b = a[differ], b[differ], root_a[differ], root_b[differ]
+            self.labels[np.maximum(root_a, root_b)] = np.minimum(root_a, root_b)
+
+    def flatten(self, chunk_rows):
+        """让每一行直接指向根"""
+        for start in range(0, len(self.labels), chunk_rows):
+            self.find(np.arange(start, min(start + chunk_rows, len(self.labels))))
+
+
+class OutOfCoreAnalyzer:
+    """内存受限的相似商品分析：
+
+    1. 逐块解析 CSV，把价格、销量、指纹等列和商品记录追加写入分析目录（np.memmap 读取）
+    2. 按标题 SimHash 段和图片 pHash 段分块，按键值把行号分到若干分区文件，
+       每个分区在内存中按 (键, 价格) 排序，只比较相邻的价格相近商品
+    3. 候选对先向量化粗排，再用与 /upload 相同的规则精确判断，通过的边并入并查集
+    4. 按根节点分区输出分组，逐组写入 groups.ndjson，并写出每行的 group_id 列
+    5. 一次向量化计算各分组的销售额、销量和价格分布，写出分组聚合列（导出时直接读取）
+    6. 按最后售出日期生成分组和来源文件的按天/按周销售序列（趋势查询直接读取）
+
+    每一步的内存只与块大小有关，与总行数无关（并查集每行 4 字节除外）。
+    memory_cap_mb 限制的是 run() 开始后进程匿名常驻内存的增量：超过时块大小减半（之后的块和分区变小），
+    块大小已是 MIN_CHUNK_ROWS 时内存仍在增长则中止分析，状态为 failed。
+    增量按整个进程统计，服务中每次分析都在单独的子进程中运行（src/analysis_worker.py），
+    同一进程中不要同时运行其他分析或请求，否则它们的内存也会计入。
+    """
+
+    def __init__(self, analysis, parse_row, fingerprint, is_similar_pair, chunk_rows=50000, memory_cap_mb=512,
+                 use_images=True, max_price_diff=0.5, image_workers=16):
+        self.analysis = analysis
+        self.parse_row = parse_row
+        self.fingerprint = fingerprint
+        self.is_similar_pair = is_similar_pair
+        self.chunk_rows = effective_chunk_rows(chunk_rows, memory_cap_mb)
+        self.memory_cap_mb = memory_cap_mb
+        self.use_images = use_images
+        self.max_price_diff = max_price_diff
+        self.image_workers = image_workers
+        self.baseline_rss_mb = self.peak_rss_mb = None  # run() 开始时记录
+        self._limited_rss_mb = None  # 上次因超限缩小块时的内存
+        self.rows = 0
+        self.stats = {'rows_skipped': 0, 'candidate_pairs': 0, 'coarse_passed': 0, 'verified_edges': 0}
+
+    def _settings(self):
+        return {
+            'chunk_rows': self.chunk_rows,
+            'memory_cap_mb': self.memory_cap_mb,
+            'use_images': self.use_images,
+            'max_price_diff': self.max_price_diff
+        }
+
+    def _sample_memory(self):
+        """内存增量超过上限时缩小块大小，已是最小块时抛出 MemoryLimitExceeded
+
+        释放的内存不一定还给操作系统，所以只有内存比上次缩小块时继续增长才再次处理。
+        """
+        rss = current_rss_mb()
+        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+        if rss <= self._limited_rss_mb:
+            return
+        self._limited_rss_mb = rss
+        growth = rss - self.baseline_rss_mb
+        if self.chunk_rows <= MIN_CHUNK_ROWS:
+            raise MemoryLimitExceeded(
+                f"内存增量 {growth:.1f}MB 超过上限 {self.memory_cap_mb}MB（块大小已是最小的 {MIN_CHUNK_ROWS} 行）")
+        self.chunk_rows = max(MIN_CHUNK_ROWS, self.chunk_rows // 2)
+        print(f"分析 {self.analysis.analysis_id} 内存增量 {growth:.0f}MB 超过上限 {self.memory_cap_mb}MB，"
+              f"块大小降为 {self.chunk_rows} 行")
+        self.analysis.update_meta(settings=self._settings())
+
+    def _progress(self, status, **fields):
+        if status != 'failed':
+            self._sample_memory()
+        self.analysis.update_meta(status=status, peak_rss_mb=round(self.peak_rss_mb, 1), **fields)
+
+    def run(self, inputs):
+        """inputs: [(文件路径, 原始文件名)]"""
+        start_time = time.time()
+        self.baseline_rss_mb = self.peak_rss_mb = current_rss_mb()
+        self._limited_rss_mb = self.baseline_rss_mb + self.memory_cap_mb
+        try:
+            self._progress('parsing', settings=self._settings(), grouping='union_find',
+                           baseline_rss_mb=round(self.baseline_rss_mb, 1))
+            self.rows = self.spill_columns(inputs)
+            self._progress('blocking', rows=self.rows)
+
+            groups = products_in_groups = 0
+            if self.rows:
+                union_find = UnionFind(self.analysis.file('labels.bin'), self.rows, self.chunk_rows)
+                self.find_edges(union_find)
+                self._progress('grouping', **self.stats)
+                groups, products_in_groups = self.write_groups(union_find)
+                del union_find
+            else:
+                open(self.analysis.file('groups.ndjson'), 'wb').close()
+            write_group_aggregates(self.analysis, self.rows, groups)
+            sold_dates = write_sales_series(self.analysis, self.rows, self.chunk_rows)
+
+            self._cleanup()
+            self._progress('done', groups=groups, products_in_groups=products_in_groups,
+                           seconds=time.time() - start_time, **sold_dates, **self.stats)
+        except Exception as e:
+            print(f"离线分析 {self.analysis.analysis_id} 失败: {str(e)}")
+            self._cleanup()
+            self._progress('failed', error=str(e), seconds=time.time() - start_time)
+            raise
+
+    def _cleanup(self):
+        shutil.rmtree(self.analysis.file('inputs'), ignore_errors=True)
+        shutil.rmtree(self.analysis.file('partitions'), ignore_errors=True)
+        try:
+            os.remove(self.analysis.file('labels.bin'))
+        except OSError:
+            pass
+
+    def iter_product_chunks(self, inputs):
+        chunk = []
+        for path, filename in inputs:
+            with open(path, 'rb') as f:
+                for row in csv.DictReader(io.TextIOWrapper(f, encoding='utf-8')):
+                    try:
+                        product = self.parse_row(row, filename)
+                    except Exception:
+                        self.stats['rows_skipped'] += 1
+                        continue
+                    chunk.append(product)
+                    if len(chunk) >= self.chunk_rows:
+                        yield chunk
+                        chunk = []
+        if chunk:
+            yield chunk
+
+    def spill_columns(self, inputs):
+        """逐块解析并写出列文件，返回总行数"""
+        source_files = list(dict.fromkeys(filename for _, filename in inputs))
+        file_index = {filename: i for i, filename in enumerate(source_files)}
+        self.analysis.update_meta(source_files=source_files)
+        writer = ColumnWriter(self.analysis)
+        try:
+            with ThreadPoolExecutor(max_workers=self.image_workers) as executor:
+                for products in self.iter_product_chunks(inputs):
+                    phash = np.zeros(len(products), dtype=np.uint64)
+                    has_phash = np.zeros(len(products), dtype=bool)
+                    if self.use_images:
+                        urls = list({product['image_url'] for product in products if product['image_url']})
+                        fingerprints = dict(zip(urls, executor.map(self.fingerprint, urls)))
+                        for i, product in enumerate(products):
+                            value = fingerprints.get(product['image_url'])
+                            if value is not None:
+                                phash[i] = value
+                                has_phash[i] = True
+
+                    writer.append(*product_columns(products, phash, has_phash, file_index))
+                    self._progress('parsing', rows_parsed=writer.rows)
+        finally:
+            writer.close()
+        return writer.rows
+
+    def _block_tables(self):
+        """(列名, 段序号)：标题 SimHash 各段，使用图片时再加 pHash 各段"""
+        tables = [('title_simhash', band) for band in range(TITLE_BANDS)]
+        if self.use_images:
+            tables += [('phash', band) for band in range(PHASH_BANDS)]
+        return tables
+
+    def find_edges(self, union_find):
+        columns = {name: self.analysis.column(name, rows=self.rows) for name in ('price', 'phash', 'has_phash', 'title_simhash')}
+        records = RecordCache(self.analysis.records())
+        partition_count = max(1, math.ceil(self.rows / self.chunk_rows))
+        partition_dir = self.analysis.file('partitions')
+        os.makedirs(partition_dir, exist_ok=True)
+        mask = np.uint64((1 << BAND_BITS) - 1)
+
+        try:
+            for table_number, (column, band) in enumerate(self._block_tables()):
+                # 第一遍：按块读取列，把 (键, 行号) 追加到键所在的分区文件
+                paths = [os.path.join(partition_dir, f"{column}-{band}-{i}.bin") for i in range(partition_count)]
+                handles = [open(path, 'wb') for path in paths]
+                try:
+                    for start in range(0, self.rows, self.chunk_rows):
+                        end = min(start + self.chunk_rows, self.rows)
+                        values = np.asarray(columns[column][start:end])
+                        valid = columns['has_phash'][start:end] if column == 'phash' else values != 0
+                        rows = np.arange(start, end, dtype=np.uint64)[valid]
+                        keys = (values[valid] >> np.uint64(band * BAND_BITS)) & mask
+                        partitions = keys % np.uint64(partition_count)
+                        for partition in np.unique(partitions):
+                            selected = partitions == partition
+                            handles[int(partition)].write(np.column_stack((keys[selected], rows[selected])).tobytes())
+                finally:
+                    for handle in handles:
+                        handle.close()
+
+                # 第二遍：逐个分区排序并生成候选对
+                for path in paths:
+                    pairs = np.fromfile(path, dtype='<u8').reshape(-1, 2)
+                    os.remove(path)
+                    if len(pairs) > 1:
+                        self._process_partition(pairs[:, 0], pairs[:, 1].astype(np.int64), columns, records, union_find)
+                self._progress('blocking', tables_done=table_number + 1, **self.stats)
+        finally:
+            records.close()
+
+    def _process_partition(self, keys, rows, columns, records, union_find):
+        prices = columns['price'][rows]
+        order = np.lexsort((prices, keys))
+        keys, rows, prices = keys[order], rows[order], prices[order]
+        # 价格升序，后面的商品价格不超过前面的 1 / (1 - max_price_diff) 倍才可能相似
+        price_limit = prices / (1 - self.max_price_diff) if self.max_price_diff < 1 else np.full(len(prices), np.inf)
+
+        phash, has_phash = columns['phash'], columns['has_phash']
+        # 按偏移量逐轮生成候选对：每轮最多与分区行数相同，不会一次生成 BLOCK_NEIGHBORS 倍的候选对
+        for offset in range(1, min(BLOCK_NEIGHBORS, len(rows) - 1) + 1):
+            same_block = (keys[:-offset] == keys[offset:]) & ((prices[offset:] <= price_limit[:-offset]) | (prices[:-offset] <= 0))
+            a, b = rows[:-offset][same_block], rows[offset:][same_block]
+            self.stats['candidate_pairs'] += len(a)
+            if not len(a):
+                continue
+
+            # 已经在同一组的不必再比较
+            connected = union_find.find(a) == union_find.find(b)
+            a, b = a[~connected], b[~connected]
+
+            scores = pair_coarse_scores(columns, a, b)
+            passed = scores >= COARSE_MIN_SCORE
+            a, b = a[passed], b[passed]
+            self.stats['coarse_passed'] += len(a)
+
+            edges = [
+                (i, j) for i, j in zip(a.tolist(), b.tolist())
+                if self.is_similar_pair(records[i], records[j],
+                                        int(phash[i]) if has_phash[i] else None,
+                                        int(phash[j]) if has_phash[j] else None)
+            ]
+            self.stats['verified_edges'] += len(edges)
+            if edges:
+                edges = np.array(edges, dtype=np.int64)
+                union_find.union(edges[:, 0], edges[:, 1])
+        records.clear()
+        self._sample_memory()
+
+    def write_groups(self, union_find):
+        """按根节点分区，逐组写出 groups.ndjson 和 group_id 列，返回 (分组数, 组内商品数)"""
+        union_find.flatten(self.chunk_rows)
+        labels = union_find.labels
+        partition_count = max(1, math.ceil(self.rows / self.chunk_rows))
+        partition_dir = self.analysis.file('partitions')
+        os.makedirs(partition_dir, exist_ok=True)
+
+        paths = [os.path.join(partition_dir, f"groups-{i}.bin") for i in range(partition_count)]
+        handles = [open(path, 'wb') for path in paths]
+        try:
+            for start in range(0, self.rows, self.chunk_rows):
+                end = min(start + self.chunk_rows, self.rows)
+                roots = np.asarray(labels[start:end], dtype=np.int64)
+                rows = np.arange(start, end, dtype=np.int64)
+                # 同一组的行进入同一分区，单独成组的行在输出时按组大小过滤掉
+                partitions = roots % partition_count
+                for partition in np.unique(partitions):
+                    selected = partitions == partition
+                    handles[int(partition)].write(np.column_stack((roots[selected], rows[selected])).tobytes())
+        finally:
+            for handle in handles:
+                handle.close()
+
+        group_ids = self.analysis.column('group_id', mode='w+', rows=self.rows)
+        for start in range(0, self.rows, self.chunk_rows):
+            group_ids[start:min(start + self.chunk_rows, self.rows)] = -1
+
+        records = self.analysis.records()
+        groups = products_in_groups = 0
+        tmp_path = self.analysis.file('groups.ndjson.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as out:
+                for path in paths:
+                    pairs = np.fromfile(path, dtype='<i8').reshape(-1, 2)
+                    os.remove(path)
+                    if not len(pairs):
+                        continue
+                    pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+                    roots, counts = np.unique(pairs[:, 0], return_counts=True)
+                    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+                    for group_start, count in zip(starts[counts > 1].tolist(), counts[counts > 1].tolist()):
+                        members = pairs[group_start:group_start + count, 1]
+                        group_ids[members] = groups
+                        # 超大的组也逐个商品写出，不在内存中拼接整行
+                        out.write(f'{{"group_id": {groups}, "size": {count}, "products": [')
+                        for n, row in enumerate(members.tolist()):
+                            out.write((', ' if n else '') + json.dumps({'row': row, **records[row]}, ensure_ascii=False))
+                        out.write(']}\n')
+                        groups += 1
+                        products_in_groups += count
+                    self._sample_memory()
+            os.replace(tmp_path, self.analysis.file('groups.ndjson'))
+        finally:
+            records.close()
+        group_ids.flush()
+        return groups, products_in_groups
+
+
+class RecordCache:
+    """分区内的商品记录缓存（同一商品会出现在多个候选对中），每个分区处理完清空"""
+
+    def __init__(self, reader):
+        self.reader = reader
+        self._cache = {}
+
+    def __getitem__(self, row):
+        record = self._cache.get(row)
+        if record is None:
+            record = self._cache[row] = self.reader[row]
+        return record
+
+    def clear(self):
+        self._cache.clear()
+
+    def close(self):
+        self.reader.close()
+
+
+def pair_coarse_scores(columns, a, b):
+    """候选对的近似综合分数（与相似度索引的粗排相同的权重）"""
+    price_a, price_b = columns['price'][a], columns['price'][b]
+    highest = np.maximum(price_a, price_b)
+    price_similarity = np.where((price_a > 0) & (price_b > 0),
+                                1 - np.abs(price_a - price_b) / np.where(highest > 0, highest, 1), 0)
+
+    both_images = columns['has_phash'][a] & columns['has_phash'][b]
+    image_distance = np.bitwise_count(columns['phash'][a] ^ columns['phash'][b])
+    image_similarity = np.where(both_images, 1 - image_distance / 64, 0)
+
+    title_distance = np.bitwise_count(columns['title_simhash'][a] ^ columns['title_simhash'][b])
+    title_similarity = np.clip(1 - title_distance / TITLE_HAMMING_SCALE, 0, 1)
+
+    return (COARSE_WEIGHTS['image'] * image_similarity
+            + COARSE_WEIGHTS['title'] * title_similarity
+            + COARSE_WEIGHTS['price'] * price_similarity)
@@ -0,0 +1,154 @@
+import os
+import json
+import zlib
+import time
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# eBay 跟踪参数，不影响搜索结果，归一化时去掉
+TRACKING_PARAMS = {'_trksid', '_trkparms', '_from', 'hash', 'mkevt', 'mkcid', 'mkrid', 'campid', 'toolid', 'customid'}
+
+
+def normalize_url(url):
+    """归一化URL：小写协议和域名，去掉片段和跟踪参数，查询参数排序"""
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS
+    )
+    path = parts.path or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+class PageCache:
+    """基于磁盘的页面缓存，按归一化URL和页码存储压缩后的页面内容
+
+    读到超过 ttl + stale_ttl 的条目时删除；写入时每隔 prune_interval 秒清理一次：
+    删除所有超期条目，总大小超过 max_bytes 时再从最旧的开始删除。
+    """
+
+    def __init__(self, cache_dir, ttl=3600, stale_ttl=86400, compress_level=6, max_bytes=512 * 1024 * 1024,
+                 prune_interval=300):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.compress_level = compress_level
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='page-cache-refresh')
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url, page):
+        key = hashlib.sha256(f"{normalize_url(url)}#{page}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + '.z')
+
+    def get(self, url, page):
+        """读取缓存，返回 (内容, 缓存年龄秒数, 抓取该页时使用的URL) 或 None"""
+        path = self._path(url, page)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline().decode('utf-8'))
+                body = zlib.decompress(f.read())
+        except (OSError, ValueError, zlib.error):
+            return None
+
+        age = time.time() - header['fetched_at']
+        if age > self.ttl + self.stale_ttl:
+            self._remove(path)
+            return None
+        return body, age, header.get('fetch_url')
+
+    def is_fresh(self, age):
+        """判断缓存年龄是否仍在TTL内"""
+        return age <= self.ttl
+
+    def set(self, url, page, body, fetch_url=None):
+        """写入缓存（先写临时文件再原子替换，避免读到半截内容）"""
+        path = self._path(url, page)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        header = {
+            'url': normalize_url(url),
+            'page': page,
+            'fetch_url': fetch_url,
+            'fetched_at': time.time()
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json.dumps(header).encode('utf-8') + b'\n')
+                f.write(zlib.compress(body, self.compress_level))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入页面缓存失败 {url}: {str(e)}")
+            self._remove(tmp_path)
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self.prune()
+
+    def prune(self):
+        """删除超期条目（以及残留的临时文件），再把总大小限制在 max_bytes 以内，返回删除的文件数
+
+        条目的修改时间就是抓取时间（写入时原子替换），不需要读取文件头。
+        """
+        if not self._prune_lock.acquire(blocking=False):
+            return 0  # 本进程的其他线程正在清理
+        try:
+            self._last_prune = time.monotonic()
+            now = time.time()
+            entries = []
+            removed = 0
+            for root, _, names in os.walk(self.cache_dir):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    if now - stat.st_mtime > self.ttl + self.stale_ttl:
+                        removed += self._remove(path)
+                    elif name.endswith('.z'):
+                        entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                removed += self._remove(path)
+                total -= size
+            return removed
+        finally:
+            self._prune_lock.release()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+    def refresh_in_background(self, url, page, fetch):
+        """后台刷新过期缓存（stale-while-revalidate），同一页面同时只刷新一次"""
+        key = (normalize_url(url), page)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _refresh():
+            try:
+                body, fetch_url = fetch()
+                self.set(url, page, body, fetch_url)
+            except Exception as e:
+                print(f"后台刷新页面缓存失败 {url} 第 {page + 1} 页: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(_refresh)
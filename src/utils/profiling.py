@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+import random
+import cProfile
+import threading
+from collections import Counter
+from functools import wraps
+from flask import request, make_response
+
+# 性能分析配置
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # 生产环境按比例随机采样（0表示只在请求时开启）
+PROFILE_DEFAULT_MODE = os.environ.get('PROFILE_MODE', 'sample')  # sample: 采样调用栈；cprofile: 确定性分析
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))  # 采样间隔（秒）
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))  # 最多保留的分析文件数
+
+PROFILE_MODES = ('sample', 'cprofile')
+PROFILE_ON_FLAGS = ('1', 'true')  # 使用默认模式；其他值（如 0、false）都表示不分析
+PROFILE_EXTENSIONS = {'sample': '.collapsed', 'cprofile': '.pstats'}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+# 有采样分析进行时，每个新线程在启动前记下由哪个线程启动（Thread 对象上的 _profile_parent），
+# 采样器据此只采集被分析请求的线程和它启动的线程（如图片下载线程池），不混入同时处理的其他请求。
+# 父线程在启动前记录，新线程第一次被采样时一定已经有归属
+_tracking_lock = threading.Lock()
+_tracking_count = 0
+_original_thread_start = threading.Thread.start
+
+
+def _start_and_record_parent(thread):
+    thread._profile_parent = threading.get_ident()
+    _original_thread_start(thread)
+
+
+def _track_thread_parents(enable):
+    """第一个采样器开始时替换 Thread.start，最后一个结束时恢复（没有定向采样时不影响线程启动）"""
+    global _tracking_count
+    with _tracking_lock:
+        _tracking_count += 1 if enable else -1
+        if enable and _tracking_count == 1:
+            threading.Thread.start = _start_and_record_parent
+        elif not enable and _tracking_count == 0:
+            threading.Thread.start = _original_thread_start
+
+
+class StackSampler:
+    """采样分析器：后台线程定期读取调用栈，输出 collapsed stack 格式（可直接生成火焰图）
+
+    指定 thread_id 时只采集该线程和它（直接或间接）启动的线程，否则采集所有线程。
+    每条调用栈以线程名开头，不同线程的样本不会合并到一起。
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _is_sampled(self, ident, threads):
+        if self.thread_id is None:
+            return True
+        while ident is not None:
+            if ident == self.thread_id:
+                return True
+            ident = getattr(threads.get(ident), '_profile_parent', None)
+        return False
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or not self._is_sampled(ident, threads):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(threads[ident].name if ident in threads else str(ident))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        if self.thread_id is not None:
+            _track_thread_parents(True)
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        if self.thread_id is not None:
+            _track_thread_parents(False)
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _requested_mode():
+    """根据请求头/查询参数或采样率决定本次请求是否分析，返回分析模式或 None
+
+    X-Profile 头或 profile 参数为模式名（sample / cprofile）或 1 / true 时分析，
+    为其他值（如 0、false）时本次请求不分析，也不参与随机采样。
+    """
+    # 直接读取 environ / 原始查询串，避免每个请求都解析查询参数
+    flag = request.environ.get('HTTP_X_PROFILE')
+    if flag is None and b'profile' in request.query_string:
+        flag = request.args.get('profile')
+    if flag is not None:
+        flag = flag.strip().lower()
+        if flag in PROFILE_MODES:
+            return flag
+        return PROFILE_DEFAULT_MODE if flag in PROFILE_ON_FLAGS else None
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return PROFILE_DEFAULT_MODE
+    return None
+
+
+def _prune_profiles():
+    profiles = list_profiles()
+    for profile in profiles[PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, profile['name']))
+        except OSError:
+            pass
+
+
+def list_profiles():
+    """列出已保存的分析文件（最新的在前）"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        mode = next((mode for mode, ext in PROFILE_EXTENSIONS.items() if name.endswith(ext)), None)
+        if mode is None:
+            continue
+        stat = os.stat(os.path.join(PROFILE_DIR, name))
+        profiles.append({
+            'name': name,
+            'handler': name.split('__')[1] if '__' in name else '',
+            'mode': mode,
+            'size': stat.st_size,
+            'created': stat.st_mtime
+        })
+    profiles.sort(key=lambda profile: profile['created'], reverse=True)
+    return profiles
+
+
+def profiled(name):
+    """请求级性能分析装饰器：未开启时只做一次请求头/参数检查"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            mode = _requested_mode()
+            if mode is None:
+                return func(*args, **kwargs)
+
+            if mode == 'cprofile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                profiler = StackSampler(thread_id=threading.get_ident())
+                profiler.start()
+            start_time = time.perf_counter()
+            try:
+                rv = func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start_time
+                if mode == 'cprofile':
+                    profiler.disable()
+                else:
+                    profiler.stop()
+
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            profile_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed * 1000)}ms__{name}__{os.getpid()}-{threading.get_ident()}{PROFILE_EXTENSIONS[mode]}"
+            if mode == 'cprofile':
+                profiler.dump_stats(os.path.join(PROFILE_DIR, profile_name))
+            else:
+                profiler.dump(os.path.join(PROFILE_DIR, profile_name))
+            _prune_profiles()
+            print(f"请求分析已保存: {profile_name}")
+
+            response = make_response(rv)
+            response.headers['X-Profile-Id'] = profile_name
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,31 @@
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+
+
+class HostRateLimiter:
+    """按域名限速（GCRA令牌桶），多个线程共享同一个限速器"""
+
+    def __init__(self, rate=0.5, burst=1, jitter=0.0):
+        self.interval = 1.0 / rate  # 同一域名两次请求之间的平均间隔（秒）
+        self.tolerance = (max(burst, 1) - 1) * self.interval
+        self.jitter = jitter
+        self._tat = {}  # 每个域名的理论到达时间
+        self._lock = threading.Lock()
+
+    def acquire(self, url):
+        """等待直到允许向该URL所在域名发送请求，返回实际等待的秒数"""
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            tat = max(self._tat.get(host, now), now)
+            wait = max(0.0, tat - self.tolerance - now)
+            self._tat[host] = tat + self.interval
+
+        # 随机抖动，避免请求间隔过于规律被识别为机器人
+        if self.jitter:
+            wait += random.uniform(0, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
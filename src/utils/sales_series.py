@@ -0,0 +1,202 @@
+import os
+from src.utils.lazy_import import lazy_module
+
+np = lazy_module('numpy')
+
+# 维度 -> 行级列名：按分组（不含未分组商品）或按来源文件
+SERIES_DIMENSIONS = {'group': 'group_id', 'file': 'source_file'}
+SERIES_GRANULARITIES = ('day', 'week')
+SERIES_METRICS = ('total_sales', 'volume', 'products')
+# 每个 (维度, 粒度) 一张表，按 (桶, 键) 排序，时间窗口对应一段连续的行
+SERIES_FIELDS = {'bucket': '<i4', 'key': '<i4', 'total_sales': '<f8', 'volume': '<i8', 'products': '<i8'}
+
+
+def to_day(value):
+    """日期（datetime.date 或 ISO 字符串）转为自 1970-01-01 起的天数"""
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def from_day(day):
+    return str(np.datetime64(int(day), 'D'))
+
+
+def bucket_start(days, granularity):
+    """天数转为所在桶的起始日：按天时不变，按周时为当周周一（1970-01-01 是周四）"""
+    if granularity == 'week':
+        return days - (days + 3) % 7
+    return days
+
+
+def reduce_buckets(buckets, keys, total_sales, volume, products):
+    """按 (桶, 键) 合并求和，结果按 (桶, 键) 排序"""
+    combined = (np.asarray(buckets, dtype=np.int64) << 32) | np.asarray(keys, dtype=np.int64)
+    unique, inverse = np.unique(combined, return_inverse=True)
+    return {
+        'bucket': (unique >> 32).astype(SERIES_FIELDS['bucket']),
+        'key': (unique & 0xFFFFFFFF).astype(SERIES_FIELDS['key']),
+        'total_sales': np.bincount(inverse, weights=total_sales, minlength=len(unique)),
+        # 销量和商品数是整数，bincount 的 weights 会转成 float64，用 add.at 保持精确
+        'volume': _sum_int(inverse, volume, len(unique)),
+        'products': _sum_int(inverse, products, len(unique))
+    }
+
+
+def _sum_int(inverse, values, size):
+    sums = np.zeros(size, dtype=np.int64)
+    np.add.at(sums, inverse, values)
+    return sums
+
+
+def write_sales_series(analysis, rows, chunk_rows):
+    """分块读取行级列，生成按天/按周的分组和来源文件销售时间序列，返回日期统计
+
+    每块先在块内合并，再合并所有块的部分结果；内存与不同的 (桶, 键) 数成正比，不超过带日期的行数。
+    """
+    columns = {name: analysis.column(name, rows=rows)
+               for name in ('sold_date', 'total_sales', 'volume', *SERIES_DIMENSIONS.values())}
+    partials = {(dimension, granularity): [] for dimension in SERIES_DIMENSIONS for granularity in SERIES_GRANULARITIES}
+    dated_rows = 0
+    first_day = last_day = None
+
+    for start in range(0, rows, chunk_rows):
+        end = min(start + chunk_rows, rows)
+        sold_dates = np.asarray(columns['sold_date'][start:end])
+        dated = ~np.isnat(sold_dates)
+        if not dated.any():
+            continue
+        days = sold_dates.astype(np.int64)
+        dated_rows += int(dated.sum())
+        first_day = min(int(days[dated].min()), first_day if first_day is not None else np.iinfo(np.int64).max)
+        last_day = max(int(days[dated].max()), last_day if last_day is not None else np.iinfo(np.int64).min)
+
+        total_sales = np.asarray(columns['total_sales'][start:end])
+        volume = np.asarray(columns['volume'][start:end])
+        for dimension, key_column in SERIES_DIMENSIONS.items():
+            keys = np.asarray(columns[key_column][start:end])
+            valid = dated & (keys >= 0)
+            for granularity in SERIES_GRANULARITIES:
+                partials[(dimension, granularity)].append(reduce_buckets(
+                    bucket_start(days[valid], granularity), keys[valid], total_sales[valid], volume[valid],
+                    np.ones(int(valid.sum()), dtype=np.int64)
+                ))
+
+    for (dimension, granularity), parts in partials.items():
+        table_dir = os.path.join(analysis.file('series'), f"{dimension}-{granularity}")
+        os.makedirs(table_dir, exist_ok=True)
+        if parts:
+            table = reduce_buckets(*[np.concatenate([part[field] for part in parts])
+                                     for field in ('bucket', 'key', 'total_sales', 'volume', 'products')])
+        else:
+            table = {field: np.zeros(0, dtype=dtype) for field, dtype in SERIES_FIELDS.items()}
+        for field, dtype in SERIES_FIELDS.items():
+            np.save(os.path.join(table_dir, f"{field}.npy"), np.asarray(table[field], dtype=dtype))
+
+    return {
+        'rows_with_sold_date': dated_rows,
+        'sold_date_min': from_day(first_day) if first_day is not None else None,
+        'sold_date_max': from_day(last_day) if last_day is not None else None
+    }
+
+
+class SalesSeries:
+    """只读的销售时间序列：各表以 mmap 方式加载，时间窗口查询只读取窗口内的行"""
+
+    def __init__(self, analysis):
+        meta = analysis.read_meta()
+        self.path = analysis.file('series')
+        self.key_counts = {'group': meta.get('groups', 0), 'file': len(meta.get('source_files', []))}
+        self._tables = {}
+
+    def table(self, dimension, granularity):
+        key = (dimension, granularity)
+        if key not in self._tables:
+            table_dir = os.path.join(self.path, f"{dimension}-{granularity}")
+            self._tables[key] = {field: np.load(os.path.join(table_dir, f"{field}.npy"), mmap_mode='r')
+                                 for field in SERIES_FIELDS}
+        return self._tables[key]
+
+    @staticmethod
+    def align(granularity, start_day, end_day):
+        """把起止日期扩展到完整的桶（按周时为周一到周日），前后两个等长窗口才不会共用一个桶"""
+        start_day = bucket_start(start_day, granularity)
+        end_day = bucket_start(end_day, granularity) + (6 if granularity == 'week' else 0)
+        return start_day, end_day
+
+    def window(self, dimension, granularity, start_day, end_day):
+        """起止日期（含）所在的桶对应的行区间"""
+        buckets = self.table(dimension, granularity)['bucket']
+        # 查找值要与列同为 int32，否则 searchsorted 会先把整列转换成 int64
+        low = np.searchsorted(buckets, buckets.dtype.type(bucket_start(start_day, granularity)), side='left')
+        high = np.searchsorted(buckets, buckets.dtype.type(bucket_start(end_day, granularity)), side='right')
+        return int(low), int(high)
+
+    def totals(self, dimension, granularity, start_day, end_day, metric):
+        """时间窗口内每个键的某项指标合计（长度为键数的数组）"""
+        table = self.table(dimension, granularity)
+        low, high = self.window(dimension, granularity, start_day, end_day)
+        size = self.key_counts[dimension]
+        return np.bincount(table['key'][low:high], weights=table[metric][low:high], minlength=size)[:size]
+
+    def key_rows(self, dimension, granularity, start_day, end_day, keys):
+        """时间窗口内属于 keys 的行号，以及每行对应 keys 中的下标"""
+        table = self.table(dimension, granularity)
+        low, high = self.window(dimension, granularity, start_day, end_day)
+        window_keys = np.asarray(table['key'][low:high])
+        rows = np.flatnonzero(np.isin(window_keys, keys))
+        sorter = np.argsort(keys)
+        positions = sorter[np.searchsorted(keys, window_keys[rows], sorter=sorter)]
+        return rows + low, positions
+
+    def top(self, dimension, granularity, start_day, end_day, metric='total_sales', limit=10, with_series=True):
+        """时间窗口内按指标排名前 limit 的键，附带上一个等长窗口的合计和窗口内的逐桶序列
+
+        起止日期应先经过 align 对齐到完整的桶。只有排名用的指标对所有键求和，
+        其余指标和上一个窗口只对选出的键计算。
+        """
+        values = self.totals(dimension, granularity, start_day, end_day, metric)
+        limit = min(limit, int(np.count_nonzero(values)))
+        if limit <= 0:
+            return []
+        top_keys = np.argpartition(-values, limit - 1)[:limit]
+        top_keys = top_keys[np.argsort(-values[top_keys], kind='stable')]
+
+        table = self.table(dimension, granularity)
+        length = end_day - start_day + 1
+        windows = {}
+        for label, window_start in (('current', start_day), ('previous', start_day - length)):
+            rows, positions = self.key_rows(dimension, granularity, window_start, window_start + length - 1, top_keys)
+            windows[label] = (rows, positions, {
+                metric_name: np.bincount(positions, weights=table[metric_name][rows], minlength=limit)
+                for metric_name in SERIES_METRICS
+            })
+
+        series = {}
+        if with_series:
+            rows, positions, _ = windows['current']
+            columns = {field: table[field][rows].tolist() for field in ('bucket', *SERIES_METRICS)}
+            for i, position in enumerate(positions.tolist()):
+                series.setdefault(position, []).append({
+                    'date': from_day(columns['bucket'][i]),
+                    **{metric_name: columns[metric_name][i] for metric_name in SERIES_METRICS}
+                })
+
+        results = []
+        for position, key in enumerate(top_keys.tolist()):
+            current, previous = windows['current'][2], windows['previous'][2]
+            result = {
+                'key': key,
+                **{metric_name: _metric_value(metric_name, current[metric_name][position]) for metric_name in SERIES_METRICS},
+                'previous': {metric_name: _metric_value(metric_name, previous[metric_name][position])
+                             for metric_name in SERIES_METRICS}
+            }
+            previous_value = result['previous'][metric]
+            result['change_ratio'] = (result[metric] - previous_value) / previous_value if previous_value else None
+            if with_series:
+                result['series'] = series.get(position, [])
+            results.append(result)
+        return results
+
+
+def _metric_value(metric, value):
+    """bincount 的合计是 float64，销量和商品数转回 int"""
+    return float(value) if metric == 'total_sales' else int(value)
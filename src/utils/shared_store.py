@@ -0,0 +1,176 @@
+import os
+import json
+import mmap
+import time
+import zlib
+import fcntl
+import struct
+import hashlib
+import tempfile
+import threading
+
+_HEADER = struct.Struct('<8sQ')
+_SLOT = struct.Struct('<QQQ')  # 键、值、校验
+_MAGIC = b'FPSTORE1'
+_CHECK_SALT = 0x9E3779B97F4A7C15
+_MAX_PROBES = 32
+
+
+def _key_hash(key):
+    value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1  # 0 表示空槽
+
+
+class SharedFingerprintStore:
+    """基于 mmap 文件的跨进程指纹存储（URL -> 64 位感知哈希）
+
+    所有工作进程映射同一个文件，一个进程算出的指纹其他进程立即可见。
+    开放寻址哈希表，读操作无锁（通过校验字段丢弃写了一半的槽），
+    写操作用 flock 串行化。表满时新指纹不再写入，不影响正确性。
+    """
+
+    def __init__(self, path, capacity=1 << 20):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._lock = threading.Lock()
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size < _HEADER.size:
+                os.ftruncate(self._fd, _HEADER.size + capacity * _SLOT.size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, capacity), 0)
+            magic, stored_capacity = _HEADER.unpack(os.pread(self._fd, _HEADER.size, 0))
+            if magic != _MAGIC:
+                raise ValueError(f"不是有效的指纹存储文件: {path}")
+            self.capacity = stored_capacity
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        self._mmap = mmap.mmap(self._fd, _HEADER.size + self.capacity * _SLOT.size)
+
+    def _offset(self, slot):
+        return _HEADER.size + slot * _SLOT.size
+
+    def get(self, key):
+        """读取指纹，不存在时返回 None"""
+        key_hash = _key_hash(key)
+        slot = key_hash % self.capacity
+        for _ in range(_MAX_PROBES):
+            stored_key, value, check = _SLOT.unpack_from(self._mmap, self._offset(slot))
+            if stored_key == 0:
+                return None
+            if stored_key == key_hash and check == stored_key ^ value ^ _CHECK_SALT:
+                return value
+            slot = (slot + 1) % self.capacity
+        return None
+
+    def set(self, key, value):
+        """写入指纹，返回是否写入成功"""
+        key_hash = _key_hash(key)
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                slot = key_hash % self.capacity
+                for _ in range(_MAX_PROBES):
+                    stored_key = struct.unpack_from('<Q', self._mmap, self._offset(slot))[0]
+                    if stored_key in (0, key_hash):
+                        _SLOT.pack_into(self._mmap, self._offset(slot), key_hash, value, key_hash ^ value ^ _CHECK_SALT)
+                        return True
+                    slot = (slot + 1) % self.capacity
+                return False
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class ResultStore:
+    """基于磁盘的跨进程结果缓存（压缩 JSON），键为请求内容的哈希
+
+    写入时每隔 prune_interval 秒清理一次：删除过期条目，总大小超过 max_bytes 时再从最旧的开始删除。
+    多个进程可能同时清理，删除已不存在的文件直接忽略。
+    """
+
+    def __init__(self, store_dir, ttl=3600, max_bytes=256 * 1024 * 1024, prune_interval=60):
+        self.store_dir = store_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.store_dir, key + '.json.z')
+
+    def get(self, key):
+        """返回缓存的 JSON 字节串，不存在或已过期时返回 None"""
+        path = self._path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl:
+                return None
+            with open(path, 'rb') as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error):
+            return None
+
+    def set(self, key, body):
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(zlib.compress(body, 6))
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"写入结果缓存失败: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        if time.monotonic() - self._last_prune >= self.prune_interval:
+            self.prune()
+
+    def prune(self):
+        """删除过期条目（以及残留的临时文件），再把总大小限制在 max_bytes 以内，返回删除的文件数"""
+        if not self._prune_lock.acquire(blocking=False):
+            return 0  # 本进程的其他线程正在清理
+        try:
+            self._last_prune = time.monotonic()
+            now = time.time()
+            entries = []
+            removed = 0
+            with os.scandir(self.store_dir) as it:
+                for entry in it:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if now - stat.st_mtime > self.ttl:
+                        removed += self._remove(entry.path)
+                    elif entry.name.endswith('.json.z'):
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                removed += self._remove(path)
+                total -= size
+            return removed
+        finally:
+            self._prune_lock.release()
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+    @staticmethod
+    def make_key(*parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else json.dumps(part, sort_keys=True).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
@@ -0,0 +1,300 @@
+import os
+import json
+import mmap
+import time
+import fcntl
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.lazy_import import lazy_module
+from src.utils.simhash import simhash_many
+
+np = lazy_module('numpy')
+
+# 写入索引的商品字段
+RECORD_FIELDS = ('title', 'price_numeric', 'volume_numeric', 'total_sales', 'image_url', 'product_url',
+                 'last_sold_time', 'sold_date', 'source_file')
+# 粗排分数的权重与 /upload 的综合相似度一致；标题用 SimHash 汉明距离近似词集合 Jaccard
+COARSE_WEIGHTS = {'image': 0.4, 'title': 0.4, 'price': 0.2}
+# 不相关标题之间的 SimHash 汉明距离约为 32
+TITLE_HAMMING_SCALE = 32
+CURRENT_FILE = 'CURRENT'
+
+
+def product_key(product):
+    """商品去重键：优先用商品链接，没有时用标题+图片"""
+    return product.get('product_url') or f"{product.get('title', '')}|{product.get('image_url', '')}"
+
+
+def key_hash(key):
+    """去重键的 64 位哈希，作为商品在索引中的稳定编号（重建和并入新商品后不变）"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def format_product_id(value):
+    """对外的商品编号：16 位十六进制字符串（JSON 数字表示不了完整的 64 位整数）"""
+    return format(int(value), '016x')
+
+
+def parse_product_id(product_id):
+    """解析对外的商品编号，格式不对时抛出 ValueError"""
+    if not isinstance(product_id, str) or len(product_id) != 16:
+        raise ValueError(f"商品编号格式不正确: {product_id}")
+    return int(product_id, 16)
+
+
+def write_index(index_dir, records, phashes, has_phash, title_hashes, key_hashes, base=None, keep=None):
+    """把新商品与 base（现有索引）中 keep 为 True 的商品按价格归并，写出一个新版本并原子地切换 CURRENT
+
+    目录内容：prices.npy / phash.npy / has_phash.npy / title_simhash.npy / key_hash.npy（按价格升序的列），
+    key_order.npy + sorted_keys.npy（按 key_hash 排序的下标和键，按编号查找用），
+    records.ndjson + offsets.npy（第 i 行商品记录的字节范围），meta.json。
+    现有商品的列直接归并、记录按字节区间整段复制，只有新商品需要序列化，耗时与索引大小近似线性。
+    """
+    new_prices = np.array([record['price_numeric'] for record in records], dtype=np.float64)
+    new_order = np.argsort(new_prices, kind='stable')
+    new_columns = {
+        'prices': new_prices[new_order],
+        'phash': np.asarray(phashes, dtype=np.uint64)[new_order],
+        'has_phash': np.asarray(has_phash, dtype=bool)[new_order],
+        'title_simhash': np.asarray(title_hashes, dtype=np.uint64)[new_order],
+        'key_hash': np.asarray(key_hashes, dtype=np.uint64)[new_order]
+    }
+    if base is not None:
+        kept_rows = np.flatnonzero(keep)
+        base_columns = {name: np.asarray(getattr(base, name))[kept_rows] for name in new_columns}
+    else:
+        kept_rows = np.zeros(0, dtype=np.int64)
+        base_columns = {name: np.zeros(0, dtype=column.dtype) for name, column in new_columns.items()}
+
+    # 两个有序序列归并：新商品排在同价格的现有商品之后
+    total = len(kept_rows) + len(records)
+    is_new = np.zeros(total, dtype=bool)
+    is_new[np.searchsorted(base_columns['prices'], new_columns['prices'], side='right') + np.arange(len(records))] = True
+    columns = {}
+    for name, column in new_columns.items():
+        merged = np.empty(total, dtype=column.dtype)
+        merged[is_new] = column
+        merged[~is_new] = base_columns[name]
+        columns[name] = merged
+
+    # 增量并入很快，同一秒内可能写出多个版本，版本号带上纳秒
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10 ** 9:09d}-{os.getpid()}-{threading.get_ident() % 10000}"
+    tmp_dir = os.path.join(index_dir, version + '.tmp')
+    os.makedirs(tmp_dir)
+    for name, column in columns.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), column)
+    key_order = np.argsort(columns['key_hash'], kind='stable')
+    np.save(os.path.join(tmp_dir, 'key_order.npy'), key_order)
+    np.save(os.path.join(tmp_dir, 'sorted_keys.npy'), columns['key_hash'][key_order])
+
+    # 合并后每行来自哪里：现有索引的行号，新商品为 -1；现有索引中连续的行整段复制
+    source_rows = np.full(total, -1, dtype=np.int64)
+    source_rows[~is_new] = kept_rows
+    lines = [json.dumps(records[row], ensure_ascii=False).encode('utf-8') + b'\n' for row in new_order.tolist()]
+    lengths = np.zeros(total, dtype=np.uint64)
+    lengths[is_new] = [len(line) for line in lines]
+    if base is not None:
+        lengths[~is_new] = base.offsets[kept_rows + 1] - base.offsets[kept_rows]
+    offsets = np.zeros(total + 1, dtype=np.uint64)
+    np.cumsum(lengths, out=offsets[1:])
+    np.save(os.path.join(tmp_dir, 'offsets.npy'), offsets)
+
+    breaks = np.flatnonzero(is_new[1:] | is_new[:-1] | (source_rows[1:] != source_rows[:-1] + 1)) + 1
+    with open(os.path.join(tmp_dir, 'records.ndjson'), 'wb') as f:
+        new_lines = iter(lines)
+        for run_start, run_end in zip([0, *breaks.tolist()], [*breaks.tolist(), total]):
+            if is_new[run_start]:
+                f.write(next(new_lines))
+            else:
+                f.write(base.records_bytes(int(source_rows[run_start]), int(source_rows[run_end - 1]) + 1))
+
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'version': version, 'products': total, 'built_at': time.time()}, f)
+
+    os.rename(tmp_dir, os.path.join(index_dir, version))
+    current_tmp = os.path.join(index_dir, CURRENT_FILE + '.tmp')
+    with open(current_tmp, 'w') as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(index_dir, CURRENT_FILE))
+
+    # 旧版本可能仍被其他进程映射着，Linux 上删除文件不影响已有映射
+    for name in os.listdir(index_dir):
+        path = os.path.join(index_dir, name)
+        if name != version and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+    return version
+
+
+class SimilarityIndex:
+    """只读的相似度索引：各列以 mmap 方式加载，不需要重建也不占用进程私有内存"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.prices = np.load(os.path.join(path, 'prices.npy'), mmap_mode='r')
+        self.phash = np.load(os.path.join(path, 'phash.npy'), mmap_mode='r')
+        self.has_phash = np.load(os.path.join(path, 'has_phash.npy'), mmap_mode='r')
+        self.title_simhash = np.load(os.path.join(path, 'title_simhash.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'), mmap_mode='r')
+        self._records_file = open(os.path.join(path, 'records.ndjson'), 'rb')
+        self._records = mmap.mmap(self._records_file.fileno(), 0, access=mmap.ACCESS_READ) if len(self) else b''
+        if os.path.exists(os.path.join(path, 'key_hash.npy')):
+            self.key_hash = np.load(os.path.join(path, 'key_hash.npy'), mmap_mode='r')
+            self.key_order = np.load(os.path.join(path, 'key_order.npy'), mmap_mode='r')
+            self.sorted_keys = np.load(os.path.join(path, 'sorted_keys.npy'), mmap_mode='r')
+        else:
+            # 没有编号列的旧版本索引：加载时计算一次，下次并入商品后写入磁盘
+            self.key_hash = np.array([key_hash(product_key(self.record(i))) for i in range(len(self))], dtype=np.uint64)
+            self.key_order = np.argsort(self.key_hash, kind='stable')
+            self.sorted_keys = self.key_hash[self.key_order]
+
+    def __len__(self):
+        return len(self.prices)
+
+    def record(self, position):
+        """读取第 position 个（按价格排序）商品的记录"""
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return json.loads(self._records[start:end])
+
+    def records_bytes(self, start, end):
+        """第 start 到 end - 1 个商品记录的原始字节（records.ndjson 中连续的一段）"""
+        return self._records[int(self.offsets[start]):int(self.offsets[end])]
+
+    def product_id(self, position):
+        """第 position 个商品的稳定编号"""
+        return format_product_id(self.key_hash[position])
+
+    def find(self, value):
+        """按 key_hash 查找商品所在位置，不存在时返回 None"""
+        i = int(np.searchsorted(self.sorted_keys, np.uint64(value)))
+        if i < len(self) and int(self.sorted_keys[i]) == value:
+            return int(self.key_order[i])
+        return None
+
+    def price_window(self, price, max_price_diff):
+        """价格差异不超过 max_price_diff 的商品所在的下标区间（价格已排序，二分查找）"""
+        if price <= 0 or max_price_diff >= 1:
+            return 0, len(self)
+        low = np.searchsorted(self.prices, price * (1 - max_price_diff), side='left')
+        high = np.searchsorted(self.prices, price / (1 - max_price_diff), side='right')
+        return int(low), int(high)
+
+    def candidates(self, price, phash=None, title_hash=None, limit=200, max_price_diff=0.5, exclude=None):
+        """向量化粗排：在价格窗口内按近似综合分数取前 limit 个候选，返回 [(商品编号, 粗排分数)]"""
+        low, high = self.price_window(price, max_price_diff)
+        if high <= low:
+            return []
+
+        # float32 + 原地运算：百万级商品时每次查询要扫几十万行，临时数组越少越快
+        scores = np.zeros(high - low, dtype=np.float32)
+        if price > 0:
+            prices = self.prices[low:high].astype(np.float32)
+            price_similarity = np.abs(prices - np.float32(price))
+            price_similarity /= np.maximum(prices, np.float32(price))
+            np.subtract(1, price_similarity, out=price_similarity)
+            np.clip(price_similarity, 0, 1, out=price_similarity)
+            price_similarity *= np.float32(COARSE_WEIGHTS['price'])
+            scores += price_similarity
+
+        if phash is not None:
+            distance = np.bitwise_count(np.asarray(self.phash[low:high]) ^ np.uint64(phash))
+            image_similarity = np.subtract(64, distance, dtype=np.float32)
+            image_similarity *= np.float32(COARSE_WEIGHTS['image'] / 64)
+            image_similarity *= self.has_phash[low:high]
+            scores += image_similarity
+
+        if title_hash is not None:
+            distance = np.bitwise_count(np.asarray(self.title_simhash[low:high]) ^ np.uint64(title_hash))
+            title_similarity = np.subtract(TITLE_HAMMING_SCALE, np.minimum(distance, TITLE_HAMMING_SCALE), dtype=np.float32)
+            title_similarity *= np.float32(COARSE_WEIGHTS['title'] / TITLE_HAMMING_SCALE)
+            scores += title_similarity
+
+        if exclude is not None and low <= exclude < high:
+            scores[exclude - low] = -1
+
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(low + int(i), float(scores[i])) for i in top if scores[i] >= 0]
+
+    def close(self):
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+        self._records_file.close()
+
+
+class SimilarityIndexStore:
+    """管理磁盘上的相似度索引：第一次查询时映射当前版本，其他进程重建后自动切换，重建在后台线程进行"""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self._index = None
+        self._version = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='similarity-index')
+        os.makedirs(index_dir, exist_ok=True)
+
+    def _current_version(self):
+        try:
+            with open(os.path.join(self.index_dir, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def current(self):
+        """返回当前版本的索引，没有索引时返回 None"""
+        version = self._current_version()
+        if version is None:
+            return None
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    try:
+                        index = SimilarityIndex(os.path.join(self.index_dir, version))
+                    except (OSError, ValueError) as e:
+                        print(f"加载相似度索引失败: {str(e)}")
+                        return self._index
+                    self._index, self._version = index, version
+        return self._index
+
+    def add_products(self, products, phashes):
+        """把商品并入索引（同一商品以新数据为准）并写出新版本，返回新版本号
+
+        phashes 与 products 一一对应，为 64 位整数或 None（图片不可用）。
+        现有商品只按 key_hash 判断是否被替换，只解析被替换的记录（核对去重键，排除哈希碰撞）。
+        """
+        # 同一批中重复的商品只保留最后一条
+        latest = {product_key(product): i for i, product in enumerate(products)}
+        batch = list(latest.values())
+        records = [{field: products[i].get(field) for field in RECORD_FIELDS} for i in batch]
+        phash_values = [phashes[i] or 0 for i in batch]
+        has_phash = [phashes[i] is not None for i in batch]
+        title_hashes = simhash_many([record['title'] or '' for record in records])
+        key_hashes = np.array([key_hash(key) for key in latest], dtype=np.uint64)
+
+        # 文件锁保证多个工作进程同时重建时不会丢失对方加入的商品
+        with open(os.path.join(self.index_dir, '.lock'), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            existing = self.current()
+            keep = None
+            if existing is not None:
+                keep = ~np.isin(np.asarray(existing.key_hash), key_hashes)
+                for position in np.flatnonzero(~keep).tolist():
+                    if product_key(existing.record(position)) not in latest:
+                        keep[position] = True
+            return write_index(self.index_dir, records, phash_values, has_phash, title_hashes, key_hashes,
+                               base=existing, keep=keep)
+
+    def add_products_async(self, products, phashes):
+        """在后台线程中重建索引，不阻塞请求"""
+        def task():
+            try:
+                start = time.perf_counter()
+                version = self.add_products(products, phashes)
+                print(f"相似度索引已更新: {version}，耗时 {time.perf_counter() - start:.2f}秒")
+            except Exception as e:
+                print(f"更新相似度索引失败: {str(e)}")
+        return self._executor.submit(task)
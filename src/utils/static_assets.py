@@ -0,0 +1,141 @@
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+import threading
+from email.utils import formatdate
+from flask import request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 文件名中带内容哈希的资源（如 app.3f2a9c1b.js）可以永久缓存
+FINGERPRINT_RE = re.compile(r'\.[0-9a-f]{8,}\.[A-Za-z0-9]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+# 压缩后至少要小 10% 才保留压缩版本
+MIN_COMPRESSION_RATIO = 0.9
+
+
+class StaticAsset:
+    """内存中的静态文件：原始内容、预压缩版本和对应的 ETag"""
+
+    def __init__(self, path, rel_path):
+        self.path = path
+        self.rel_path = rel_path
+        stat = os.stat(path)
+        self.mtime = stat.st_mtime
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.mimetype = mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if FINGERPRINT_RE.search(rel_path) else REVALIDATE_CACHE_CONTROL
+
+        # 编码 -> 内容，None 表示不压缩
+        self.variants = {None: body}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body) * MIN_COMPRESSION_RATIO:
+            self.variants['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body) * MIN_COMPRESSION_RATIO:
+                self.variants['br'] = compressed
+
+    def etag(self, encoding):
+        return self.digest if encoding is None else f"{self.digest}-{encoding}"
+
+    @property
+    def etags(self):
+        return [self.etag(encoding) for encoding in self.variants]
+
+    def choose_encoding(self, accept_encodings):
+        """按客户端 Accept-Encoding 选择最小的可用版本"""
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and accept_encodings[encoding]:
+                return encoding
+        return None
+
+
+class StaticAssets:
+    """静态资源的内存缓存：启动时读取并预压缩，请求时不再访问文件系统
+
+    get(..., watch=True)（开发模式）时每次请求检查文件修改时间，文件变化后重新加载，
+    新增的文件也能被找到。
+    """
+
+    def __init__(self, static_dir):
+        self.static_dir = static_dir
+        self._assets = {}
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """重新扫描目录并加载全部文件"""
+        assets = {}
+        if self.static_dir and os.path.isdir(self.static_dir):
+            for root, _, files in os.walk(self.static_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    rel_path = os.path.relpath(path, self.static_dir).replace(os.sep, '/')
+                    try:
+                        assets[rel_path] = StaticAsset(path, rel_path)
+                    except OSError as e:
+                        print(f"加载静态文件失败 {rel_path}: {str(e)}")
+        with self._lock:
+            self._assets = assets
+
+    def get(self, rel_path, watch=False):
+        """返回 StaticAsset，不存在时返回 None"""
+        asset = self._assets.get(rel_path)
+        if not watch:
+            return asset
+
+        if asset is None:
+            path = os.path.join(self.static_dir, *rel_path.split('/'))
+            if os.path.realpath(path).startswith(os.path.realpath(self.static_dir) + os.sep) and os.path.isfile(path):
+                self.reload()
+                return self._assets.get(rel_path)
+            return None
+        try:
+            if os.stat(asset.path).st_mtime != asset.mtime:
+                asset = StaticAsset(asset.path, rel_path)
+                with self._lock:
+                    self._assets[rel_path] = asset
+        except OSError:
+            with self._lock:
+                self._assets.pop(rel_path, None)
+            return None
+        return asset
+
+    def __len__(self):
+        return len(self._assets)
+
+
+def send_asset(asset):
+    """按当前请求协商编码并返回响应
+
+    If-None-Match（任一编码版本的 ETag）或 If-Modified-Since 命中时返回 304；
+    带 Range 时返回未压缩内容的对应区间（206），区间无效时返回 416。
+    """
+    # 区间针对未压缩的内容，客户端分段下载时不会拿到不同编码版本的片段
+    encoding = asset.choose_encoding(request.accept_encodings) if request.range is None else None
+    headers = {
+        'ETag': f'"{asset.etag(encoding)}"',
+        'Cache-Control': asset.cache_control,
+        'Last-Modified': asset.last_modified,
+        'Vary': 'Accept-Encoding'
+    }
+    # 客户端持有任一编码版本的 ETag 都说明内容未变
+    if any(request.if_none_match.contains_weak(etag) for etag in asset.etags):
+        return Response(status=304, headers=headers)
+
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    body = asset.variants[encoding]
+    response = Response(body, mimetype=asset.mimetype, headers=headers)
+    # If-Modified-Since（没有 If-None-Match 时）、Range 和 If-Range 由 werkzeug 处理
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(body))
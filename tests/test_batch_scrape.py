@@ -0,0 +1,34 @@
+"""批量抓取接口的参数校验：错误的请求在开始抓取前返回 400"""
+import pytest
+
+from src.main import create_app
+from src.routes import title_scraper
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def scrape_and_count(url, max_pages=4, use_cache=True, top_n=50):
+        raise AssertionError('参数错误的请求不应开始抓取')
+
+    monkeypatch.setattr(title_scraper, 'scrape_and_count', scrape_and_count)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+    with app.test_client() as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {'urls': 'https://www.ebay.de/sch/i.html?_nkw=a'},
+    {'urls': []},
+    {'urls': [1, 2]},
+    {'urls': ['  ', None]},
+    {'urls': ['https://example.com/a']},
+    {'urls': ['https://www.ebay.de/sch/i.html?_nkw=a'], 'workers': 0},
+    {'urls': ['https://www.ebay.de/sch/i.html?_nkw=a'], 'top_n': 'many'},
+    {'urls': ['https://www.ebay.de/sch/i.html?_nkw=a'], 'max_pages': True}
+])
+@pytest.mark.parametrize('stream', [True, False])
+def test_batch_rejects_invalid_request(client, body, stream):
+    response = client.post('/api/scraper/batch', json={**body, 'stream': stream} if body else None)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,60 @@
+"""页面缓存和翻译缓存的淘汰：超期条目会被删除，总量不超过上限"""
+import os
+import time
+
+from src.routes import title_scraper
+from src.utils.page_cache import PageCache
+
+URL = 'https://www.ebay.de/sch/i.html?_nkw=test'
+
+
+def cache_files(cache):
+    return sorted(os.path.join(root, name) for root, _, names in os.walk(cache.cache_dir) for name in names)
+
+
+def age_entry(cache, page, seconds):
+    """把条目改成 seconds 秒前抓取的（修改时间和文件头中的抓取时间）"""
+    path = cache._path(URL, page)
+    with open(path, 'rb') as f:
+        header, body = f.readline(), f.read()
+    fetched_at = time.time() - seconds
+    with open(path, 'wb') as f:
+        f.write(header.replace(header.split(b'"fetched_at": ')[1].split(b'}')[0], repr(fetched_at).encode()) + body)
+    os.utime(path, (fetched_at, fetched_at))
+
+
+def test_get_removes_expired_entry(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=10, stale_ttl=10)
+    cache.set(URL, 0, b'<html>0</html>', URL)
+    body, age, fetch_url = cache.get(URL, 0)
+    assert body == b'<html>0</html>' and fetch_url == URL
+
+    age_entry(cache, 0, 15)
+    assert cache.get(URL, 0)[1] > 10  # 过期但仍在 stale_ttl 内
+    age_entry(cache, 0, 25)
+    assert cache.get(URL, 0) is None
+    assert cache_files(cache) == []
+
+
+def test_prune_removes_expired_and_oldest(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=10, stale_ttl=10, prune_interval=3600)
+    for page in range(4):
+        cache.set(URL, page, os.urandom(1000), URL)
+    age_entry(cache, 0, 30)
+    for page, seconds in ((1, 3), (2, 2), (3, 1)):
+        age_entry(cache, page, seconds)
+    cache.max_bytes = sum(os.path.getsize(cache._path(URL, page)) for page in (2, 3))
+
+    assert cache.prune() == 2
+    assert cache_files(cache) == sorted([cache._path(URL, 2), cache._path(URL, 3)])
+
+
+def test_translation_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(title_scraper, 'TRANSLATION_CACHE_SIZE', 3)
+    monkeypatch.setattr(title_scraper, 'translation_cache', type(title_scraper.translation_cache)())
+    for word in ('a', 'b', 'c'):
+        title_scraper.cache_translation(word, 'en', word.upper())
+    assert title_scraper.get_cached_translation('a', 'en') == 'A'  # a 变为最近使用
+    title_scraper.cache_translation('d', 'en', 'D')
+    assert list(title_scraper.translation_cache) == [('c', 'en'), ('a', 'en'), ('d', 'en')]
+    assert title_scraper.get_cached_translation('b', 'en') is None
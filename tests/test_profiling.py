@@ -0,0 +1,71 @@
+"""请求级性能分析：开关的取值和采样器的线程归属"""
+import time
+import threading
+
+import pytest
+from flask import Flask
+
+from src.utils import profiling
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling, 'PROFILE_SAMPLE_RATE', 0)
+    app = Flask(__name__)
+
+    @app.route('/work')
+    @profiling.profiled('work')
+    def work():
+        return 'ok'
+
+    with app.test_client() as test_client:
+        yield test_client
+
+
+@pytest.mark.parametrize('query, headers, mode', [
+    ('', {}, None),
+    ('?profile=0', {}, None),
+    ('?profile=false', {}, None),
+    ('?profile=off', {}, None),
+    ('', {'X-Profile': 'false'}, None),
+    ('', {'X-Profile': '0'}, None),
+    ('?profile=1', {}, profiling.PROFILE_DEFAULT_MODE),
+    ('?profile=true', {}, profiling.PROFILE_DEFAULT_MODE),
+    ('', {'X-Profile': 'cprofile'}, 'cprofile'),
+    ('?profile=sample', {}, 'sample')
+])
+def test_profile_flag(client, query, headers, mode):
+    response = client.get(f'/work{query}', headers=headers)
+    assert response.status_code == 200
+    profile_id = response.headers.get('X-Profile-Id')
+    if mode is None:
+        assert profile_id is None
+    else:
+        assert profile_id.endswith(profiling.PROFILE_EXTENSIONS[mode])
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_only_follows_request_threads():
+    stop = threading.Event()
+    other = threading.Thread(target=spin, args=(stop,), name='other-request')
+    other.start()
+    sampler = profiling.StackSampler(interval=0.001, thread_id=threading.get_ident())
+    sampler.start()
+    try:
+        child = threading.Thread(target=spin, args=(stop,), name='request-child')
+        child.start()
+        time.sleep(0.2)
+    finally:
+        stop.set()
+        child.join()
+        other.join()
+        sampler.stop()
+    threads = {stack.split(';', 1)[0] for stack in sampler.stacks}
+    assert 'request-child' in threads
+    assert 'other-request' not in threads
+    assert threading.Thread.start is profiling._original_thread_start
@@ -0,0 +1,136 @@
+"""近似重复标题去重：用 benchmarks/generators 生成的合成结果页检查去重率和误合并"""
+import pytest
+
+from benchmarks.generators import generate_result_page, generate_result_titles
+from src.main import create_app
+from src.routes import title_scraper
+from src.utils.simhash import SimHashIndex, dedup_titles, hamming_distance, simhash
+
+PAGE_SIZE = 50
+PAGES = 4
+BASE_URL = 'https://www.ebay.de/sch/i.html?_nkw=bench'
+
+BASE_TITLES = [
+    'Bosch Winkelschleifer 125A 18V Solo mit Koffer',
+    'Makita Akku Bohrschrauber 40D 2x Akku Ladegerät',
+    'Festool Handkreissäge 86E 230V mit Koffer LED',
+    'Samsung Galaxy S21 128GB Phantom Grey Smartphone',
+    'Apple iPhone 12 64GB Schwarz Händler Garantie',
+    'Philips Hue White Ambiance E27 Starter Set 3 Lampen',
+    'Lego Technic 42115 Lamborghini Sian FKP 37 Neu OVP',
+    'Dyson V11 Absolute Akku Staubsauger Kabellos'
+]
+
+
+def variants(title):
+    """卖家常见的小改动：加前缀、加后缀、换词序"""
+    words = title.split()
+    return [f"NEU {title}", f"{title} TOP", ' '.join(words[1:2] + words[:1] + words[2:])]
+
+
+def test_variants_are_within_default_distance():
+    for title in BASE_TITLES:
+        for variant in variants(title):
+            assert hamming_distance(simhash(title), simhash(variant)) <= 10
+
+
+def fixture_pages(titles):
+    """把标题切成若干结果页，返回 {URL: HTML}，每页链接到下一页"""
+    urls = [BASE_URL] + [f"{BASE_URL}&_pgn={page}" for page in range(2, PAGES + 1)]
+    return {
+        url: generate_result_page(titles[i * PAGE_SIZE:(i + 1) * PAGE_SIZE], urls[i + 1] if i + 1 < len(urls) else None).encode('utf-8')
+        for i, url in enumerate(urls)
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """抓取接口从内存中的结果页取数据：不访问网络、不限速、不翻译、不写页面缓存"""
+    pages = {}
+    monkeypatch.setattr(title_scraper, 'fetch_page', lambda session, url, headers: pages[url])
+    monkeypatch.setattr(title_scraper.host_rate_limiter, 'acquire', lambda url: 0.0)
+    monkeypatch.setattr(title_scraper, 'translate_words_batch', lambda words, target_lang='en': {})
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+    with app.test_client() as test_client:
+        test_client.pages = pages
+        yield test_client
+
+
+def scrape(client, **options):
+    response = client.post('/api/scraper/scrape', json={'url': BASE_URL, 'use_cache': False, **options})
+    return response.status_code, response.get_json()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_scrape_near_dedup_rate(client, seed):
+    titles, injected = generate_result_titles(PAGE_SIZE * PAGES, near_duplicate_rate=0.3, seed=seed)
+    client.pages.update(fixture_pages(titles))
+
+    status, body = scrape(client, near_dedup=True)
+    assert status == 200
+    assert body['total_titles'] == len(titles)
+    dedup = body['word_analysis']['near_dedup']
+    assert dedup['titles_before'] == len(titles)
+    # 字符 3-gram、距离 10 时合成结果页上平均能找出约八成（69-87%）
+    assert 0.65 * injected <= dedup['near_duplicates'] <= injected
+    assert dedup['dedup_rate'] == round(dedup['near_duplicates'] / len(titles) * 100, 2)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_distinct_models_are_not_merged(client, seed):
+    titles, injected = generate_result_titles(PAGE_SIZE * PAGES, near_duplicate_rate=0.0, seed=seed)
+    assert injected == 0
+    client.pages.update(fixture_pages(titles))
+
+    status, body = scrape(client, near_dedup=True)
+    assert status == 200
+    assert body['word_analysis']['near_dedup']['near_duplicates'] == 0
+
+
+def test_distinct_models_with_close_fingerprints():
+    # 同一品牌、品类和卖家模板，只有型号不同：指纹距离在阈值内，但不能合并
+    titles = ['Festool Handkreissäge 86E 230V mit Koffer LED', 'Festool Handkreissäge 537F LED mit Koffer']
+    assert bin(simhash(titles[0]) ^ simhash(titles[1])).count('1') <= 10
+    _, _, stats = dedup_titles(titles)
+    assert stats['near_duplicates'] == 0
+
+
+def test_variants_share_group_and_weight():
+    titles = ['Bosch Winkelschleifer 125A 18V Solo mit Koffer',
+              'NEU Bosch Winkelschleifer 125A 18V Solo mit Koffer',
+              'Bosch Winkelschleifer 125A 18V mit Koffer']
+    kept, weights, stats = dedup_titles(titles)
+    assert kept == titles[:1] and weights == [1]
+    assert stats['unique_groups'] == 1 and stats['near_duplicates'] == 2
+
+    kept, weights, _ = dedup_titles(titles, mode='weight')
+    assert kept == titles
+    assert weights == pytest.approx([1 / 3] * 3)
+
+
+def test_different_products_are_kept():
+    kept, _, stats = dedup_titles(BASE_TITLES)
+    assert kept == BASE_TITLES
+    assert stats['near_duplicates'] == 0 and stats['dedup_rate'] == 0.0
+
+
+@pytest.mark.parametrize('distance', [-1, 64, 1.5, True])
+def test_index_rejects_invalid_distance(distance):
+    with pytest.raises(ValueError):
+        SimHashIndex(distance)
+
+
+@pytest.mark.parametrize('distance', [-1, '10', None])
+def test_scrape_rejects_invalid_distance_before_fetching(client, distance):
+    status, body = scrape(client, near_dedup=True, dedup_distance=distance)
+    assert status == 400
+    assert 'dedup_distance' in body['error']
+
+
+def test_scrape_caps_distance(client):
+    titles, _ = generate_result_titles(PAGE_SIZE * PAGES, near_duplicate_rate=0.3, seed=0)
+    client.pages.update(fixture_pages(titles))
+
+    status, body = scrape(client, near_dedup=True, dedup_distance=40)
+    assert status == 200
+    assert body['word_analysis']['near_dedup']['max_distance'] == title_scraper.DEDUP_MAX_DISTANCE
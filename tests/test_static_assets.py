@@ -0,0 +1,55 @@
+"""静态文件的条件请求和区间请求：If-None-Match / If-Modified-Since 返回 304，Range 返回 206 或 416"""
+import time
+from email.utils import formatdate
+
+import pytest
+from flask import Flask
+
+from src.utils.static_assets import StaticAssets, send_asset
+
+BODY = 'var a = 1;\n' * 5000
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / 'app.js').write_text(BODY)
+    assets = StaticAssets(str(tmp_path))
+    app = Flask(__name__)
+
+    @app.route('/<path:path>')
+    def serve(path):
+        return send_asset(assets.get(path))
+
+    return app.test_client()
+
+
+def test_if_modified_since(client):
+    response = client.get('/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and response.headers['Content-Encoding'] == 'gzip'
+    last_modified = response.headers['Last-Modified']
+
+    assert client.get('/app.js', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.head('/app.js', headers={'If-Modified-Since': last_modified}).status_code == 304
+    old = formatdate(time.time() - 365 * 86400, usegmt=True)
+    assert client.get('/app.js', headers={'If-Modified-Since': old}).status_code == 200
+    # 有 If-None-Match 时忽略 If-Modified-Since
+    headers = {'If-None-Match': '"other"', 'If-Modified-Since': last_modified}
+    assert client.get('/app.js', headers=headers).status_code == 200
+
+
+def test_if_none_match_any_encoding(client):
+    etag = client.get('/app.js', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+    assert client.get('/app.js', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_range(client):
+    response = client.get('/app.js', headers={'Range': 'bytes=0-9', 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 0-9/{len(BODY)}'
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == BODY[:10].encode()
+
+    response = client.get('/app.js', headers={'Range': f'bytes={len(BODY) - 5}-'})
+    assert response.status_code == 206 and response.data == BODY[-5:].encode()
+
+    assert client.get('/app.js', headers={'Range': f'bytes={len(BODY)}-'}).status_code == 416
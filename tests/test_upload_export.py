@@ -0,0 +1,81 @@
+"""/upload 的结果可按 analysis_id 导出和查询销售趋势，分组与响应中的 similar_groups 相同"""
+import json
+
+import pytest
+
+from benchmarks.out_of_core import write_csv
+from src.main import create_app
+from src.routes import csv_analyzer_simple
+from src.utils.analysis_store import AnalysisStore
+from src.utils.shared_store import ResultStore
+from src.utils.similarity_index import SimilarityIndexStore
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """分析目录、结果缓存和相似度索引放在临时目录，不下载图片（只按标题和价格分组）"""
+    monkeypatch.setattr(csv_analyzer_simple, 'analysis_store', AnalysisStore(str(tmp_path / 'analyses')))
+    monkeypatch.setattr(csv_analyzer_simple, 'result_store', ResultStore(str(tmp_path / 'results'), ttl=60))
+    monkeypatch.setattr(csv_analyzer_simple, 'similarity_index', SimilarityIndexStore(str(tmp_path / 'index')))
+    monkeypatch.setattr(csv_analyzer_simple, 'download_and_hash', lambda url: (None, 'failed'))
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+    with app.test_client() as test_client:
+        test_client.csv_path = str(tmp_path / 'upload.csv')
+        write_csv(test_client.csv_path, 200)
+        yield test_client
+
+
+def upload(client):
+    with open(client.csv_path, 'rb') as f:
+        response = client.post('/api/csv/upload', data={'files': (f, 'upload.csv')}, content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_export_matches_upload_groups(client):
+    body = upload(client)
+    assert body['similar_groups']
+    meta = client.get(f"/api/csv/analyses/{body['analysis_id']}").get_json()
+    assert meta['status'] == 'done' and meta['grouping'] == 'greedy'
+    assert meta['groups'] == len(body['similar_groups'])
+
+    response = client.get(body['export_url'])
+    assert response.status_code == 200
+    exported = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(exported) == len(body['similar_groups'])
+    for group in exported:
+        members = body['similar_groups'][str(group['group_id'])]
+        assert [product['row'] for product in group['products']] == [member['index'] for member in members]
+        assert group['size'] == len(members)
+        assert group['volume'] == sum(member['product']['volume_numeric'] for member in members)
+        assert group['price_min'] == min(member['product']['price_numeric'] for member in members)
+
+
+def test_cached_upload_keeps_analysis(client):
+    first, second = upload(client), upload(client)
+    assert second['analysis_id'] == first['analysis_id']
+    assert client.get(second['export_url'] + '?format=csv&products=0').status_code == 200
+
+
+def test_trends_for_upload(client):
+    body = upload(client)
+    products = body['products']
+    meta = client.get(f"/api/csv/analyses/{body['analysis_id']}").get_json()
+    sold_dates = sorted(product['sold_date'] for product in products if product['sold_date'])
+    assert meta['rows_with_sold_date'] == len(sold_dates)
+    assert meta['sold_date_max'] == sold_dates[-1]
+
+    response = client.get(f"{body['trends_url']}?by=group&days=3660&limit=100&series=0")
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    totals = {}
+    for group_id, members in body['similar_groups'].items():
+        dated = [member['product'] for member in members if member['product']['sold_date']]
+        if dated:
+            totals[int(group_id)] = sum(product['total_sales'] for product in dated)
+    assert {result['group_id'] for result in results} == set(sorted(totals, key=totals.get, reverse=True)[:100])
+    for result in results:
+        assert result['total_sales'] == pytest.approx(totals[result['group_id']])
+
+    response = client.get(f"{body['trends_url']}?by=file&days=3660")
+    assert response.get_json()['results'][0]['source_file'] == 'upload.csv'